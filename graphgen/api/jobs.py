@@ -106,12 +106,17 @@ def _run_graphgen_job(
 
     with ENV_PATCH_LOCK:
         with _patched_env(llm_settings):
-            graph_gen = GraphGen(unique_id=unique_id, working_dir=str(output_dir))
+            graph_gen = GraphGen(
+                unique_id=unique_id,
+                working_dir=str(output_dir),
+                storage_config=config.get("storage"),
+            )
 
             # Execute the same steps as the CLI entrypoint.
             graph_gen.insert(
                 read_config=config["read"],
                 split_config=config["split"],
+                extract_config=config.get("extract"),
             )
             graph_gen.search(search_config=config["search"])
 
@@ -122,6 +127,7 @@ def _run_graphgen_job(
                 partition_config=config["partition"],
                 generate_config=config["generate"],
             )
+            graph_gen.close()
 
     save_config(str(job_root / "config.yaml"), config)
     logger.info("GraphGen job %s completed successfully.", unique_id)
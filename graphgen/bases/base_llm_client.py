@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import abc
 import re
-from typing import Any, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from graphgen.bases.base_tokenizer import BaseTokenizer
 from graphgen.bases.datatypes import Token
@@ -57,6 +57,57 @@ class BaseLLMClient(abc.ABC):
         """Generate probabilities for each token in the input."""
         raise NotImplementedError
 
+    def _build_messages(self, text: str, history: Optional[List] = None) -> List[Dict]:
+        """
+        Build the chat messages of a request.
+        :param text: the new user turn
+        :param history: previous messages, in user / assistant pairs
+        """
+        # system prompt, history, then the new turn: requests sharing a system
+        # prompt or a conversation share a prefix the server can cache
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if history:
+            assert len(history) % 2 == 0, "History should have even number of elements."
+            messages += history
+        messages.append({"role": "user", "content": text})
+        return messages
+
+    async def stream_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> AsyncIterator[str]:
+        """
+        Generate answer from the model, yielded in chunks as they are produced.
+        Chunks are raw model output, `<think>` tags are not filtered.
+        Backends without streaming yield the whole answer at once.
+        """
+        yield await self.generate_answer(text, history, **extra)
+
+    def usage_summary(self) -> Dict[str, float]:
+        """
+        Sum up the `token_usage` recorded by the client.
+        `prefix_hit_ratio` is the share of prompt tokens the server served from its
+        prefix cache, for servers reporting `cached_tokens` (OpenAI, vLLM).
+        """
+        summary: Dict[str, float] = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+        }
+        for usage in getattr(self, "token_usage", []):
+            summary["requests"] += 1
+            summary["prompt_tokens"] += usage["prompt_tokens"]
+            summary["cached_tokens"] += usage.get("cached_tokens", 0)
+            summary["completion_tokens"] += usage["completion_tokens"]
+        summary["prefix_hit_ratio"] = (
+            summary["cached_tokens"] / summary["prompt_tokens"]
+            if summary["prompt_tokens"]
+            else 0.0
+        )
+        return summary
+
     @staticmethod
     def filter_think_tags(text: str, think_tag: str = "think") -> str:
         """
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, List
+from typing import Any, List, Optional
 
 from graphgen.bases.base_storage import BaseGraphStorage
 from graphgen.bases.datatypes import Community
@@ -35,42 +35,64 @@ class BasePartitioner(ABC):
         :param g: Graph storage instance
         :return: List of batches, each batch is a tuple of (nodes, edges)
         """
+        node_ids = [node for comm in communities for node in comm.nodes]
+        node_datas = iter(await g.get_nodes(node_ids))
+        edges = iter(await BasePartitioner._fetch_edges(communities, g))
+
         batches = []
         for comm in communities:
-            nodes = comm.nodes
-            edges = comm.edges
             nodes_data = []
-            for node in nodes:
-                node_data = await g.get_node(node)
+            for node in comm.nodes:
+                node_data = next(node_datas)
                 if node_data:
                     nodes_data.append((node, node_data))
             edges_data = []
-            for u, v in edges:
-                edge_data = await g.get_edge(u, v)
-                if edge_data:
-                    edges_data.append((u, v, edge_data))
-                else:
-                    edge_data = await g.get_edge(v, u)
-                    if edge_data:
-                        edges_data.append((v, u, edge_data))
+            for _ in comm.edges:
+                edge = next(edges)
+                if edge and edge[2]:
+                    edges_data.append(edge)
             batches.append((nodes_data, edges_data))
         return batches
 
     @staticmethod
-    def _build_adjacency_list(
-        nodes: List[tuple[str, dict]], edges: List[tuple[str, str, dict]]
-    ) -> tuple[dict[str, List[str]], set[tuple[str, str]]]:
+    async def _fetch_edges(
+        communities: List[Community], g: BaseGraphStorage
+    ) -> list[Optional[tuple[str, str, dict]]]:
+        """Fetch the edges of all communities in order, by id when they carry ids."""
+        if all(len(comm.edge_ids) == len(comm.edges) for comm in communities):
+            return await g.get_edges_by_ids(
+                [edge_id for comm in communities for edge_id in comm.edge_ids]
+            )
+
+        edge_pairs = [tuple(edge) for comm in communities for edge in comm.edges]
+        edge_datas = await g.get_edges(edge_pairs)
+        edges = [
+            (u, v, data) if data else None
+            for (u, v), data in zip(edge_pairs, edge_datas)
+        ]
+        # edges given without ids may be named in the other orientation
+        missing = [i for i, edge in enumerate(edges) if edge is None]
+        reversed_datas = await g.get_edges([edge_pairs[i][::-1] for i in missing])
+        for i, data in zip(missing, reversed_datas):
+            if data:
+                edges[i] = (edge_pairs[i][1], edge_pairs[i][0], data)
+        return edges
+
+    @staticmethod
+    def _build_edge_index(
+        nodes: List[tuple[str, dict]], edges: List[tuple[int, str, str, dict]]
+    ) -> tuple[dict[str, List[tuple[str, int]]], dict[int, tuple[str, str, dict]]]:
         """
-        Build adjacency list and edge set from nodes and edges.
+        Build the adjacency list and the edge lookup from nodes and edges with ids.
         :param nodes
-        :param edges
-        :return: adjacency list, edge set
+        :param edges: (edge_id, source, target, data), as from `get_all_edges_with_ids`
+        :return: adjacency list of (neighbour, edge_id), edge_id -> (source, target, data)
         """
-        adj: dict[str, List[str]] = {n[0]: [] for n in nodes}
-        edge_set: set[tuple[str, str]] = set()
-        for e in edges:
-            adj[e[0]].append(e[1])
-            adj[e[1]].append(e[0])
-            edge_set.add((e[0], e[1]))
-            edge_set.add((e[1], e[0]))
-        return adj, edge_set
+        adj: dict[str, List[tuple[str, int]]] = {n[0]: [] for n in nodes}
+        edge_map: dict[int, tuple[str, str, dict]] = {}
+        for edge_id, u, v, data in edges:
+            adj[u].append((v, edge_id))
+            if u != v:
+                adj[v].append((u, edge_id))
+            edge_map[edge_id] = (u, v, data)
+        return adj, edge_map
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 
 class BaseReader(ABC):
@@ -18,3 +18,13 @@ class BaseReader(ABC):
         :param file_path: Path to the input file.
         :return: List of dictionaries containing the data.
         """
+
+    def iter_read(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Read documents one at a time, so they can be processed while the rest of
+        the file is read. Readers that cannot stream read the whole file first.
+
+        :param file_path: Path to the input file.
+        :return: Iterator of dictionaries containing the data.
+        """
+        yield from self.read(file_path)
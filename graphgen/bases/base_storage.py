@@ -99,6 +99,21 @@ class BaseGraphStorage(StorageNameSpace):
     ) -> Union[list[tuple[str, str]], None]:
         raise NotImplementedError
 
+    async def get_all_edges_with_ids(self) -> list[tuple[int, str, str, dict]]:
+        """
+        All edges as (edge_id, source, target, data). An edge id is a canonical
+        integer shared by both orientations of the edge; by default it is the
+        position of the edge in `get_all_edges`.
+        """
+        edges = await self.get_all_edges()
+        return [(i, u, v, d) for i, (u, v, d) in enumerate(edges)]
+
+    async def get_edges_by_ids(
+        self, edge_ids: list[int]
+    ) -> list[Union[tuple[str, str, dict], None]]:
+        edges = await self.get_all_edges()
+        return [edges[i] if 0 <= i < len(edges) else None for i in edge_ids]
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         raise NotImplementedError
 
@@ -109,3 +124,30 @@ class BaseGraphStorage(StorageNameSpace):
 
     async def delete_node(self, node_id: str):
         raise NotImplementedError
+
+    # Bulk variants. The defaults loop over the single-item methods; storages
+    # override them to work on the whole batch at once.
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [await self.get_node(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [await self.get_edge(src, tgt) for src, tgt in edge_pairs]
+
+    async def update_nodes(self, nodes: dict[str, dict]):
+        for node_id, node_data in nodes.items():
+            await self.update_node(node_id, node_data)
+
+    async def update_edges(self, edges: dict[tuple[str, str], dict]):
+        for (src, tgt), edge_data in edges.items():
+            await self.update_edge(src, tgt, edge_data)
+
+    async def upsert_nodes(self, nodes: dict[str, dict]):
+        for node_id, node_data in nodes.items():
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges(self, edges: dict[tuple[str, str], dict]):
+        for (src, tgt), edge_data in edges.items():
+            await self.upsert_edge(src, tgt, edge_data)
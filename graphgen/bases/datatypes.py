@@ -38,3 +38,5 @@ class Community:
     nodes: List[str] = field(default_factory=list)
     edges: List[tuple] = field(default_factory=list)
     metadata: dict = field(default_factory=dict)
+    # canonical ids of `edges`, in the same order, when the partitioner knows them
+    edge_ids: List[int] = field(default_factory=list)
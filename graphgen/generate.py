@@ -66,9 +66,17 @@ def main():
         os.path.join(working_dir, f"{unique_id}_{mode}.log"),
     )
 
-    graph_gen = GraphGen(unique_id=unique_id, working_dir=working_dir)
+    graph_gen = GraphGen(
+        unique_id=unique_id,
+        working_dir=working_dir,
+        storage_config=config.get("storage"),
+    )
 
-    graph_gen.insert(read_config=config["read"], split_config=config["split"])
+    graph_gen.insert(
+        read_config=config["read"],
+        split_config=config["split"],
+        extract_config=config.get("extract"),
+    )
 
     graph_gen.search(search_config=config["search"])
 
@@ -83,6 +91,8 @@ def main():
         generate_config=config["generate"],
     )
 
+    graph_gen.close()
+
     save_config(os.path.join(output_path, "config.yaml"), config)
     logger.info("GraphGen completed successfully. Data saved to %s", output_path)
 
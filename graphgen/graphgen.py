@@ -1,25 +1,48 @@
 import asyncio
 import os
+import shlex
 import time
 from dataclasses import dataclass
 from typing import Any, Dict, cast
 
-from graphgen.bases.base_storage import StorageNameSpace
-from graphgen.bases.datatypes import Chunk
+from openai import AsyncOpenAI
+
+from graphgen.bases.base_storage import (
+    BaseKVStorage,
+    BaseListStorage,
+    StorageNameSpace,
+)
+from graphgen.models.llm.batch_client import (
+    BatchLLMClient,
+    FileBatchRunner,
+    OpenAIBatchRunner,
+)
+from graphgen.models.llm.hf_client import HFLocalClient
+from graphgen.models.llm.http_pool import HTTPPool, close_http_pools
+from graphgen.models.llm.limitter import AdaptiveConcurrency
 from graphgen.models.llm.openai_client import OpenAIClient
-from graphgen.models.storage import JsonKVStorage, JsonListStorage, NetworkXStorage
+from graphgen.models.llm.response_cache import ResponseCache
+from graphgen.models.storage import (
+    JsonKVStorage,
+    JsonListStorage,
+    JsonlListStorage,
+    LogKVStorage,
+    NetworkXStorage,
+    SQLiteKVStorage,
+    SQLiteListStorage,
+)
 from graphgen.models.tokenizer import Tokenizer
 from graphgen.operators import (
-    build_kg,
-    chunk_documents,
     generate_qas,
+    insert_pipeline,
+    iter_files,
     judge_statement,
     partition_kg,
     quiz,
-    read_files,
     search_all,
+    stream_qas,
 )
-from graphgen.utils import async_to_sync_method, compute_content_hash, logger
+from graphgen.utils import async_to_sync_method, logger
 
 sys_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
@@ -34,6 +57,9 @@ class GraphGen:
     synthesizer_llm_client: OpenAIClient = None
     trainee_llm_client: OpenAIClient = None
 
+    # storage backends, e.g. {"kv_backend": "sqlite", "list_backend": "sqlite"}
+    storage_config: Dict = None
+
     # webui
     progress_bar: Any = None
 
@@ -42,112 +68,204 @@ class GraphGen:
             model_name=os.getenv("TOKENIZER_MODEL")
         )
 
+        self.storage_config = self.storage_config or {}
+        # unchanged LLM calls of a rerun are answered from disk
+        llm_cache = None
+        if self.storage_config.get("llm_cache", False):
+            llm_cache = ResponseCache(
+                self.working_dir,
+                max_bytes=int(self.storage_config.get("llm_cache_max_mb", 1024)) << 20,
+                cache_sampled=self.storage_config.get("llm_cache_sampled", False),
+            )
+        # connection pool shared by the LLM clients, e.g. {"max_connections": 64}
+        self.http_pool = HTTPPool(**(self.storage_config.get("http_pool") or {}))
         self.synthesizer_llm_client: OpenAIClient = (
             self.synthesizer_llm_client
-            or OpenAIClient(
-                model_name=os.getenv("SYNTHESIZER_MODEL"),
-                api_key=os.getenv("SYNTHESIZER_API_KEY"),
-                base_url=os.getenv("SYNTHESIZER_BASE_URL"),
-                tokenizer=self.tokenizer_instance,
-            )
+            or self._init_llm_client("SYNTHESIZER", llm_cache)
         )
 
-        self.trainee_llm_client: OpenAIClient = self.trainee_llm_client or OpenAIClient(
-            model_name=os.getenv("TRAINEE_MODEL"),
-            api_key=os.getenv("TRAINEE_API_KEY"),
-            base_url=os.getenv("TRAINEE_BASE_URL"),
-            tokenizer=self.tokenizer_instance,
+        self.trainee_llm_client: OpenAIClient = (
+            self.trainee_llm_client or self._init_llm_client("TRAINEE", llm_cache)
         )
 
-        self.full_docs_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="full_docs"
+        # documents and chunks are only written by insert and clear, which reopen
+        # them writable, so runs that only search or generate never write them
+        self.full_docs_storage: BaseKVStorage = self._init_kv_storage(
+            "full_docs", read_only=True
         )
-        self.text_chunks_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="text_chunks"
+        self.text_chunks_storage: BaseKVStorage = self._init_kv_storage(
+            "text_chunks", read_only=True
         )
         self.graph_storage: NetworkXStorage = NetworkXStorage(
-            self.working_dir, namespace="graph"
-        )
-        self.search_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="search"
+            self.working_dir,
+            namespace="graph",
+            write_graphml=self.storage_config.get("graphml_export", False),
         )
-        self.rephrase_storage: JsonKVStorage = JsonKVStorage(
-            self.working_dir, namespace="rephrase"
+        self.search_storage: BaseKVStorage = self._init_kv_storage("search")
+        self.rephrase_storage: BaseKVStorage = self._init_kv_storage("rephrase")
+        self.summary_storage: BaseKVStorage = self._init_kv_storage("summary")
+        # a fixed qa_dir lets a rerun resume the QAs of an interrupted one
+        qa_dir = self.storage_config.get("qa_dir") or os.path.join(
+            "data", "graphgen", f"{self.unique_id}"
         )
-        self.qa_storage: JsonListStorage = JsonListStorage(
-            os.path.join(self.working_dir, "data", "graphgen", f"{self.unique_id}"),
-            namespace="qa",
+        self.qa_storage: BaseListStorage = self._init_list_storage(
+            os.path.join(self.working_dir, qa_dir), namespace="qa"
         )
 
-    @async_to_sync_method
-    async def insert(self, read_config: Dict, split_config: Dict):
+    def _init_llm_client(self, role: str, llm_cache: ResponseCache = None):
         """
-        insert chunks into the graph
+        Create the LLM client of a role from the environment.
+        :param role: SYNTHESIZER or TRAINEE, the prefix of the variables to read
+        :param llm_cache
         """
-        # Step 1: Read files
-        data = read_files(read_config["input_file"], self.working_dir)
-        if len(data) == 0:
-            logger.warning("No data to process")
-            return
-
-        # TODO: configurable whether to use coreference resolution
-
-        # Step 2: Split chunks and filter existing ones
-        assert isinstance(data, list) and isinstance(data[0], dict)
-        new_docs = {
-            compute_content_hash(doc["content"], prefix="doc-"): {
-                "content": doc["content"]
-            }
-            for doc in data
-            if doc.get("type", "text") == "text"
-        }
-        _add_doc_keys = await self.full_docs_storage.filter_keys(list(new_docs.keys()))
-        new_docs = {k: v for k, v in new_docs.items() if k in _add_doc_keys}
-
-        if len(new_docs) == 0:
-            logger.warning("All docs are already in the storage")
-            return
-        logger.info("[New Docs] inserting %d docs", len(new_docs))
-
-        inserting_chunks = await chunk_documents(
-            new_docs,
-            split_config["chunk_size"],
-            split_config["chunk_overlap"],
-            self.tokenizer_instance,
-            self.progress_bar,
+        backend = os.getenv(f"{role}_BACKEND", "openai")
+        model_name = os.getenv(f"{role}_MODEL")
+        # one limit per role, shared by every operator calling its client
+        max_concurrency = int(os.getenv(f"{role}_MAX_CONCURRENCY", "512"))
+        concurrency = AdaptiveConcurrency(
+            initial=min(16, max_concurrency), max_limit=max_concurrency
         )
+        if backend == "openai":
+            return OpenAIClient(
+                model_name=model_name,
+                api_key=os.getenv(f"{role}_API_KEY"),
+                base_url=os.getenv(f"{role}_BASE_URL"),
+                tokenizer=self.tokenizer_instance,
+                cache=llm_cache,
+                http_pool=self.http_pool,
+                concurrency=concurrency,
+            )
+        if backend == "hf":
+            # judging only needs next-token logprobs, scored in-process in batches
+            return HFLocalClient(
+                model_name_or_path=model_name,
+                tokenizer=self.tokenizer_instance,
+            )
+        if backend == "ollama":
+            # native Ollama API: keeps the model loaded and returns logprobs
+            # pylint: disable=import-outside-toplevel
+            from graphgen.models.llm.ollama_client import OllamaClient
 
-        _add_chunk_keys = await self.text_chunks_storage.filter_keys(
-            list(inserting_chunks.keys())
-        )
-        inserting_chunks = {
-            k: v for k, v in inserting_chunks.items() if k in _add_chunk_keys
-        }
+            return OllamaClient(
+                model_name=model_name,
+                base_url=os.getenv(f"{role}_BASE_URL"),
+                keep_alive=os.getenv(f"{role}_KEEP_ALIVE", "30m"),
+                tokenizer=self.tokenizer_instance,
+                http_pool=self.http_pool,
+                concurrency=concurrency,
+            )
+        if backend == "batch":
+            # bulk jobs: requests are submitted together through a batch runner,
+            # a local one if a command is given, else the server's batch API
+            command = os.getenv(f"{role}_BATCH_COMMAND")
+            if command:
+                runner = FileBatchRunner(
+                    os.path.join(self.working_dir, "batches", role.lower()),
+                    command=shlex.split(command),
+                )
+            else:
+                runner = OpenAIBatchRunner(
+                    AsyncOpenAI(
+                        api_key=os.getenv(f"{role}_API_KEY"),
+                        base_url=os.getenv(f"{role}_BASE_URL"),
+                    )
+                )
+            return BatchLLMClient(
+                runner=runner,
+                model_name=model_name,
+                tokenizer=self.tokenizer_instance,
+                concurrency=concurrency,
+            )
+        raise ValueError(f"Unsupported {role.lower()} backend: {backend}")
 
-        if len(inserting_chunks) == 0:
-            logger.warning("All chunks are already in the storage")
-            return
+    def _init_kv_storage(
+        self, namespace: str, read_only: bool = False
+    ) -> BaseKVStorage:
+        """
+        :param namespace
+        :param read_only: open a log storage through read-only memory maps, other
+            backends ignore it
+        """
+        backend = self.storage_config.get("kv_backend", "json")
+        if backend == "json":
+            return JsonKVStorage(self.working_dir, namespace=namespace)
+        if backend == "log":
+            return LogKVStorage(
+                self.working_dir, namespace=namespace, read_only=read_only
+            )
+        if backend == "sqlite":
+            return SQLiteKVStorage(self.working_dir, namespace=namespace)
+        raise ValueError(f"Unsupported kv backend: {backend}")
+
+    def _init_list_storage(self, working_dir: str, namespace: str) -> BaseListStorage:
+        backend = self.storage_config.get("list_backend", "json")
+        if backend == "json":
+            return JsonListStorage(working_dir, namespace=namespace)
+        if backend == "jsonl":
+            return JsonlListStorage(working_dir, namespace=namespace)
+        if backend == "sqlite":
+            return SQLiteListStorage(working_dir, namespace=namespace)
+        raise ValueError(f"Unsupported list backend: {backend}")
 
-        logger.info("[New Chunks] inserting %d chunks", len(inserting_chunks))
-        await self.full_docs_storage.upsert(new_docs)
-        await self.text_chunks_storage.upsert(inserting_chunks)
+    def _open_docs_writable(self):
+        """Reopen the document and chunk storages writable before changing them."""
+        for attr, namespace in [
+            ("full_docs_storage", "full_docs"),
+            ("text_chunks_storage", "text_chunks"),
+        ]:
+            if getattr(getattr(self, attr), "read_only", False):
+                setattr(self, attr, self._init_kv_storage(namespace))
 
-        # Step 3: Extract entities and relations from chunks
-        logger.info("[Entity and Relation Extraction]...")
-        _add_entities_and_relations = await build_kg(
+    @async_to_sync_method
+    async def insert(
+        self, read_config: Dict, split_config: Dict, extract_config: Dict = None
+    ):
+        """
+        insert chunks into the graph
+        :return: the graph storage, or None if there were no new chunks to insert
+        """
+        extract_config = extract_config or {}
+        self._open_docs_writable()
+        # read -> split -> extract -> merge run as a pipeline, so the first chunks
+        # reach the graph while the rest of the input is still being read
+        # TODO: configurable whether to use coreference resolution
+        logger.info("[Insert] %s ...", read_config["input_file"])
+        extracted = await insert_pipeline(
+            iter_files(read_config["input_file"], self.working_dir),
             llm_client=self.synthesizer_llm_client,
             kg_instance=self.graph_storage,
-            chunks=[
-                Chunk(id=k, content=v["content"]) for k, v in inserting_chunks.items()
-            ],
+            full_docs_storage=self.full_docs_storage,
+            text_chunks_storage=self.text_chunks_storage,
+            chunk_size=split_config["chunk_size"],
+            chunk_overlap=split_config["chunk_overlap"],
+            tokenizer_instance=self.tokenizer_instance,
+            max_loop=extract_config.get("max_loop", 3),
+            glean_mode=extract_config.get("glean_mode", "probe"),
+            workers=extract_config.get("workers", 256),
+            summary_cache=self.summary_storage,
             progress_bar=self.progress_bar,
         )
-        if not _add_entities_and_relations:
-            logger.warning("No entities or relations extracted")
+        if not extracted:
+            logger.warning("No new chunks to insert")
             return
 
         await self._insert_done()
-        return _add_entities_and_relations
+        self._log_usage("insert", self.synthesizer_llm_client)
+        return self.graph_storage
+
+    @staticmethod
+    def _log_usage(stage: str, llm_client):
+        usage = llm_client.usage_summary()
+        if usage["requests"]:
+            logger.info(
+                "[Token Usage] after %s: %d requests, %d prompt tokens "
+                "(%.1f%% from the prefix cache), %d completion tokens",
+                stage,
+                usage["requests"],
+                usage["prompt_tokens"],
+                usage["prefix_hit_ratio"] * 100,
+                usage["completion_tokens"],
+            )
 
     async def _insert_done(self):
         tasks = []
@@ -156,6 +274,7 @@ class GraphGen:
             self.text_chunks_storage,
             self.graph_storage,
             self.search_storage,
+            self.summary_storage,
         ]:
             if storage_instance is None:
                 continue
@@ -222,6 +341,8 @@ class GraphGen:
         )
         await self.rephrase_storage.index_done_callback()
         await _update_relations.index_done_callback()
+        self._log_usage("quiz", self.synthesizer_llm_client)
+        self._log_usage("judge", self.trainee_llm_client)
 
     @async_to_sync_method
     async def generate(self, partition_config: Dict, generate_config: Dict):
@@ -231,6 +352,21 @@ class GraphGen:
         )
 
         # Step 2： generate QA pairs
+        if isinstance(self.qa_storage, JsonlListStorage):
+            # QAs are written batch by batch, and a rerun resumes where it stopped
+            written = await stream_qas(
+                self.synthesizer_llm_client,
+                batches,
+                generate_config,
+                self.qa_storage,
+                progress_bar=self.progress_bar,
+            )
+            await self.qa_storage.index_done_callback()
+            self._log_usage("generate", self.synthesizer_llm_client)
+            if not written:
+                logger.warning("No QA pairs generated")
+            return
+
         results = await generate_qas(
             self.synthesizer_llm_client,
             batches,
@@ -245,14 +381,22 @@ class GraphGen:
         # Step 3: store the generated QA pairs
         await self.qa_storage.upsert(results)
         await self.qa_storage.index_done_callback()
+        self._log_usage("generate", self.synthesizer_llm_client)
+
+    @async_to_sync_method
+    async def close(self):
+        """Close the pooled connections of the LLM clients at the end of a run."""
+        await close_http_pools()
 
     @async_to_sync_method
     async def clear(self):
+        self._open_docs_writable()
         await self.full_docs_storage.drop()
         await self.text_chunks_storage.drop()
         await self.search_storage.drop()
         await self.graph_storage.clear()
         await self.rephrase_storage.drop()
+        await self.summary_storage.drop()
         await self.qa_storage.drop()
 
         logger.info("All caches are cleared")
@@ -9,9 +9,21 @@ their requirements will surface a ModuleNotFoundError at access time.
 
 from importlib import import_module
 
+from .llm.batch_client import BatchLLMClient, FileBatchRunner, OpenAIBatchRunner
+from .llm.hf_client import HFLocalClient
 from .llm.openai_client import OpenAIClient
+from .llm.response_cache import ResponseCache
 from .llm.topk_token_model import TopkTokenModel
-from .storage import JsonKVStorage, JsonListStorage, NetworkXStorage
+from .storage import (
+    CSRGraphStorage,
+    JsonKVStorage,
+    JsonListStorage,
+    JsonlListStorage,
+    LogKVStorage,
+    NetworkXStorage,
+    SQLiteKVStorage,
+    SQLiteListStorage,
+)
 from .tokenizer import Tokenizer
 
 
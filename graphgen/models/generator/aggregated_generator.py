@@ -2,9 +2,11 @@ from dataclasses import dataclass
 from typing import Any
 
 from graphgen.bases import BaseGenerator
-from graphgen.templates import AGGREGATED_GENERATION_PROMPT
+from graphgen.templates import AGGREGATED_GENERATION_PROMPT, compile_prompts
 from graphgen.utils import compute_content_hash, detect_main_language, logger
 
+PROMPTS = compile_prompts(AGGREGATED_GENERATION_PROMPT)
+
 
 @dataclass
 class AggregatedGenerator(BaseGenerator):
@@ -52,8 +54,8 @@ class AggregatedGenerator(BaseGenerator):
         #                 for index, text in enumerate(original_text)
         #             ]
         #         )
-        prompt = AGGREGATED_GENERATION_PROMPT[language]["ANSWER_REPHRASING"].format(
-            language=language, entities=entities_str, relationships=relations_str
+        prompt = PROMPTS[language]["ANSWER_REPHRASING"].render(
+            entities=entities_str, relationships=relations_str
         )
         return prompt
 
@@ -80,9 +82,7 @@ class AggregatedGenerator(BaseGenerator):
         :return:
         """
         language = detect_main_language(answer)
-        prompt = AGGREGATED_GENERATION_PROMPT[language]["QUESTION_GENERATION"].format(
-            answer=answer
-        )
+        prompt = PROMPTS[language]["QUESTION_GENERATION"].render(answer=answer)
         return prompt
 
     @staticmethod
@@ -2,9 +2,11 @@ from dataclasses import dataclass
 from typing import Any
 
 from graphgen.bases import BaseGenerator
-from graphgen.templates import ATOMIC_GENERATION_PROMPT
+from graphgen.templates import ATOMIC_GENERATION_PROMPT, compile_prompts
 from graphgen.utils import compute_content_hash, detect_main_language, logger
 
+PROMPTS = compile_prompts(ATOMIC_GENERATION_PROMPT)
+
 
 @dataclass
 class AtomicGenerator(BaseGenerator):
@@ -20,7 +22,7 @@ class AtomicGenerator(BaseGenerator):
             context += f"- {edge[0]} - {edge[1]}: {edge[2]['description']}\n"
         language = detect_main_language(context)
 
-        prompt = ATOMIC_GENERATION_PROMPT[language].format(context=context)
+        prompt = PROMPTS[language].render(context=context)
         return prompt
 
     @staticmethod
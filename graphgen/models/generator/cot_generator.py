@@ -2,9 +2,11 @@ from dataclasses import dataclass
 from typing import Any
 
 from graphgen.bases import BaseGenerator
-from graphgen.templates import COT_GENERATION_PROMPT
+from graphgen.templates import COT_GENERATION_PROMPT, compile_prompts
 from graphgen.utils import compute_content_hash, detect_main_language, logger
 
+PROMPTS = compile_prompts(COT_GENERATION_PROMPT)
+
 
 @dataclass
 class CoTGenerator(BaseGenerator):
@@ -31,7 +33,7 @@ class CoTGenerator(BaseGenerator):
             ]
         )
         language = detect_main_language(entities_str + relationships_str)
-        prompt = COT_GENERATION_PROMPT[language]["COT_TEMPLATE_DESIGN"].format(
+        prompt = PROMPTS[language]["COT_TEMPLATE_DESIGN"].render(
             entities=entities_str, relationships=relationships_str
         )
         return prompt
@@ -59,7 +61,7 @@ class CoTGenerator(BaseGenerator):
             ]
         )
         language = detect_main_language(entities_str + relationships_str)
-        prompt = COT_GENERATION_PROMPT[language]["COT_GENERATION"].format(
+        prompt = PROMPTS[language]["COT_GENERATION"].render(
             entities=entities_str,
             relationships=relationships_str,
             question=question,
@@ -2,9 +2,11 @@ from dataclasses import dataclass
 from typing import Any
 
 from graphgen.bases import BaseGenerator
-from graphgen.templates import MULTI_HOP_GENERATION_PROMPT
+from graphgen.templates import MULTI_HOP_GENERATION_PROMPT, compile_prompts
 from graphgen.utils import compute_content_hash, detect_main_language, logger
 
+PROMPTS = compile_prompts(MULTI_HOP_GENERATION_PROMPT)
+
 
 @dataclass
 class MultiHopGenerator(BaseGenerator):
@@ -27,7 +29,7 @@ class MultiHopGenerator(BaseGenerator):
             ]
         )
         language = detect_main_language(entities_str + relationships_str)
-        prompt = MULTI_HOP_GENERATION_PROMPT[language].format(
+        prompt = PROMPTS[language].render(
             entities=entities_str, relationships=relationships_str
         )
         return prompt
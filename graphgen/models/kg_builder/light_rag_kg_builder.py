@@ -1,11 +1,17 @@
+import asyncio
 import re
 from collections import Counter, defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 from graphgen.bases import BaseGraphStorage, BaseKGBuilder, BaseLLMClient, Chunk
-from graphgen.templates import KG_EXTRACTION_PROMPT, KG_SUMMARIZATION_PROMPT
+from graphgen.templates import (
+    KG_EXTRACTION_PROMPT,
+    KG_SUMMARIZATION_PROMPT,
+    compile_prompts,
+)
 from graphgen.utils import (
+    StreamingMarkerSplitter,
     detect_if_chinese,
     detect_main_language,
     handle_single_entity_extraction,
@@ -15,11 +21,25 @@ from graphgen.utils import (
     split_string_by_multi_markers,
 )
 
+# compiled once per language; the shared prompt dicts are never mutated
+EXTRACTION_PROMPTS = compile_prompts(KG_EXTRACTION_PROMPT)
+SUMMARIZATION_PROMPTS = compile_prompts(KG_SUMMARIZATION_PROMPT)
+
 
 @dataclass
 class LightRAGKGBuilder(BaseKGBuilder):
     llm_client: BaseLLMClient = None
     max_loop: int = 3
+    # how to decide whether to glean again:
+    # probe: ask IF_LOOP, then CONTINUE (two calls per glean)
+    # sentinel: CONTINUE only, answered with the completion delimiter alone when
+    #   nothing was missed (one call per glean)
+    # logprob: probe IF_LOOP through the top-k logprobs of a single token
+    glean_mode: str = "probe"
+
+    def __post_init__(self):
+        if self.glean_mode not in ("probe", "sentinel", "logprob"):
+            raise ValueError(f"Unsupported glean mode: {self.glean_mode}")
 
     async def extract(
         self, chunk: Chunk
@@ -29,86 +49,182 @@ class LightRAGKGBuilder(BaseKGBuilder):
         :param chunk
         :return: (nodes_data, edges_data)
         """
-        chunk_id = chunk.id
+        nodes = defaultdict(list)
+        edges = defaultdict(list)
+        async for kind, key, data in self.extract_stream(chunk):
+            if kind == "node":
+                nodes[key].append(data)
+            else:
+                edges[key].append(data)
+        return dict(nodes), dict(edges)
+
+    async def extract_stream(
+        self, chunk: Chunk
+    ) -> AsyncIterator[Tuple[str, Union[str, Tuple[str, str]], dict]]:
+        """
+        Extract entities and relationships from a single chunk, yielding each record
+        as soon as it has been generated.
+        :param chunk
+        :return: ("node", entity_name, entity) or ("edge", (src_id, tgt_id), relation)
+        """
         content = chunk.content
 
         # step 1: language_detection
         language = "Chinese" if detect_if_chinese(content) else "English"
-        KG_EXTRACTION_PROMPT["FORMAT"]["language"] = language
+        prompts = EXTRACTION_PROMPTS[language]
 
-        hint_prompt = KG_EXTRACTION_PROMPT[language]["TEMPLATE"].format(
-            **KG_EXTRACTION_PROMPT["FORMAT"], input_text=content
-        )
+        hint_prompt = prompts["TEMPLATE"].render(input_text=content)
 
-        # step 2: initial glean
-        final_result = await self.llm_client.generate_answer(hint_prompt)
+        # step 2: initial glean, parsed while it is generated
+        seen = set()
+        response: List[str] = []
+        async for record in self._stream_records(hint_prompt, None, chunk.id, response):
+            seen.add(record[:2])
+            yield record
+        final_result = self.llm_client.filter_think_tags("".join(response))
         logger.info("First extraction result: %s", final_result)
 
         # step3: iterative refinement
         history = pack_history_conversations(hint_prompt, final_result)
+        continue_prompt = prompts["CONTINUE"].render()
+        if self.glean_mode == "sentinel":
+            continue_prompt = prompts["CONTINUE_SENTINEL"].render()
         for loop_idx in range(self.max_loop):
-            if_loop_result = await self.llm_client.generate_answer(
-                text=KG_EXTRACTION_PROMPT[language]["IF_LOOP"], history=history
-            )
-            if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
-            if if_loop_result != "yes":
+            if self.glean_mode != "sentinel" and not await self._should_glean(
+                prompts["IF_LOOP"].render(), history
+            ):
                 break
 
-            glean_result = await self.llm_client.generate_answer(
-                text=KG_EXTRACTION_PROMPT[language]["CONTINUE"], history=history
-            )
+            response = []
+            new_records = 0
+            async for record in self._stream_records(
+                continue_prompt, history, chunk.id, response
+            ):
+                if record[:2] not in seen:
+                    seen.add(record[:2])
+                    new_records += 1
+                yield record
+            glean_result = self.llm_client.filter_think_tags("".join(response))
             logger.info("Loop %s glean: %s", loop_idx + 1, glean_result)
 
-            history += pack_history_conversations(
-                KG_EXTRACTION_PROMPT[language]["CONTINUE"], glean_result
+            # a glean that finds nothing new would not lead to a better next one
+            if not new_records:
+                break
+            history += pack_history_conversations(continue_prompt, glean_result)
+
+    async def _should_glean(self, if_loop_prompt: str, history: List) -> bool:
+        if self.glean_mode == "logprob":
+            tokens = await self.llm_client.generate_topk_per_token(
+                if_loop_prompt, history=history
             )
-            final_result += glean_result
+            probs = {"yes": 0.0, "no": 0.0}
+            for candidate in tokens[0].top_candidates if tokens else []:
+                answer = candidate.text.strip().strip('"').strip("'").lower()
+                if answer in probs:
+                    probs[answer] += candidate.prob
+            return probs["yes"] > probs["no"]
+
+        if_loop_result = await self.llm_client.generate_answer(
+            text=if_loop_prompt, history=history
+        )
+        return if_loop_result.strip().strip('"').strip("'").lower() == "yes"
 
-        # step 4: parse the final result
-        records = split_string_by_multi_markers(
-            final_result,
+    async def _stream_records(
+        self, text: str, history: Optional[List], chunk_id: str, response: List[str]
+    ) -> AsyncIterator[Tuple[str, Union[str, Tuple[str, str]], dict]]:
+        """
+        Stream an answer and parse its records as their delimiters arrive.
+        The pieces of the answer are appended to `response`.
+        """
+        splitter = StreamingMarkerSplitter(
             [
                 KG_EXTRACTION_PROMPT["FORMAT"]["record_delimiter"],
                 KG_EXTRACTION_PROMPT["FORMAT"]["completion_delimiter"],
-            ],
+            ]
+        )
+        async for piece in self.llm_client.stream_answer(text, history=history):
+            response.append(piece)
+            for record in splitter.feed(piece):
+                parsed = await self._parse_record(record, chunk_id)
+                if parsed is not None:
+                    yield parsed
+        for record in splitter.close():
+            parsed = await self._parse_record(record, chunk_id)
+            if parsed is not None:
+                yield parsed
+
+    @staticmethod
+    async def _parse_record(
+        record: str, chunk_id: str
+    ) -> Optional[Tuple[str, Union[str, Tuple[str, str]], dict]]:
+        match = re.search(r"\((.*)\)", record)
+        if not match:
+            return None
+        inner = match.group(1)
+
+        attributes = split_string_by_multi_markers(
+            inner, [KG_EXTRACTION_PROMPT["FORMAT"]["tuple_delimiter"]]
         )
 
-        nodes = defaultdict(list)
-        edges = defaultdict(list)
-
-        for record in records:
-            match = re.search(r"\((.*)\)", record)
-            if not match:
-                continue
-            inner = match.group(1)
-
-            attributes = split_string_by_multi_markers(
-                inner, [KG_EXTRACTION_PROMPT["FORMAT"]["tuple_delimiter"]]
-            )
-
-            entity = await handle_single_entity_extraction(attributes, chunk_id)
-            if entity is not None:
-                nodes[entity["entity_name"]].append(entity)
-                continue
-
-            relation = await handle_single_relationship_extraction(attributes, chunk_id)
-            if relation is not None:
-                key = (relation["src_id"], relation["tgt_id"])
-                edges[key].append(relation)
+        entity = await handle_single_entity_extraction(attributes, chunk_id)
+        if entity is not None:
+            return "node", entity["entity_name"], entity
 
-        return dict(nodes), dict(edges)
+        relation = await handle_single_relationship_extraction(attributes, chunk_id)
+        if relation is not None:
+            return "edge", (relation["src_id"], relation["tgt_id"]), relation
+        return None
 
     async def merge_nodes(
         self,
         node_data: tuple[str, List[dict]],
         kg_instance: BaseGraphStorage,
     ) -> None:
+        entity_name, _ = node_data
+        node = await kg_instance.get_node(entity_name)
+        _, merged = await self.merge_node_data(node_data, node)
+        await kg_instance.upsert_node(entity_name, node_data=merged)
+
+    async def merge_node_data(
+        self, node_data: tuple[str, List[dict]], node: Optional[dict]
+    ) -> tuple[str, dict]:
+        """
+        Merge extracted entities with the stored node, without touching the storage.
+        :param node_data: (entity_name, extracted entities)
+        :param node: the stored node, or None
+        :return: (entity_name, merged node data)
+        """
+        return (await self.merge_node_batch([(node_data, node)]))[0]
+
+    async def merge_node_batch(
+        self,
+        items: List[Tuple[tuple[str, List[dict]], Optional[dict]]],
+        summarize: bool = True,
+    ) -> List[tuple[str, dict]]:
+        """
+        Merge the entities of several keys with their stored nodes, without touching
+        the storage. Descriptions that need a summary are summarized together.
+        The result only depends on the extracted and stored data, not on the order
+        the entities were extracted in.
+        :param items: [((entity_name, extracted entities), stored node or None)]
+        :return: [(entity_name, merged node data)]
+        """
+        merged = [self._combine_node_data(*item) for item in items]
+        if summarize:
+            await self.summarize_batch(
+                [(entity_name, data) for entity_name, data in merged]
+            )
+        return merged
+
+    @staticmethod
+    def _combine_node_data(
+        node_data: tuple[str, List[dict]], node: Optional[dict]
+    ) -> tuple[str, dict]:
         entity_name, node_data = node_data
         entity_types = []
         source_ids = []
         descriptions = []
 
-        node = await kg_instance.get_node(entity_name)
         if node is not None:
             entity_types.append(node["entity_type"])
             source_ids.extend(
@@ -116,40 +232,83 @@ class LightRAGKGBuilder(BaseKGBuilder):
             )
             descriptions.append(node["description"])
 
-        # take the most frequent entity_type
-        entity_type = sorted(
+        # take the most frequent entity_type, ties broken by name
+        entity_type = min(
             Counter([dp["entity_type"] for dp in node_data] + entity_types).items(),
-            key=lambda x: x[1],
-            reverse=True,
-        )[0][0]
+            key=lambda x: (-x[1], x[0]),
+        )[0]
 
         description = "<SEP>".join(
             sorted(set([dp["description"] for dp in node_data] + descriptions))
         )
-        description = await self._handle_kg_summary(entity_name, description)
-
         source_id = "<SEP>".join(
-            set([dp["source_id"] for dp in node_data] + source_ids)
+            sorted(set([dp["source_id"] for dp in node_data] + source_ids))
         )
 
-        node_data = {
+        return entity_name, {
             "entity_type": entity_type,
             "description": description,
             "source_id": source_id,
         }
-        await kg_instance.upsert_node(entity_name, node_data=node_data)
 
     async def merge_edges(
         self,
         edges_data: tuple[Tuple[str, str], List[dict]],
         kg_instance: BaseGraphStorage,
     ) -> None:
+        (src_id, tgt_id), _ = edges_data
+        edge = await kg_instance.get_edge(src_id, tgt_id)
+        _, merged, placeholder = await self.merge_edge_data(edges_data, edge)
+
+        for insert_id in [src_id, tgt_id]:
+            if not await kg_instance.has_node(insert_id):
+                await kg_instance.upsert_node(insert_id, node_data=placeholder)
+
+        await kg_instance.upsert_edge(src_id, tgt_id, edge_data=merged)
+
+    async def merge_edge_data(
+        self, edges_data: tuple[Tuple[str, str], List[dict]], edge: Optional[dict]
+    ) -> tuple[Tuple[str, str], dict, dict]:
+        """
+        Merge extracted relationships with the stored edge, without touching the
+        storage.
+        :param edges_data: ((src_id, tgt_id), extracted relationships)
+        :param edge: the stored edge, or None
+        :return: ((src_id, tgt_id), merged edge data, data for missing end nodes)
+        """
+        return (await self.merge_edge_batch([(edges_data, edge)]))[0]
+
+    async def merge_edge_batch(
+        self,
+        items: List[Tuple[tuple[Tuple[str, str], List[dict]], Optional[dict]]],
+        summarize: bool = True,
+    ) -> List[tuple[Tuple[str, str], dict, dict]]:
+        """
+        Merge the relationships of several keys with their stored edges, without
+        touching the storage. Descriptions that need a summary are summarized
+        together.
+        :param items: [(((src_id, tgt_id), extracted relationships), stored edge)]
+        :return: [((src_id, tgt_id), merged edge data, data for missing end nodes)]
+        """
+        merged = [self._combine_edge_data(*item) for item in items]
+        if summarize:
+            await self.summarize_batch(
+                [
+                    (self.relation_name(src_id, tgt_id), data)
+                    for (src_id, tgt_id), data, _ in merged
+                ]
+            )
+        return merged
+
+    @staticmethod
+    def _combine_edge_data(
+        edges_data: tuple[Tuple[str, str], List[dict]], edge: Optional[dict]
+    ) -> tuple[Tuple[str, str], dict, dict]:
         (src_id, tgt_id), edge_data = edges_data
 
         source_ids = []
         descriptions = []
 
-        edge = await kg_instance.get_edge(src_id, tgt_id)
         if edge is not None:
             source_ids.extend(
                 split_string_by_multi_markers(edge["source_id"], ["<SEP>"])
@@ -160,29 +319,64 @@ class LightRAGKGBuilder(BaseKGBuilder):
             sorted(set([dp["description"] for dp in edge_data] + descriptions))
         )
         source_id = "<SEP>".join(
-            set([dp["source_id"] for dp in edge_data] + source_ids)
+            sorted(set([dp["source_id"] for dp in edge_data] + source_ids))
+        )
+        placeholder = {
+            "source_id": source_id,
+            "description": description,
+            "entity_type": "UNKNOWN",
+        }
+
+        return (
+            (src_id, tgt_id),
+            {"source_id": source_id, "description": description},
+            placeholder,
         )
 
-        for insert_id in [src_id, tgt_id]:
-            if not await kg_instance.has_node(insert_id):
-                await kg_instance.upsert_node(
-                    insert_id,
-                    node_data={
-                        "source_id": source_id,
-                        "description": description,
-                        "entity_type": "UNKNOWN",
-                    },
-                )
-
-        description = await self._handle_kg_summary(
-            f"({src_id}, {tgt_id})", description
+    @staticmethod
+    def relation_name(src_id: str, tgt_id: str) -> str:
+        """Name of a relation in summary prompts."""
+        return f"({src_id}, {tgt_id})"
+
+    def needs_summary(self, description: str, max_summary_tokens: int = 200) -> bool:
+        """Whether the description is too long to be kept as it is."""
+        # a token covers at least one byte, short descriptions are not encoded
+        if len(description.encode("utf-8")) < max_summary_tokens:
+            return False
+        return len(self._head_tokens(description, max_summary_tokens)) >= (
+            max_summary_tokens
         )
 
-        await kg_instance.upsert_edge(
-            src_id,
-            tgt_id,
-            edge_data={"source_id": source_id, "description": description},
+    def _head_tokens(self, description: str, max_tokens: int) -> list:
+        """
+        The first `max_tokens` tokens of the description. Only its head is encoded,
+        unless the head is too short.
+        """
+        tokenizer_instance = self.llm_client.tokenizer
+        head = description[: max_tokens * 8]
+        tokens = tokenizer_instance.encode(head)
+        if len(tokens) < max_tokens and len(head) < len(description):
+            tokens = tokenizer_instance.encode(description)
+        return tokens[:max_tokens]
+
+    async def summarize_batch(self, items: List[Tuple[str, dict]]):
+        """
+        Summarize the descriptions of several entities or relations concurrently,
+        in place. A description whose summary fails is kept as it is.
+        :param items: [(entity or relation name, merged data)]
+        """
+        summaries = await asyncio.gather(
+            *[
+                self._handle_kg_summary(name, data["description"])
+                for name, data in items
+            ],
+            return_exceptions=True,
         )
+        for (name, data), summary in zip(items, summaries):
+            if isinstance(summary, Exception):
+                logger.error("Failed to summarize %s: %s", name, summary)
+            else:
+                data["description"] = summary
 
     async def _handle_kg_summary(
         self,
@@ -199,23 +393,21 @@ class LightRAGKGBuilder(BaseKGBuilder):
         :return summary
         """
 
-        tokenizer_instance = self.llm_client.tokenizer
+        if not self.needs_summary(description, max_summary_tokens):
+            return description
+
         language = detect_main_language(description)
         if language == "en":
             language = "English"
         else:
             language = "Chinese"
-        KG_EXTRACTION_PROMPT["FORMAT"]["language"] = language
-
-        tokens = tokenizer_instance.encode(description)
-        if len(tokens) < max_summary_tokens:
-            return description
 
-        use_description = tokenizer_instance.decode(tokens[:max_summary_tokens])
-        prompt = KG_SUMMARIZATION_PROMPT[language]["TEMPLATE"].format(
+        use_description = self.llm_client.tokenizer.decode(
+            self._head_tokens(description, max_summary_tokens)
+        )
+        prompt = SUMMARIZATION_PROMPTS[language]["TEMPLATE"].render(
             entity_name=entity_or_relation_name,
             description_list=use_description.split("<SEP>"),
-            **KG_SUMMARIZATION_PROMPT["FORMAT"],
         )
         new_description = await self.llm_client.generate_answer(prompt)
         logger.info(
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from graphgen.bases.base_llm_client import BaseLLMClient
+from graphgen.bases.datatypes import Token
+from graphgen.models.llm.limitter import AdaptiveConcurrency
+from graphgen.models.llm.request_batcher import RequestBatcher
+from graphgen.utils import logger
+
+_DONE_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def _dump_requests(requests: List[Dict]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in requests).encode(
+        "utf-8"
+    )
+
+
+def _parse_results(text: str) -> Dict[str, Dict]:
+    """custom_id -> result line of an OpenAI batch output or error file."""
+    results = {}
+    for line in text.splitlines():
+        if line.strip():
+            result = json.loads(line)
+            results[result["custom_id"]] = result
+    return results
+
+
+class OpenAIBatchRunner:
+    """
+    Run requests through the batch API of an OpenAI-compatible server:
+    upload them as a JSONL file, create a batch and poll it until it is done.
+    """
+
+    def __init__(
+        self,
+        client,
+        completion_window: str = "24h",
+        poll_interval: float = 30.0,
+    ):
+        """
+        :param client: an `AsyncOpenAI` client
+        :param completion_window
+        :param poll_interval: seconds between two status checks
+        """
+        self.client = client
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+
+    async def run(self, requests: List[Dict]) -> Dict[str, Dict]:
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", _dump_requests(requests)), purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        logger.info("Submitted batch %s with %d requests", batch.id, len(requests))
+        while batch.status not in _DONE_STATUSES:
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        results = {}
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                results.update(_parse_results(content.text))
+        if not results:
+            raise RuntimeError(f"Batch {batch.id} ended as {batch.status}")
+        return results
+
+
+class FileBatchRunner:
+    """
+    Run requests through a local batch runner working on files: the requests are
+    written to `<working_dir>/<batch>.input.jsonl` in the OpenAI batch format and
+    the results are read from `<batch>.output.jsonl`.
+    With `command`, e.g. vLLM's `run_batch -i {input} -o {output} --model ...`, the
+    runner is started for every batch; otherwise an external worker is expected to
+    write the output file (atomically, e.g. by renaming it into place).
+    Both files are deleted once the results are read, or when the batch fails.
+    """
+
+    def __init__(
+        self,
+        working_dir: str,
+        command: Optional[List[str]] = None,
+        poll_interval: float = 5.0,
+        timeout: Optional[float] = 24 * 3600,
+        keep_files: bool = False,
+    ):
+        """
+        :param working_dir: directory of the input and output files
+        :param command: runner started for every batch, `{input}` and `{output}`
+            are replaced by the file paths
+        :param poll_interval: seconds between two checks for the output file
+        :param timeout: seconds to wait for the output of a batch, None to wait
+            forever
+        :param keep_files: keep the input and output files, e.g. for debugging
+        """
+        self.working_dir = working_dir
+        self.command = command
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.keep_files = keep_files
+
+    async def run(self, requests: List[Dict]) -> Dict[str, Dict]:
+        os.makedirs(self.working_dir, exist_ok=True)
+        batch_id = f"batch-{uuid.uuid4().hex}"
+        input_file = os.path.join(self.working_dir, f"{batch_id}.input.jsonl")
+        output_file = os.path.join(self.working_dir, f"{batch_id}.output.jsonl")
+        with open(input_file, "wb") as f:
+            f.write(_dump_requests(requests))
+
+        try:
+            await asyncio.wait_for(
+                self._wait_output(batch_id, input_file, output_file), self.timeout
+            )
+            with open(output_file, "r", encoding="utf-8") as f:
+                return _parse_results(f.read())
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(
+                f"No output for {batch_id} after {self.timeout} seconds"
+            ) from e
+        finally:
+            if not self.keep_files:
+                for file in (input_file, output_file):
+                    if os.path.exists(file):
+                        os.remove(file)
+
+    async def _wait_output(self, batch_id: str, input_file: str, output_file: str):
+        if self.command:
+            process = await asyncio.create_subprocess_exec(
+                *[
+                    arg.format(input=input_file, output=output_file)
+                    for arg in self.command
+                ]
+            )
+            try:
+                returncode = await process.wait()
+            except asyncio.CancelledError:
+                # timed out: do not leave the runner behind
+                process.kill()
+                await process.wait()
+                raise
+            if returncode != 0:
+                raise RuntimeError(
+                    f"Batch runner exited with {returncode} for {batch_id}"
+                )
+        while not os.path.exists(output_file):
+            await asyncio.sleep(self.poll_interval)
+
+
+class BatchLLMClient(BaseLLMClient):
+    """
+    LLM client for latency-insensitive bulk jobs.
+    Requests are queued and submitted together through a batch runner, and every
+    caller awaits its own result, so operators use it like any other client.
+    A batch is submitted once `max_batch_size` requests are queued or
+    `flush_interval` seconds after its first request.
+    """
+
+    def __init__(
+        self,
+        *,
+        runner,
+        model_name: str = "gpt-4o-mini",
+        json_mode: bool = False,
+        seed: Optional[int] = None,
+        topk_per_token: int = 5,
+        max_batch_size: int = 1000,
+        flush_interval: float = 5.0,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        **kwargs: Any,
+    ):
+        """
+        :param runner: `OpenAIBatchRunner`, `FileBatchRunner` or any object with an
+            async `run(requests) -> {custom_id: result}`
+        :param concurrency: limit on the batches in flight, None submits them at once
+        """
+        super().__init__(**kwargs)
+        self.runner = runner
+        self.model_name = model_name
+        self.json_mode = json_mode
+        self.seed = seed
+        self.topk_per_token = topk_per_token
+
+        self.token_usage: list = []
+        self.concurrency = concurrency
+        self._batcher = RequestBatcher(
+            self._run_batch,
+            max_batch_size=max_batch_size,
+            flush_interval=flush_interval,
+        )
+
+    def _build_body(self, text: str, history: Optional[List]) -> Dict:
+        body: Dict[str, Any] = {
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_tokens": self.max_tokens,
+        }
+        if self.seed:
+            body["seed"] = self.seed
+        if self.json_mode:
+            body["response_format"] = {"type": "json_object"}
+
+        body["messages"] = self._build_messages(text, history)
+        return body
+
+    async def _run_batch(self, bodies: List[Dict]) -> List[Any]:
+        requests = [
+            {
+                "custom_id": f"request-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }
+            for i, body in enumerate(bodies)
+        ]
+        if self.concurrency is not None:
+            await self.concurrency.acquire()
+        start = time.monotonic()
+        try:
+            results = await self.runner.run(requests)
+        except BaseException:
+            if self.concurrency is not None:
+                self.concurrency.release()
+            raise
+        if self.concurrency is not None:
+            self.concurrency.release(latency=time.monotonic() - start)
+
+        completions = []
+        for request in requests:
+            result = results.get(request["custom_id"]) or {}
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                completions.append(response["body"])
+            else:
+                error = result.get("error") or response.get("body") or "no result"
+                completions.append(RuntimeError(f"Batch request failed: {error}"))
+        return completions
+
+    def _record_usage(self, completion: Dict):
+        usage = completion.get("usage")
+        if usage:
+            details = usage.get("prompt_tokens_details") or {}
+            self.token_usage.append(
+                {
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["total_tokens"],
+                    "cached_tokens": details.get("cached_tokens") or 0,
+                }
+            )
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        completion = await self._batcher.submit(self._build_body(text, history))
+        self._record_usage(completion)
+        return self.filter_think_tags(completion["choices"][0]["message"]["content"])
+
+    async def generate_topk_per_token(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> List[Token]:
+        body = self._build_body(text, history)
+        if self.topk_per_token > 0:
+            body["logprobs"] = True
+            body["top_logprobs"] = self.topk_per_token
+        body["max_tokens"] = 1
+
+        completion = await self._batcher.submit(body)
+        self._record_usage(completion)
+        return [
+            Token(
+                t["token"],
+                math.exp(t["logprob"]),
+                top_candidates=[
+                    Token(c["token"], math.exp(c["logprob"])) for c in t["top_logprobs"]
+                ],
+            )
+            for t in completion["choices"][0]["logprobs"]["content"]
+        ]
+
+    async def generate_inputs_prob(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> List[Token]:
+        """Generate probabilities for each token in the input."""
+        raise NotImplementedError
@@ -0,0 +1,160 @@
+import asyncio
+import math
+from typing import Any, List, Optional
+
+from graphgen.bases.base_llm_client import BaseLLMClient
+from graphgen.bases.datatypes import Token
+from graphgen.models.llm.request_batcher import RequestBatcher
+
+
+class HFLocalClient(BaseLLMClient):
+    """
+    In-process transformers backend for scoring, e.g. judging with the trainee model.
+    Concurrent `generate_topk_per_token` calls are gathered into padded batches and
+    scored by one forward pass each, instead of one request per statement. The
+    returned tokens have the same shape as `OpenAIClient`'s: the greedy next token
+    with its `topk_per_token` most likely candidates.
+    Needs `torch` and `transformers`; small models run on CPU.
+    """
+
+    def __init__(
+        self,
+        *,
+        model_name_or_path: Optional[str] = None,
+        model: Any = None,
+        hf_tokenizer: Any = None,
+        device: Optional[str] = None,
+        torch_dtype: Any = "auto",
+        topk_per_token: int = 5,
+        max_batch_size: int = 64,
+        flush_interval: float = 0.01,
+        **kwargs: Any,
+    ):
+        """
+        :param model_name_or_path: model to load, unless `model` and `hf_tokenizer`
+            are given
+        :param device: defaults to cuda when available
+        """
+        super().__init__(**kwargs)
+        # pylint: disable=import-outside-toplevel
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self._torch = torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.hf_tokenizer = hf_tokenizer or AutoTokenizer.from_pretrained(
+            model_name_or_path
+        )
+        self.model = model or AutoModelForCausalLM.from_pretrained(
+            model_name_or_path, torch_dtype=torch_dtype
+        )
+        self.model.to(self.device).eval()
+        if self.hf_tokenizer.pad_token is None:
+            self.hf_tokenizer.pad_token = self.hf_tokenizer.eos_token
+        self.topk_per_token = topk_per_token
+
+        # one forward pass at a time, batches queue behind it
+        self._lock = asyncio.Lock()
+        self._batcher = RequestBatcher(
+            self._score_batch,
+            max_batch_size=max_batch_size,
+            flush_interval=flush_interval,
+        )
+
+    def _render(self, text: str, history: Optional[List] = None) -> str:
+        messages = self._build_messages(text, history)
+        if getattr(self.hf_tokenizer, "chat_template", None):
+            return self.hf_tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+        return "\n".join(m["content"] for m in messages)
+
+    def _encode(self, prompts: List[str]):
+        self.hf_tokenizer.padding_side = "left"
+        inputs = self.hf_tokenizer(
+            prompts, return_tensors="pt", padding=True, add_special_tokens=False
+        ).to(self.device)
+        # with left padding, positions start at the first real token
+        position_ids = (inputs["attention_mask"].cumsum(-1) - 1).clamp(min=0)
+        return inputs, position_ids
+
+    def _decode(self, token_id: int) -> str:
+        return self.hf_tokenizer.decode([token_id])
+
+    def _topk_next_tokens(self, prompts: List[str]) -> List[List[Token]]:
+        with self._torch.inference_mode():
+            inputs, position_ids = self._encode(prompts)
+            logits = self.model(**inputs, position_ids=position_ids).logits[:, -1]
+            logprobs = self._torch.log_softmax(logits.float(), dim=-1)
+            values, indices = logprobs.topk(max(1, self.topk_per_token), dim=-1)
+
+        results = []
+        for row_values, row_indices in zip(values.tolist(), indices.tolist()):
+            candidates = [
+                Token(self._decode(i), math.exp(v))
+                for v, i in zip(row_values, row_indices)
+            ]
+            token = Token(
+                candidates[0].text,
+                candidates[0].prob,
+                top_candidates=candidates[: self.topk_per_token],
+            )
+            results.append([token])
+        return results
+
+    async def _score_batch(self, prompts: List[str]) -> List[List[Token]]:
+        async with self._lock:
+            return await asyncio.to_thread(self._topk_next_tokens, prompts)
+
+    async def generate_topk_per_token(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> List[Token]:
+        return await self._batcher.submit(self._render(text, history))
+
+    def _generate(self, prompt: str) -> str:
+        with self._torch.inference_mode():
+            inputs, _ = self._encode([prompt])
+            do_sample = self.temperature > 0
+            sampling = (
+                {"temperature": self.temperature, "top_p": self.top_p}
+                if do_sample
+                else {}
+            )
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_tokens,
+                do_sample=do_sample,
+                repetition_penalty=self.repetition_penalty,
+                pad_token_id=self.hf_tokenizer.pad_token_id,
+                **sampling,
+            )
+        new_tokens = output[0, inputs["input_ids"].shape[1] :]
+        return self.hf_tokenizer.decode(new_tokens, skip_special_tokens=True)
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        prompt = self._render(text, history)
+        async with self._lock:
+            answer = await asyncio.to_thread(self._generate, prompt)
+        return self.filter_think_tags(answer)
+
+    def _inputs_prob(self, prompt: str) -> List[Token]:
+        with self._torch.inference_mode():
+            inputs, _ = self._encode([prompt])
+            input_ids = inputs["input_ids"][0]
+            logprobs = self._torch.log_softmax(
+                self.model(**inputs).logits[0, :-1].float(), dim=-1
+            )
+            token_logprobs = logprobs.gather(-1, input_ids[1:, None])[:, 0].tolist()
+        return [
+            Token(self._decode(i), math.exp(v))
+            for i, v in zip(input_ids[1:].tolist(), token_logprobs)
+        ]
+
+    async def generate_inputs_prob(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> List[Token]:
+        """Probabilities of the tokens of the input, each given the previous ones."""
+        async with self._lock:
+            return await asyncio.to_thread(self._inputs_prob, text)
@@ -0,0 +1,86 @@
+import asyncio
+import importlib.util
+import weakref
+from dataclasses import astuple, dataclass
+from typing import Optional
+
+from graphgen.utils import logger
+
+try:
+    import httpx
+except ModuleNotFoundError:
+    httpx = None  # type: ignore
+
+# event loop -> pool settings -> client; connections cannot move between loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@dataclass(frozen=True)
+class HTTPPool:
+    """
+    Settings of an HTTP connection pool shared by the LLM clients of a run.
+    Clients whose pools have equal settings share one `httpx.AsyncClient` per event
+    loop, so connections (and TLS sessions) are reused across clients and requests.
+    The pools are closed at the end of each run (`GraphGen.close`), and the next run
+    opens new connections.
+    HTTP/2 needs the `h2` package and falls back to HTTP/1.1 without it.
+    """
+
+    max_connections: int = 1024
+    max_keepalive_connections: int = 256
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    read_timeout: float = 600.0
+
+    @property
+    def timeout(self) -> Optional["httpx.Timeout"]:
+        if httpx is None:
+            return None
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def get_client(self) -> Optional["httpx.AsyncClient"]:
+        """
+        Get the shared client of the running event loop.
+        :return: the client, or None if httpx is not installed
+        """
+        if httpx is None:
+            return None
+        clients = _clients.setdefault(asyncio.get_running_loop(), {})
+        key = astuple(self)
+        client = clients.get(key)
+        if client is None or client.is_closed:
+            http2 = self.http2
+            if http2 and importlib.util.find_spec("h2") is None:
+                logger.warning("HTTP/2 needs the h2 package, using HTTP/1.1")
+                http2 = False
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=self.timeout,
+                http2=http2,
+                follow_redirects=True,
+            )
+            clients[key] = client
+        return client
+
+    async def aclose(self):
+        """Close the shared client of the running event loop."""
+        client = _clients.get(asyncio.get_running_loop(), {}).pop(astuple(self), None)
+        if client is not None:
+            await client.aclose()
+
+
+async def close_http_pools():
+    """
+    Close every shared client of the running event loop, e.g. at the end of a run.
+    Clients using a pool afterwards get a new connection pool.
+    """
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
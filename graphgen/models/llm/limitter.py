@@ -1,86 +1,216 @@
 import asyncio
 import time
-from datetime import datetime, timedelta
+from collections import deque
+from typing import Optional
 
 from graphgen.utils import logger
 
 
-class RPM:
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `rate` tokens per `period` seconds,
+    holding at most `capacity` tokens (default: one period's worth).
+    Waiters are served in FIFO order, so a large request is not starved by small
+    ones. A request larger than `capacity` waits for a full bucket and leaves it in
+    debt, which later requests wait out.
+    """
+
+    def __init__(
+        self, rate: float, period: float = 60.0, capacity: Optional[float] = None
+    ):
+        if rate <= 0 or period <= 0:
+            raise ValueError("rate and period must be positive")
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.rate / self.period,
+        )
+        self._updated = now
+
+    def _delay(self, amount: float) -> float:
+        """Seconds until `amount` tokens can be taken."""
+        self._refill()
+        missing = min(amount, self.capacity) - self._tokens
+        return max(0.0, missing * self.period / self.rate)
+
+    def _take(self, amount: float):
+        self._tokens -= amount
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float = 1, silent: bool = True):
+        await acquire_all((self, amount), silent=silent)
+
+    def release(self, amount: float):
+        """Give back tokens that were acquired but not used."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+async def acquire_all(*requests: tuple[TokenBucket, float], silent: bool = True):
+    """
+    Take tokens from several buckets at once, e.g. one request and its estimated
+    tokens, waiting until every bucket can serve its share.
+    """
+    buckets = sorted({id(b): b for b, _ in requests}.values(), key=id)
+    # locks are always taken in the same order, so joint waits cannot deadlock
+    for i, bucket in enumerate(buckets):
+        try:
+            await bucket._lock.acquire()  # pylint: disable=protected-access
+        except BaseException:
+            for locked in buckets[:i]:
+                locked._lock.release()  # pylint: disable=protected-access
+            raise
+    try:
+        while True:
+            delay = max(
+                bucket._delay(amount)  # pylint: disable=protected-access
+                for bucket, amount in requests
+            )
+            if delay <= 0:
+                break
+            if not silent:
+                logger.info("Rate limit reached, wait %.2f seconds", delay)
+            await asyncio.sleep(delay)
+        for bucket, amount in requests:
+            bucket._take(amount)  # pylint: disable=protected-access
+    finally:
+        for bucket in buckets:
+            bucket._lock.release()  # pylint: disable=protected-access
+
+
+class RPM(TokenBucket):
+    """Requests per minute."""
+
     def __init__(self, rpm: int = 1000):
+        super().__init__(rpm)
         self.rpm = rpm
-        self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-
-    @staticmethod
-    def get_minute_slot():
-        current_time = time.time()
-        dt_object = datetime.fromtimestamp(current_time)
-        total_minutes_since_midnight = dt_object.hour * 60 + dt_object.minute
-        return total_minutes_since_midnight
 
     async def wait(self, silent=False):
-        current = time.time()
-        dt_object = datetime.fromtimestamp(current)
-        minute_slot = self.get_minute_slot()
-
-        if self.record["rpm_slot"] == minute_slot:
-            # check RPM exceed
-            if self.record["counter"] >= self.rpm:
-                # wait until next minute
-                next_minute = dt_object.replace(second=0, microsecond=0) + timedelta(
-                    minutes=1
-                )
-                _next = next_minute.timestamp()
-                sleep_time = abs(_next - current)
-                if not silent:
-                    logger.info("RPM sleep %s", sleep_time)
-                await asyncio.sleep(sleep_time)
-
-                self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-        else:
-            self.record = {"rpm_slot": self.get_minute_slot(), "counter": 0}
-        self.record["counter"] += 1
-
-        if not silent:
-            logger.debug(self.record)
-
-
-class TPM:
+        await self.acquire(1, silent=silent)
+
+
+class TPM(TokenBucket):
+    """Tokens per minute."""
+
     def __init__(self, tpm: int = 20000):
+        super().__init__(tpm)
         self.tpm = tpm
-        self.record = {"tpm_slot": self.get_minute_slot(), "counter": 0}
-
-    @staticmethod
-    def get_minute_slot():
-        current_time = time.time()
-        dt_object = datetime.fromtimestamp(current_time)
-        total_minutes_since_midnight = dt_object.hour * 60 + dt_object.minute
-        return total_minutes_since_midnight
 
     async def wait(self, token_count, silent=False):
-        current = time.time()
-        dt_object = datetime.fromtimestamp(current)
-        minute_slot = self.get_minute_slot()
-
-        # get next slot, skip
-        if self.record["tpm_slot"] != minute_slot:
-            self.record = {"tpm_slot": minute_slot, "counter": token_count}
+        await self.acquire(token_count, silent=silent)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the number of requests in flight.
+    Every successful response grows the limit by about one per round trip; an
+    overloaded response (429, 5xx, timeout) cuts it by `backoff_factor`, at most
+    once per baseline latency so one burst of failures counts once. Latency alone
+    never cuts the limit, as long and short requests share it. A `Retry-After`
+    pauses every new request until it has passed. Waiters are served in FIFO order.
+    """
+
+    def __init__(
+        self,
+        initial: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 512,
+        backoff_factor: float = 0.5,
+    ):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= initial <= max_limit")
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._baseline: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._paused_until = float("-inf")
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self):
+        if not self._waiters and self._can_start():
+            self.in_flight += 1
             return
-
-        # check RPM exceed
-        old_counter = self.record["counter"]
-        self.record["counter"] += token_count
-        if self.record["counter"] > self.tpm:
-            logger.info("Current TPM: %s, limit: %s", old_counter, self.tpm)
-            # wait until next minute
-            next_minute = dt_object.replace(second=0, microsecond=0) + timedelta(
-                minutes=1
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just before the cancellation
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(
+        self,
+        latency: Optional[float] = None,
+        overloaded: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        """
+        Free a slot and adapt the limit.
+        :param latency: seconds the request took, if it succeeded
+        :param overloaded: the server rejected the request as overloaded
+        :param retry_after: seconds the server asked to wait
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+            logger.info("Server asked to retry after %.2f seconds", retry_after)
+        if overloaded:
+            self._decrease(now)
+        elif latency is not None:
+            if self._baseline is None or latency < self._baseline:
+                self._baseline = latency
+            else:
+                # drift up slowly, so one lucky response does not pin the baseline
+                self._baseline += (latency - self._baseline) * 0.01
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _can_start(self) -> bool:
+        return (
+            self.in_flight < int(self.limit) and time.monotonic() >= self._paused_until
+        )
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < (self._baseline or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+        logger.info("Concurrency limit reduced to %d", int(self.limit))
+
+    def _wake(self):
+        while self._waiters and self._can_start():
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        pause = self._paused_until - time.monotonic()
+        if self._waiters and pause > 0 and self._resume_handle is None:
+            self._resume_handle = asyncio.get_running_loop().call_later(
+                pause, self._resume
             )
-            _next = next_minute.timestamp()
-            sleep_time = abs(_next - current)
-            logger.warning("TPM limit exceeded, wait %s seconds", sleep_time)
-            await asyncio.sleep(sleep_time)
-
-            self.record = {"tpm_slot": self.get_minute_slot(), "counter": token_count}
 
-        if not silent:
-            logger.debug(self.record)
+    def _resume(self):
+        self._resume_handle = None
+        self._wake()
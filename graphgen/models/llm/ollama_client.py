@@ -1,21 +1,201 @@
-# TODO: implement ollama client
-from typing import Any, List, Optional
+import json
+import math
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
 
 from graphgen.bases import BaseLLMClient, Token
+from graphgen.models.llm.http_pool import HTTPPool
+from graphgen.models.llm.limitter import AdaptiveConcurrency
+from graphgen.models.llm.openai_client import get_retry_after
 
 
 class OllamaClient(BaseLLMClient):
+    """
+    Client for the native Ollama API (`/api/chat`).
+    The model is kept loaded for `keep_alive` (-1: until the server stops), so
+    requests do not pay for reloads, and connections come from a shared `HTTPPool`.
+    Top-k logprobs need an Ollama server that supports `logprobs`.
+    """
+
+    def __init__(
+        self,
+        *,
+        model_name: str = "llama3.1",
+        base_url: Optional[str] = None,
+        keep_alive: Union[str, int] = "30m",
+        json_mode: bool = False,
+        seed: Optional[int] = None,
+        topk_per_token: int = 5,
+        http_pool: HTTPPool = HTTPPool(),
+        http_client: Optional[httpx.AsyncClient] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        **kwargs: Any,
+    ):
+        """
+        :param base_url: defaults to http://localhost:11434
+        :param http_client: client to use instead of the shared pool
+        :param concurrency: limit on the requests in flight, None sends them at once
+        """
+        super().__init__(**kwargs)
+        self.model_name = model_name
+        self.base_url = (base_url or "http://localhost:11434").rstrip("/")
+        self.keep_alive = keep_alive
+        self.json_mode = json_mode
+        self.seed = seed
+        self.topk_per_token = topk_per_token
+        self.http_pool = http_pool
+        self.http_client = http_client
+        self.concurrency = concurrency
+
+        self.token_usage: list = []
+
+    def _client(self) -> httpx.AsyncClient:
+        return self.http_client or self.http_pool.get_client()
+
+    def _build_payload(self, text: str, history: Optional[List], stream: bool) -> Dict:
+        options = {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "top_k": self.top_k,
+            "num_predict": self.max_tokens,
+            "repeat_penalty": self.repetition_penalty,
+        }
+        if self.seed:
+            options["seed"] = self.seed
+        payload = {
+            "model": self.model_name,
+            "messages": self._build_messages(text, history),
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": options,
+        }
+        if self.json_mode:
+            payload["format"] = "json"
+        return payload
+
+    def _record_usage(self, response: Dict):
+        if "prompt_eval_count" in response or "eval_count" in response:
+            prompt_tokens = response.get("prompt_eval_count", 0)
+            completion_tokens = response.get("eval_count", 0)
+            self.token_usage.append(
+                {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+            )
+
+    async def _acquire(self) -> float:
+        """Wait for a slot if `concurrency` is set, return the start time."""
+        if self.concurrency is not None:
+            await self.concurrency.acquire()
+        return time.monotonic()
+
+    def _release(self, **kwargs: Any):
+        """Free the concurrency slot of a request, see `AdaptiveConcurrency.release`."""
+        if self.concurrency is not None:
+            self.concurrency.release(**kwargs)
+
+    def _release_failed(self, exc: BaseException):
+        # a busy server answers 429 / 503, or does not answer in time
+        if isinstance(exc, httpx.TimeoutException):
+            self._release(overloaded=True)
+        elif isinstance(exc, httpx.HTTPStatusError) and (
+            exc.response.status_code == 429 or exc.response.status_code >= 500
+        ):
+            self._release(overloaded=True, retry_after=get_retry_after(exc))
+        else:
+            self._release()
+
+    async def _chat(self, payload: Dict) -> Dict:
+        start = await self._acquire()
+        try:
+            response = await self._client().post(
+                f"{self.base_url}/api/chat", json=payload
+            )
+            response.raise_for_status()
+        except BaseException as e:
+            self._release_failed(e)
+            raise
+        self._release(latency=time.monotonic() - start)
+        data = response.json()
+        self._record_usage(data)
+        return data
+
+    async def load(self):
+        """Load the model and keep it loaded for `keep_alive`."""
+        response = await self._client().post(
+            f"{self.base_url}/api/chat",
+            json={
+                "model": self.model_name,
+                "messages": [],
+                "keep_alive": self.keep_alive,
+            },
+        )
+        response.raise_for_status()
+
     async def generate_answer(
         self, text: str, history: Optional[List[str]] = None, **extra: Any
     ) -> str:
-        pass
+        data = await self._chat(self._build_payload(text, history, stream=False))
+        return self.filter_think_tags(data["message"]["content"])
+
+    async def stream_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> AsyncIterator[str]:
+        payload = self._build_payload(text, history, stream=True)
+        # the slot is held until the whole answer has been received
+        start = await self._acquire()
+        try:
+            async with self._client().stream(
+                "POST", f"{self.base_url}/api/chat", json=payload
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(f"Ollama error: {chunk['error']}")
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        self._record_usage(chunk)
+        except BaseException as e:
+            self._release_failed(e)
+            raise
+        self._release(latency=time.monotonic() - start)
 
     async def generate_topk_per_token(
         self, text: str, history: Optional[List[str]] = None, **extra: Any
     ) -> List[Token]:
-        pass
+        payload = self._build_payload(text, history, stream=False)
+        payload["options"]["num_predict"] = 1
+        payload["logprobs"] = True
+        payload["top_logprobs"] = self.topk_per_token
+        data = await self._chat(payload)
+        if not data.get("logprobs"):
+            raise RuntimeError(
+                f"The Ollama server returned no logprobs for model {self.model_name}, "
+                "it may be too old to support them"
+            )
+        return [
+            Token(
+                t["token"],
+                math.exp(t["logprob"]),
+                top_candidates=[
+                    Token(c["token"], math.exp(c["logprob"]))
+                    for c in t.get("top_logprobs", [])
+                ],
+            )
+            for t in data["logprobs"]
+        ]
 
     async def generate_inputs_prob(
         self, text: str, history: Optional[List[str]] = None, **extra: Any
     ) -> List[Token]:
-        pass
+        """Ollama does not return logprobs of the prompt."""
+        raise NotImplementedError
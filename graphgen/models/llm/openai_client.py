@@ -1,8 +1,19 @@
+import asyncio
 import math
-from typing import Any, Dict, List, Optional
+import time
+import weakref
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import openai
-from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, RateLimitError
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -12,7 +23,9 @@ from tenacity import (
 
 from graphgen.bases.base_llm_client import BaseLLMClient
 from graphgen.bases.datatypes import Token
-from graphgen.models.llm.limitter import RPM, TPM
+from graphgen.models.llm.http_pool import HTTPPool
+from graphgen.models.llm.limitter import RPM, TPM, AdaptiveConcurrency, acquire_all
+from graphgen.models.llm.response_cache import ResponseCache
 
 
 def get_top_response_tokens(response: openai.ChatCompletion) -> List[Token]:
@@ -28,7 +41,52 @@ def get_top_response_tokens(response: openai.ChatCompletion) -> List[Token]:
     return tokens
 
 
+def _dump_tokens(tokens: List[Token]) -> list:
+    return [
+        [t.text, t.prob, [[c.text, c.prob] for c in t.top_candidates]] for t in tokens
+    ]
+
+
+def _load_tokens(data: list) -> List[Token]:
+    return [
+        Token(text, prob, top_candidates=[Token(*c) for c in candidates])
+        for text, prob, candidates in data
+    ]
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds to wait according to the Retry-After headers of an API error."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def wait_retry_after(retry_state) -> float:
+    """Tenacity wait honoring Retry-After, with exponential backoff otherwise."""
+    exc = retry_state.outcome.exception()
+    retry_after = get_retry_after(exc) if exc is not None else None
+    if retry_after is not None:
+        return retry_after
+    return wait_exponential(multiplier=1, min=4, max=10)(retry_state)
+
+
 class OpenAIClient(BaseLLMClient):
+    MAX_MEMOIZED_COUNTS = 4096
+    ENCODE_IN_THREAD_CHARS = 8192
+
     def __init__(
         self,
         *,
@@ -41,6 +99,9 @@ class OpenAIClient(BaseLLMClient):
         request_limit: bool = False,
         rpm: Optional[RPM] = None,
         tpm: Optional[TPM] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        cache: Optional[ResponseCache] = None,
+        http_pool: Optional[HTTPPool] = HTTPPool(),
         **kwargs: Any,
     ):
         super().__init__(**kwargs)
@@ -55,6 +116,14 @@ class OpenAIClient(BaseLLMClient):
         self.request_limit = request_limit
         self.rpm = rpm or RPM()
         self.tpm = tpm or TPM()
+        # shared by every operator calling this client; None sends requests as
+        # soon as the rate limits allow
+        self.concurrency = concurrency
+        self.cache = cache
+        self._token_counts: OrderedDict[str, int] = OrderedDict()
+        # None keeps the own connection pool of the AsyncOpenAI client
+        self.http_pool = http_pool
+        self._pooled_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
         self.__post_init__()
 
@@ -75,21 +144,98 @@ class OpenAIClient(BaseLLMClient):
         if self.json_mode:
             kwargs["response_format"] = {"type": "json_object"}
 
-        messages = []
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-        messages.append({"role": "user", "content": text})
+        kwargs["messages"] = self._build_messages(text, history)
+        return kwargs
 
-        if history:
-            assert len(history) % 2 == 0, "History should have even number of elements."
-            messages = history + messages
+    def _get_client(self) -> AsyncOpenAI:
+        """The API client of the running event loop, on the shared pool if any."""
+        if self.http_pool is None:
+            return self.client
+        http_client = self.http_pool.get_client()
+        if http_client is None:
+            return self.client
+        loop = asyncio.get_running_loop()
+        client = self._pooled_clients.get(loop)
+        # the pool may have been closed and reopened since
+        # pylint: disable=protected-access
+        if client is None or client._client is not http_client:
+            client = self.client.with_options(
+                http_client=http_client, timeout=self.http_pool.timeout
+            )
+            self._pooled_clients[loop] = client
+        return client
 
-        kwargs["messages"] = messages
-        return kwargs
+    async def _open(self, **kwargs: Any):
+        """
+        Send a request, in a concurrency slot if `concurrency` is set.
+        :return: (response, start time); the caller must release the slot
+        """
+        if self.concurrency is not None:
+            await self.concurrency.acquire()
+        start = time.monotonic()
+        try:
+            # pylint: disable=E1125
+            response = await self._get_client().chat.completions.create(
+                model=self.model_name, **kwargs
+            )
+        except (RateLimitError, InternalServerError, APITimeoutError) as e:
+            self._release(overloaded=True, retry_after=get_retry_after(e))
+            raise
+        except BaseException:
+            self._release()
+            raise
+        return response, start
+
+    def _release(self, **kwargs: Any):
+        """Free the concurrency slot of a request, see `AdaptiveConcurrency.release`."""
+        if self.concurrency is not None:
+            self.concurrency.release(**kwargs)
+
+    async def _create(self, **kwargs: Any):
+        completion, start = await self._open(**kwargs)
+        self._release(latency=time.monotonic() - start)
+        return completion
+
+    async def _count_prompt_tokens(self, messages: List[Dict]) -> int:
+        """
+        Count the tokens of the messages. Counts are memoized per message, so a
+        growing history is only encoded once, and long messages are encoded in a
+        worker thread to keep the event loop free.
+        """
+        total = 0
+        for message in messages:
+            content = message["content"]
+            count = self._token_counts.get(content)
+            if count is None:
+                if len(content) >= self.ENCODE_IN_THREAD_CHARS:
+                    tokens = await asyncio.to_thread(self.tokenizer.encode, content)
+                else:
+                    tokens = self.tokenizer.encode(content)
+                count = len(tokens)
+                self._token_counts[content] = count
+                if len(self._token_counts) > self.MAX_MEMOIZED_COUNTS:
+                    self._token_counts.popitem(last=False)
+            else:
+                self._token_counts.move_to_end(content)
+            total += count
+        return total
+
+    def _cache_key(self, endpoint: str, kwargs: Dict) -> Optional[str]:
+        if self.cache is None or not self.cache.accepts(kwargs):
+            return None
+        # the same model name may be served differently by different servers
+        return self.cache.make_key(
+            {
+                "endpoint": endpoint,
+                "base_url": self.base_url,
+                "model": self.model_name,
+                **kwargs,
+            }
+        )
 
     @retry(
         stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_retry_after,
         retry=retry_if_exception_type(
             (RateLimitError, APIConnectionError, APITimeoutError)
         ),
@@ -108,17 +254,23 @@ class OpenAIClient(BaseLLMClient):
         # Limit max_tokens to 1 to avoid long completions
         kwargs["max_tokens"] = 1
 
-        completion = await self.client.chat.completions.create(  # pylint: disable=E1125
-            model=self.model_name, **kwargs
-        )
+        cache_key = self._cache_key("topk_per_token", kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return _load_tokens(cached)
+
+        completion = await self._create(**kwargs)
 
         tokens = get_top_response_tokens(completion)
 
+        if cache_key is not None:
+            self.cache.set(cache_key, _dump_tokens(tokens))
         return tokens
 
     @retry(
         stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
+        wait=wait_retry_after,
         retry=retry_if_exception_type(
             (RateLimitError, APIConnectionError, APITimeoutError)
         ),
@@ -131,27 +283,90 @@ class OpenAIClient(BaseLLMClient):
     ) -> str:
         kwargs = self._pre_generate(text, history)
 
-        prompt_tokens = 0
-        for message in kwargs["messages"]:
-            prompt_tokens += len(self.tokenizer.encode(message["content"]))
-        estimated_tokens = prompt_tokens + kwargs["max_tokens"]
+        cache_key = self._cache_key("answer", kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-        if self.request_limit:
-            await self.rpm.wait(silent=True)
-            await self.tpm.wait(estimated_tokens, silent=True)
+        estimated_tokens = await self._reserve_tokens(kwargs)
+        completion = await self._create(**kwargs)
+        if hasattr(completion, "usage"):
+            self._record_usage(completion.usage, estimated_tokens)
+        answer = self.filter_think_tags(completion.choices[0].message.content)
+        if cache_key is not None:
+            self.cache.set(cache_key, answer)
+        return answer
 
-        completion = await self.client.chat.completions.create(  # pylint: disable=E1125
-            model=self.model_name, **kwargs
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_retry_after,
+        retry=retry_if_exception_type(
+            (RateLimitError, APIConnectionError, APITimeoutError)
+        ),
+    )
+    async def _open_stream(self, **kwargs: Any):
+        return await self._open(
+            stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+
+    async def stream_answer(
+        self,
+        text: str,
+        history: Optional[List[str]] = None,
+        **extra: Any,
+    ) -> AsyncIterator[str]:
+        kwargs = self._pre_generate(text, history)
+
+        cache_key = self._cache_key("answer", kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        estimated_tokens = await self._reserve_tokens(kwargs)
+        # the slot is held until the whole answer has been received
+        stream, start = await self._open_stream(**kwargs)
+        parts = []
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    self._record_usage(chunk.usage, estimated_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        except BaseException:
+            self._release()
+            raise
+        self._release(latency=time.monotonic() - start)
+        if cache_key is not None:
+            self.cache.set(cache_key, self.filter_think_tags("".join(parts)))
+
+    async def _reserve_tokens(self, kwargs: Dict) -> Optional[int]:
+        """Wait for the rate limits; return the tokens reserved, if any."""
+        if not self.request_limit:
+            return None
+        estimated_tokens = (
+            await self._count_prompt_tokens(kwargs["messages"]) + kwargs["max_tokens"]
+        )
+        await acquire_all((self.rpm, 1), (self.tpm, estimated_tokens))
+        return estimated_tokens
+
+    def _record_usage(self, usage, estimated_tokens: Optional[int]):
+        if estimated_tokens is not None:
+            # the estimate reserves max_tokens, give back what was not used
+            self.tpm.release(max(0, estimated_tokens - usage.total_tokens))
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.token_usage.append(
+            {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+                # prompt tokens served from the server's prefix cache
+                "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            }
         )
-        if hasattr(completion, "usage"):
-            self.token_usage.append(
-                {
-                    "prompt_tokens": completion.usage.prompt_tokens,
-                    "completion_tokens": completion.usage.completion_tokens,
-                    "total_tokens": completion.usage.total_tokens,
-                }
-            )
-        return self.filter_think_tags(completion.choices[0].message.content)
 
     async def generate_inputs_prob(
         self, text: str, history: Optional[List[str]] = None, **extra: Any
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from graphgen.utils import logger
+
+
+class RequestBatcher:
+    """
+    Collect requests made concurrently and run them together.
+    A batch is run once `max_batch_size` requests are queued or `flush_interval`
+    seconds after its first request; several batches may run at the same time.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 1000,
+        flush_interval: float = 5.0,
+    ):
+        """
+        :param run_batch: runs a list of requests and returns their results in the
+            same order; a result that is an exception is raised to its caller
+        :param max_batch_size
+        :param flush_interval
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[tuple[Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, request: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+        return await future
+
+    def flush(self):
+        """Run the queued requests now."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._run(pending))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, pending: List[tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.run_batch([request for request, _ in pending])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Batch of %d requests failed: %s", len(pending), e)
+            results = [e] * len(pending)
+        for (_, future), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
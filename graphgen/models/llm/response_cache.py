@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+from typing import Any, Optional
+
+from graphgen.utils import compute_json_hash, logger
+
+
+class ResponseCache:
+    """
+    On-disk LLM response cache in `<working_dir>/<namespace>.sqlite`.
+    Responses are keyed by a hash of everything sent to the model, so a rerun
+    with unchanged inputs is served from disk. When the stored responses exceed
+    `max_bytes`, the least recently used ones are evicted.
+    Sampled requests (temperature > 0) are only cached with `cache_sampled`, since
+    a cached answer would otherwise hide the sampling.
+    """
+
+    def __init__(
+        self,
+        working_dir: str,
+        namespace: str = "llm_cache",
+        max_bytes: int = 1 << 30,
+        cache_sampled: bool = False,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_sampled = cache_sampled
+        self.hits, self.misses = 0, 0
+        os.makedirs(working_dir, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(working_dir, f"{namespace}.sqlite"),
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"
+        )
+        count, size, used = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(MAX(used), 0)"
+            " FROM responses"
+        ).fetchone()
+        self._size = size
+        # logical clock of the last use, ordering responses for eviction
+        self._clock = used
+        logger.info("Load LLM response cache with %d responses", count)
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        """Key of a request, given all the parameters sent to the model."""
+        return compute_json_hash(request, prefix="llm-")
+
+    def accepts(self, request: dict) -> bool:
+        return self.cache_sampled or not request.get("temperature")
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn.execute(
+            "SELECT value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clock += 1
+        self._conn.execute(
+            "UPDATE responses SET used = ? WHERE key = ?", (self._clock, key)
+        )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        dumped = json.dumps(value, ensure_ascii=False)
+        size = len(dumped.encode("utf-8"))
+        self._clock += 1
+        with self._conn:
+            self._conn.execute("BEGIN")
+            old = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, used)"
+                " VALUES (?, ?, ?, ?)",
+                (key, dumped, size, self._clock),
+            )
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Must be called inside a transaction."""
+        freed, keys = 0, []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY used"
+        ):
+            if self._size - freed <= self.max_bytes:
+                break
+            keys.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        self._size -= freed
+        logger.debug("Evicted %d LLM responses from the cache", len(keys))
+
+    def clear(self):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM responses")
+        self._size = 0
@@ -23,21 +23,20 @@ class BFSPartitioner(BasePartitioner):
         self,
         g: BaseGraphStorage,
         max_units_per_community: int = 1,
+        random_seed: int = 42,
         **kwargs: Any,
     ) -> List[Community]:
         nodes = await g.get_all_nodes()
-        edges = await g.get_all_edges()
+        edges = await g.get_all_edges_with_ids()
 
-        adj, _ = self._build_adjacency_list(nodes, edges)
+        adj, edge_map = self._build_edge_index(nodes, edges)
 
         used_n: set[str] = set()
-        used_e: set[frozenset[str]] = set()
+        used_e: set[int] = set()
         communities: List[Community] = []
 
-        units = [(NODE_UNIT, n[0]) for n in nodes] + [
-            (EDGE_UNIT, frozenset((u, v))) for u, v, _ in edges
-        ]
-        random.shuffle(units)
+        units = [(NODE_UNIT, n[0]) for n in nodes] + [(EDGE_UNIT, e[0]) for e in edges]
+        random.Random(random_seed).shuffle(units)
 
         for kind, seed in units:
             if (kind == NODE_UNIT and seed in used_n) or (
@@ -47,6 +46,7 @@ class BFSPartitioner(BasePartitioner):
 
             comm_n: List[str] = []
             comm_e: List[tuple[str, str]] = []
+            comm_e_ids: List[int] = []
             queue: deque[tuple[str, Any]] = deque([(kind, seed)])
             cnt = 0
 
@@ -58,26 +58,31 @@ class BFSPartitioner(BasePartitioner):
                     used_n.add(it)
                     comm_n.append(it)
                     cnt += 1
-                    for nei in adj[it]:
-                        e_key = frozenset((it, nei))
-                        if e_key not in used_e:
-                            queue.append((EDGE_UNIT, e_key))
+                    for _, e_id in adj[it]:
+                        if e_id not in used_e:
+                            queue.append((EDGE_UNIT, e_id))
                 else:
                     if it in used_e:
                         continue
                     used_e.add(it)
 
-                    u, v = it
+                    u, v, _ = edge_map[it]
                     comm_e.append((u, v))
+                    comm_e_ids.append(it)
                     cnt += 1
                     # push nodes that are not visited
-                    for n in it:
+                    for n in (u, v):
                         if n not in used_n:
                             queue.append((NODE_UNIT, n))
 
             if comm_n or comm_e:
                 communities.append(
-                    Community(id=len(communities), nodes=comm_n, edges=comm_e)
+                    Community(
+                        id=len(communities),
+                        nodes=comm_n,
+                        edges=comm_e,
+                        edge_ids=comm_e_ids,
+                    )
                 )
 
         return communities
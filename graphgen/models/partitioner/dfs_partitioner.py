@@ -22,21 +22,20 @@ class DFSPartitioner(BasePartitioner):
         self,
         g: BaseGraphStorage,
         max_units_per_community: int = 1,
+        random_seed: int = 42,
         **kwargs: Any,
     ) -> List[Community]:
         nodes = await g.get_all_nodes()
-        edges = await g.get_all_edges()
+        edges = await g.get_all_edges_with_ids()
 
-        adj, _ = self._build_adjacency_list(nodes, edges)
+        adj, edge_map = self._build_edge_index(nodes, edges)
 
         used_n: set[str] = set()
-        used_e: set[frozenset[str]] = set()
+        used_e: set[int] = set()
         communities: List[Community] = []
 
-        units = [(NODE_UNIT, n[0]) for n in nodes] + [
-            (EDGE_UNIT, frozenset((u, v))) for u, v, _ in edges
-        ]
-        random.shuffle(units)
+        units = [(NODE_UNIT, n[0]) for n in nodes] + [(EDGE_UNIT, e[0]) for e in edges]
+        random.Random(random_seed).shuffle(units)
 
         for kind, seed in units:
             if (kind == NODE_UNIT and seed in used_n) or (
@@ -44,7 +43,7 @@ class DFSPartitioner(BasePartitioner):
             ):
                 continue
 
-            comm_n, comm_e = [], []
+            comm_n, comm_e, comm_e_ids = [], [], []
             stack = [(kind, seed)]
             cnt = 0
 
@@ -56,25 +55,31 @@ class DFSPartitioner(BasePartitioner):
                     used_n.add(it)
                     comm_n.append(it)
                     cnt += 1
-                    for nei in adj[it]:
-                        e_key = frozenset((it, nei))
-                        if e_key not in used_e:
-                            stack.append((EDGE_UNIT, e_key))
+                    for _, e_id in adj[it]:
+                        if e_id not in used_e:
+                            stack.append((EDGE_UNIT, e_id))
                             break
                 else:
                     if it in used_e:
                         continue
                     used_e.add(it)
-                    comm_e.append(tuple(it))
+                    u, v, _ = edge_map[it]
+                    comm_e.append((u, v))
+                    comm_e_ids.append(it)
                     cnt += 1
                     # push neighboring nodes
-                    for n in it:
+                    for n in (u, v):
                         if n not in used_n:
                             stack.append((NODE_UNIT, n))
 
             if comm_n or comm_e:
                 communities.append(
-                    Community(id=len(communities), nodes=comm_n, edges=comm_e)
+                    Community(
+                        id=len(communities),
+                        nodes=comm_n,
+                        edges=comm_e,
+                        edge_ids=comm_e_ids,
+                    )
                 )
 
         return communities
@@ -28,16 +28,17 @@ class ECEPartitioner(BFSPartitioner):
     """
 
     @staticmethod
-    def _sort_units(units: list, edge_sampling: str) -> list:
+    def _sort_units(units: list, edge_sampling: str, rng: random.Random) -> list:
         """
         Sort units with edge sampling strategy
 
         :param units: total units
         :param edge_sampling: edge sampling strategy (random, min_loss, max_loss)
+        :param rng: random generator used by the random strategy
         :return: sorted units
         """
         if edge_sampling == "random":
-            random.shuffle(units)
+            rng.shuffle(units)
         elif edge_sampling == "min_loss":
             units = sorted(
                 units,
@@ -60,24 +61,25 @@ class ECEPartitioner(BFSPartitioner):
         min_units_per_community: int = 1,
         max_tokens_per_community: int = 10240,
         unit_sampling: str = "random",
+        random_seed: int = 42,
         **kwargs: Any,
     ) -> List[Community]:
         nodes: List[Tuple[str, dict]] = await g.get_all_nodes()
-        edges: List[Tuple[str, str, dict]] = await g.get_all_edges()
+        edges: List[Tuple[int, str, str, dict]] = await g.get_all_edges_with_ids()
 
-        adj, _ = self._build_adjacency_list(nodes, edges)
+        adj, edge_map = self._build_edge_index(nodes, edges)
         node_dict = dict(nodes)
-        edge_dict = {frozenset((u, v)): d for u, v, d in edges}
 
         all_units: List[Tuple[str, Any, dict]] = [
             (NODE_UNIT, nid, d) for nid, d in nodes
-        ] + [(EDGE_UNIT, frozenset((u, v)), d) for u, v, d in edges]
+        ] + [(EDGE_UNIT, e_id, d) for e_id, _, _, d in edges]
 
         used_n: Set[str] = set()
-        used_e: Set[frozenset[str]] = set()
+        used_e: Set[int] = set()
         communities: List = []
 
-        all_units = self._sort_units(all_units, unit_sampling)
+        rng = random.Random(random_seed)
+        all_units = self._sort_units(all_units, unit_sampling, rng)
 
         async def _grow_community(
             seed_unit: Tuple[str, Any, dict]
@@ -85,7 +87,7 @@ class ECEPartitioner(BFSPartitioner):
             nonlocal used_n, used_e
 
             community_nodes: Dict[str, dict] = {}
-            community_edges: Dict[frozenset[str], dict] = {}
+            community_edges: Dict[int, dict] = {}
             queue: asyncio.Queue = asyncio.Queue()
             token_sum = 0
 
@@ -121,16 +123,15 @@ class ECEPartitioner(BFSPartitioner):
 
                 neighbors: List[Tuple[str, Any, dict]] = []
                 if cur_type == NODE_UNIT:
-                    for nb_id in adj.get(cur_id, []):
-                        e_key = frozenset((cur_id, nb_id))
-                        if e_key not in used_e and e_key not in community_edges:
-                            neighbors.append((EDGE_UNIT, e_key, edge_dict[e_key]))
+                    for _, e_id in adj.get(cur_id, []):
+                        if e_id not in used_e and e_id not in community_edges:
+                            neighbors.append((EDGE_UNIT, e_id, edge_map[e_id][2]))
                 else:
-                    for n_id in cur_id:
+                    for n_id in edge_map[cur_id][:2]:
                         if n_id not in used_n and n_id not in community_nodes:
                             neighbors.append((NODE_UNIT, n_id, node_dict[n_id]))
 
-                neighbors = self._sort_units(neighbors, unit_sampling)
+                neighbors = self._sort_units(neighbors, unit_sampling, rng)
                 for nb in neighbors:
                     if (
                         len(community_nodes) + len(community_edges)
@@ -147,7 +148,8 @@ class ECEPartitioner(BFSPartitioner):
             return Community(
                 id=len(communities),
                 nodes=list(community_nodes.keys()),
-                edges=[(u, v) for (u, v), _ in community_edges.items()],
+                edges=[edge_map[e_id][:2] for e_id in community_edges],
+                edge_ids=list(community_edges),
             )
 
         async for unit in tqdm_async(all_units, desc="ECE partition"):
@@ -1,6 +1,6 @@
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Dict, List, Tuple
 
 import igraph as ig
 from leidenalg import ModularityVertexPartition, find_partition
@@ -37,10 +37,10 @@ class LeidenPartitioner(BasePartitioner):
         :return:
         """
         nodes = await g.get_all_nodes()  # List[Tuple[str, dict]]
-        edges = await g.get_all_edges()  # List[Tuple[str, str, dict]]
+        edges = await g.get_all_edges_with_ids()  # List[Tuple[int, str, str, dict]]
 
         node2cid: Dict[str, int] = await self._run_leiden(
-            nodes, edges, use_lcc, random_seed
+            nodes, [e[1:] for e in edges], use_lcc, random_seed
         )
 
         if max_size is not None and max_size > 0:
@@ -50,13 +50,24 @@ class LeidenPartitioner(BasePartitioner):
         for n, cid in node2cid.items():
             cid2nodes[cid].append(n)
 
+        # an edge belongs to a community when both of its ends do
+        cid2edges: Dict[int, List[Tuple[int, str, str]]] = defaultdict(list)
+        for e_id, u, v, _ in edges:
+            cid = node2cid.get(u)
+            if cid is not None and node2cid.get(v) == cid:
+                cid2edges[cid].append((e_id, u, v))
+
         communities: List[Community] = []
         for cid, nodes in cid2nodes.items():
-            node_set: Set[str] = set(nodes)
-            comm_edges: List[Tuple[str, str]] = [
-                (u, v) for u, v, _ in edges if u in node_set and v in node_set
-            ]
-            communities.append(Community(id=cid, nodes=nodes, edges=comm_edges))
+            comm_edges = cid2edges.get(cid, [])
+            communities.append(
+                Community(
+                    id=cid,
+                    nodes=nodes,
+                    edges=[(u, v) for _, u, v in comm_edges],
+                    edge_ids=[e_id for e_id, _, _ in comm_edges],
+                )
+            )
         return communities
 
     @staticmethod
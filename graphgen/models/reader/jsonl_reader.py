@@ -1,5 +1,5 @@
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from graphgen.bases.base_reader import BaseReader
 from graphgen.utils import logger
@@ -7,17 +7,18 @@ from graphgen.utils import logger
 
 class JSONLReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
-        docs = []
+        return list(self.iter_read(file_path))
+
+    def iter_read(self, file_path: str) -> Iterator[Dict[str, Any]]:
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
                 try:
                     doc = json.loads(line)
                     if self.text_column in doc:
-                        docs.append(doc)
+                        yield doc
                     else:
                         raise ValueError(
                             f"Missing '{self.text_column}' in document: {doc}"
                         )
                 except json.JSONDecodeError as e:
                     logger.error("Error decoding JSON line: %s. Error: %s", line, e)
-        return docs
@@ -1,14 +1,15 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from graphgen.bases.base_reader import BaseReader
 
 
 class TXTReader(BaseReader):
     def read(self, file_path: str) -> List[Dict[str, Any]]:
-        docs = []
+        return list(self.iter_read(file_path))
+
+    def iter_read(self, file_path: str) -> Iterator[Dict[str, Any]]:
         with open(file_path, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if line:
-                    docs.append({self.text_column: line})
-        return docs
+                    yield {self.text_column: line}
@@ -1,2 +1,6 @@
+from .csr_graph_storage import CSRGraphStorage
 from .json_storage import JsonKVStorage, JsonListStorage
+from .jsonl_storage import JsonlListStorage
+from .log_kv_storage import LogKVStorage
 from .networkx_storage import NetworkXStorage
+from .sqlite_storage import SQLiteKVStorage, SQLiteListStorage
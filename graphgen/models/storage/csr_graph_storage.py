@@ -0,0 +1,505 @@
+import json
+import os
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Union
+
+import networkx as nx
+import numpy as np
+
+from graphgen.bases.base_storage import BaseGraphStorage
+from graphgen.models.storage.graph_snapshot import (
+    SNAPSHOT_VERSION,
+    encode_graph,
+    read_snapshot_arrays,
+    unpack_strings,
+)
+from graphgen.utils import logger
+
+_MISSING = object()
+
+_NUMERIC_DTYPES = {"int": np.int64, "float": np.float64, "bool": np.bool_}
+
+
+def _value_kind(value: Any) -> Optional[str]:
+    """Kind of the column that can hold `value`, or None if it goes to overflow."""
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -(2**63) <= value < 2**63 else None
+    if isinstance(value, float):
+        return "float"
+    return None
+
+
+class _Strings:
+    """Interned strings: one shared blob sliced on access, plus strings added later."""
+
+    def __init__(self, blob: str, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.base = len(offsets) - 1
+        self.added: list[str] = []
+        self._added_ids: dict[str, int] = {}
+
+    def get(self, idx: int) -> str:
+        if idx < self.base:
+            return self.blob[self.offsets[idx] : self.offsets[idx + 1]]
+        return self.added[idx - self.base]
+
+    def add(self, value: str) -> int:
+        idx = self._added_ids.get(value)
+        if idx is None:
+            idx = self._added_ids[value] = self.base + len(self.added)
+            self.added.append(value)
+        return idx
+
+
+class _Column:
+    """
+    One attribute column. `str` / `json` columns hold string ids (-1 = missing),
+    numeric columns hold values plus a presence mask. `null` marks the rows whose
+    value is an explicit None.
+    """
+
+    __slots__ = ("kind", "values", "mask", "null")
+
+    def __init__(
+        self,
+        kind: str,
+        values: np.ndarray,
+        mask: np.ndarray = None,
+        null: np.ndarray = None,
+    ):
+        self.kind = kind
+        self.values = values
+        self.mask = mask
+        self.null = null
+
+    @classmethod
+    def empty(cls, kind: str, size: int) -> "_Column":
+        if kind == "str":
+            return cls(kind, np.full(size, -1, dtype=np.int64))
+        return cls(
+            kind, np.zeros(size, dtype=_NUMERIC_DTYPES[kind]), np.zeros(size, bool)
+        )
+
+    def get(self, row: int, strings: _Strings):
+        if self.null is not None and self.null[row]:
+            return None
+        if self.mask is None:
+            idx = int(self.values[row])
+            if idx < 0:
+                return _MISSING
+            value = strings.get(idx)
+            return json.loads(value) if self.kind == "json" else value
+        if not self.mask[row]:
+            return _MISSING
+        return self.values[row].item()
+
+    def set(self, row: int, value: Any, strings: _Strings) -> bool:
+        """Store `value` if it fits the column type, return whether it did."""
+        if _value_kind(value) != self.kind:
+            return False
+        if self.null is not None:
+            self.null[row] = False
+        if self.kind == "str":
+            self.values[row] = strings.add(value)
+        else:
+            self.values[row] = value
+            self.mask[row] = True
+        return True
+
+    def clear(self, row: int):
+        if self.null is not None:
+            self.null[row] = False
+        if self.mask is None:
+            self.values[row] = -1
+        else:
+            self.mask[row] = False
+
+
+class _AttrTable:
+    """
+    Columnar attributes of nodes or edges. A value that does not fit its column
+    (e.g. an int written to a str column) is kept in a per-row overflow dict.
+    """
+
+    def __init__(self, size: int, strings: _Strings):
+        self.size = size
+        self.strings = strings
+        self.columns: dict[str, _Column] = {}
+        self.overflow: dict[int, dict] = {}
+
+    @classmethod
+    def from_snapshot(
+        cls, columns: list, arrays: dict, size: int, strings: _Strings
+    ) -> "_AttrTable":
+        table = cls(size, strings)
+        for column in columns:
+            name = column["name"]
+            table.columns[column["key"]] = _Column(
+                column["kind"],
+                arrays[f"{name}_values"],
+                arrays.get(f"{name}_mask"),
+                arrays.get(f"{name}_null"),
+            )
+        return table
+
+    def get(self, row: int, key: str):
+        column = self.columns.get(key)
+        if column is not None:
+            value = column.get(row, self.strings)
+            if value is not _MISSING:
+                return value
+        return self.overflow.get(row, {}).get(key, _MISSING)
+
+    def keys(self, row: int) -> list[str]:
+        keys = [
+            key
+            for key, column in self.columns.items()
+            if column.get(row, self.strings) is not _MISSING
+        ]
+        keys.extend(k for k in self.overflow.get(row, {}) if k not in keys)
+        return keys
+
+    def set(self, row: int, key: str, value: Any):
+        column = self.columns.get(key)
+        if column is None:
+            kind = _value_kind(value)
+            if kind is not None:
+                column = self.columns[key] = _Column.empty(kind, self.size)
+        if column is not None and column.set(row, value, self.strings):
+            extra = self.overflow.get(row)
+            if extra is not None:
+                extra.pop(key, None)
+            return
+        if column is not None:
+            column.clear(row)
+        self.overflow.setdefault(row, {})[key] = value
+
+    def delete(self, row: int, key: str):
+        if self.get(row, key) is _MISSING:
+            raise KeyError(key)
+        if key in self.columns:
+            self.columns[key].clear(row)
+        self.overflow.get(row, {}).pop(key, None)
+
+
+class _RowView(MutableMapping):
+    """Dict-like view of one node or edge; writes go through to the columns."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: _AttrTable, row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key: str):
+        value = self._table.get(self._row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self._table.set(self._row, key, value)
+
+    def __delitem__(self, key: str):
+        self._table.delete(self._row, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.keys(self._row))
+
+    def __len__(self) -> int:
+        return len(self._table.keys(self._row))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+@dataclass
+class CSRGraphStorage(BaseGraphStorage):
+    """
+    Compact, read-mostly graph storage on NumPy arrays.
+
+    Node ids are interned once, adjacency is kept in CSR form (`indptr` / `indices`,
+    neighbours sorted per node so edge lookup is a binary search), and attributes
+    (`length`, `loss`, `entity_type`, `source_id`, ...) live in typed columns that
+    share one string table. Nodes and edges are returned as dict-like views over
+    the columns instead of per-element dicts.
+
+    Attributes of existing nodes and edges can be updated, but the structure is
+    fixed: adding nodes or edges and deleting nodes raise NotImplementedError.
+    Build it from a graph snapshot, a networkx graph, or another graph storage; with
+    `load_snapshot`, `<namespace>.snapshot.npz` in `working_dir` is loaded on init.
+    The storage is in memory only, `index_done_callback` does not persist updates.
+    """
+
+    load_snapshot: bool = False
+
+    def __post_init__(self):
+        self._load(*encode_graph(nx.Graph()))
+        if (
+            self.load_snapshot
+            and self.working_dir is not None
+            and self.namespace is not None
+        ):
+            snapshot_file = os.path.join(
+                self.working_dir, f"{self.namespace}.snapshot.npz"
+            )
+            if os.path.exists(snapshot_file):
+                self._load(*read_snapshot_arrays(snapshot_file))
+                logger.info(
+                    "Loaded graph from %s with %d nodes, %d edges",
+                    snapshot_file,
+                    len(self._names),
+                    len(self._edge_src),
+                )
+
+    @classmethod
+    def from_snapshot(cls, file_name: str, **kwargs) -> "CSRGraphStorage":
+        storage = cls(**kwargs)
+        storage._load(*read_snapshot_arrays(file_name))
+        return storage
+
+    @classmethod
+    def from_networkx(
+        cls, graph: nx.Graph, edge_ids: list[int] = None, **kwargs
+    ) -> "CSRGraphStorage":
+        """
+        :param graph
+        :param edge_ids: canonical ids of the edges in `graph.edges` order,
+            defaults to their positions
+        """
+        storage = cls(**kwargs)
+        storage._load(*encode_graph(graph, edge_ids))
+        return storage
+
+    @classmethod
+    async def from_graph_storage(cls, g: BaseGraphStorage) -> "CSRGraphStorage":
+        """Build a compact copy of another graph storage, keeping its edge ids."""
+        edges = await g.get_all_edges_with_ids()
+        if hasattr(g, "get_graph"):
+            # edges come in the graph's own edge order
+            graph = await g.get_graph()
+        else:
+            graph = nx.Graph()
+            graph.add_nodes_from(await g.get_all_nodes())
+            graph.add_edges_from((u, v, d) for _, u, v, d in edges)
+        return cls.from_networkx(
+            graph,
+            edge_ids=[edge_id for edge_id, _, _, _ in edges],
+            working_dir=g.working_dir,
+            namespace=g.namespace,
+        )
+
+    def _load(self, meta: dict, arrays: dict[str, np.ndarray]):
+        if meta["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported graph snapshot version: {meta['version']}")
+        self._directed = meta["directed"]
+        self._strings = _Strings(*unpack_strings(arrays))
+        self._names = [self._strings.get(i) for i in arrays["node_ids"].tolist()]
+        self._node_index = {name: i for i, name in enumerate(self._names)}
+        self._edge_src = arrays["edge_src"].astype(np.int32)
+        self._edge_tgt = arrays["edge_tgt"].astype(np.int32)
+        # edge ids default to positions; otherwise keep them sorted for lookup
+        self._edge_ids = arrays.get("edge_ids")
+        if self._edge_ids is not None:
+            self._id_order = np.argsort(self._edge_ids, kind="stable")
+            self._sorted_ids = self._edge_ids[self._id_order]
+        self._nodes = _AttrTable.from_snapshot(
+            meta["node_columns"], arrays, len(self._names), self._strings
+        )
+        self._edges = _AttrTable.from_snapshot(
+            meta["edge_columns"], arrays, len(self._edge_src), self._strings
+        )
+        self._build_adjacency()
+
+    def _build_adjacency(self):
+        n = len(self._names)
+        src, tgt = self._edge_src, self._edge_tgt
+        edge_ids = np.arange(len(src), dtype=np.int32)
+        if self._directed:
+            rows, cols, ids = src, tgt, edge_ids
+        else:
+            loops = src == tgt
+            rows = np.concatenate([src, tgt[~loops]])
+            cols = np.concatenate([tgt, src[~loops]])
+            ids = np.concatenate([edge_ids, edge_ids[~loops]])
+        order = np.lexsort((cols, rows))
+        self._indices = cols[order]
+        self._adj_edges = ids[order]
+        self._indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self._indptr[1:])
+        self._degree = np.bincount(src, minlength=n) + np.bincount(tgt, minlength=n)
+
+    def _find_edge(self, source_node_id: str, target_node_id: str) -> int:
+        """Position of the edge in the edge columns, or -1."""
+        u = self._node_index.get(source_node_id)
+        v = self._node_index.get(target_node_id)
+        if u is None or v is None:
+            return -1
+        start, end = self._indptr[u], self._indptr[u + 1]
+        pos = start + np.searchsorted(self._indices[start:end], v)
+        if pos < end and self._indices[pos] == v:
+            return int(self._adj_edges[pos])
+        return -1
+
+    async def has_node(self, node_id: str) -> bool:
+        return node_id in self._node_index
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return self._find_edge(source_node_id, target_node_id) >= 0
+
+    async def node_degree(self, node_id: str) -> int:
+        return int(self._degree[self._node_index[node_id]])
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_node(self, node_id: str) -> Union[dict, None]:
+        row = self._node_index.get(node_id)
+        return None if row is None else _RowView(self._nodes, row)
+
+    async def get_all_nodes(self) -> Union[list[tuple[str, dict]], None]:
+        return [
+            (name, _RowView(self._nodes, row)) for row, name in enumerate(self._names)
+        ]
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> Union[dict, None]:
+        edge = self._find_edge(source_node_id, target_node_id)
+        return None if edge < 0 else _RowView(self._edges, edge)
+
+    async def get_all_edges(self) -> Union[list[tuple[str, str, dict]], None]:
+        names = self._names
+        return [
+            (names[u], names[v], _RowView(self._edges, edge))
+            for edge, (u, v) in enumerate(
+                zip(self._edge_src.tolist(), self._edge_tgt.tolist())
+            )
+        ]
+
+    def _edge_position(self, edge_id: int) -> int:
+        if self._edge_ids is None:
+            return edge_id if 0 <= edge_id < len(self._edge_src) else -1
+        pos = np.searchsorted(self._sorted_ids, edge_id)
+        if pos < len(self._sorted_ids) and self._sorted_ids[pos] == edge_id:
+            return int(self._id_order[pos])
+        return -1
+
+    async def get_all_edges_with_ids(self) -> list[tuple[int, str, str, dict]]:
+        edge_ids = (
+            range(len(self._edge_src))
+            if self._edge_ids is None
+            else self._edge_ids.tolist()
+        )
+        return [
+            (edge_id, u, v, data)
+            for edge_id, (u, v, data) in zip(edge_ids, await self.get_all_edges())
+        ]
+
+    async def get_edges_by_ids(
+        self, edge_ids: list[int]
+    ) -> list[Union[tuple[str, str, dict], None]]:
+        results = []
+        for edge_id in edge_ids:
+            edge = self._edge_position(edge_id)
+            results.append(
+                None
+                if edge < 0
+                else (
+                    self._names[self._edge_src[edge]],
+                    self._names[self._edge_tgt[edge]],
+                    _RowView(self._edges, edge),
+                )
+            )
+        return results
+
+    async def get_node_edges(
+        self, source_node_id: str
+    ) -> Union[list[tuple[str, str]], None]:
+        u = self._node_index.get(source_node_id)
+        if u is None:
+            return None
+        start, end = self._indptr[u], self._indptr[u + 1]
+        return [
+            (source_node_id, self._names[v], _RowView(self._edges, edge))
+            for v, edge in zip(
+                self._indices[start:end].tolist(), self._adj_edges[start:end].tolist()
+            )
+        ]
+
+    async def update_node(self, node_id: str, node_data: dict[str, str]):
+        row = self._node_index.get(node_id)
+        if row is None:
+            logger.warning("Node %s not found in the graph for update.", node_id)
+            return
+        for key, value in list(node_data.items()):
+            self._nodes.set(row, key, value)
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        rows = [self._node_index.get(node_id) for node_id in node_ids]
+        return [None if row is None else _RowView(self._nodes, row) for row in rows]
+
+    async def update_nodes(self, nodes: dict[str, dict]):
+        missing = 0
+        for node_id, node_data in nodes.items():
+            row = self._node_index.get(node_id)
+            if row is None:
+                missing += 1
+                continue
+            for key, value in list(node_data.items()):
+                self._nodes.set(row, key, value)
+        if missing:
+            logger.warning("%d nodes not found in the graph for update.", missing)
+
+    async def update_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        edge = self._find_edge(source_node_id, target_node_id)
+        if edge < 0:
+            logger.warning(
+                "Edge %s -> %s not found in the graph for update.",
+                source_node_id,
+                target_node_id,
+            )
+            return
+        for key, value in list(edge_data.items()):
+            self._edges.set(edge, key, value)
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        edges = [self._find_edge(src, tgt) for src, tgt in edge_pairs]
+        return [None if edge < 0 else _RowView(self._edges, edge) for edge in edges]
+
+    async def update_edges(self, edges: dict[tuple[str, str], dict]):
+        missing = 0
+        for (src, tgt), edge_data in edges.items():
+            edge = self._find_edge(src, tgt)
+            if edge < 0:
+                missing += 1
+                continue
+            for key, value in list(edge_data.items()):
+                self._edges.set(edge, key, value)
+        if missing:
+            logger.warning("%d edges not found in the graph for update.", missing)
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        if node_id not in self._node_index:
+            raise NotImplementedError("CSRGraphStorage cannot add nodes")
+        await self.update_node(node_id, node_data)
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        if self._find_edge(source_node_id, target_node_id) < 0:
+            raise NotImplementedError("CSRGraphStorage cannot add edges")
+        await self.update_edge(source_node_id, target_node_id, edge_data)
+
+    async def delete_node(self, node_id: str):
+        raise NotImplementedError("CSRGraphStorage cannot delete nodes")
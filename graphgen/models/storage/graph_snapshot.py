@@ -0,0 +1,252 @@
+"""
+Columnar binary snapshot format for networkx graphs.
+
+A snapshot is an uncompressed ``.npz`` archive (no pickling) holding:
+- ``strings`` / ``string_offsets``: every node id and string attribute value, interned
+  once and stored as one utf-8 blob plus character offsets;
+- ``node_ids``: string ids of the nodes, ``edge_src`` / ``edge_tgt``: node positions,
+  and optionally ``edge_ids``: caller-assigned integer ids of the edges;
+- one column per attribute key, described in the ``meta`` JSON blob. A key whose
+  values have several types (e.g. ints and floats) gets a ``json`` column. ``str``
+  and ``json`` columns hold string ids (-1 = missing), ``int`` / ``float`` / ``bool``
+  columns hold values plus a presence mask. Columns with ``None`` values also hold
+  a ``null`` mask, so that an explicit ``None`` is told apart from a missing key.
+  ``meta`` also carries caller-provided ``extra`` metadata, readable without
+  loading the columns.
+"""
+
+import json
+import os
+from typing import Any, Optional
+
+import networkx as nx
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+_MISSING = object()
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.strings: list[str] = []
+
+    def intern(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self.ids[value] = idx
+            self.strings.append(value)
+        return idx
+
+
+def _pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    blob = "".join(strings).encode("utf-8")
+    return np.frombuffer(blob, dtype=np.uint8), offsets
+
+
+def _column_kind(values: list) -> str:
+    kinds = set()
+    for v in values:
+        if v is _MISSING or v is None:
+            continue
+        if isinstance(v, str):
+            kinds.add("str")
+        elif isinstance(v, bool):
+            kinds.add("bool")
+        elif isinstance(v, int) and -(2**63) <= v < 2**63:
+            kinds.add("int")
+        elif isinstance(v, float):
+            kinds.add("float")
+        else:
+            kinds.add("json")
+    if len(kinds) == 1:
+        return kinds.pop()
+    return "json"
+
+
+def _encode_column(values: list, kind: str, table: _StringTable) -> dict:
+    nulls = [v is None for v in values]
+    values = [_MISSING if v is None else v for v in values]
+    if kind in ("str", "json"):
+        dump = (lambda v: v) if kind == "str" else json.dumps
+        ids = [-1 if v is _MISSING else table.intern(dump(v)) for v in values]
+        column = {"values": np.asarray(ids, dtype=np.int64)}
+    else:
+        mask = np.asarray([v is not _MISSING for v in values], dtype=np.bool_)
+        dtype = {"int": np.int64, "float": np.float64, "bool": np.bool_}[kind]
+        data = np.asarray([0 if v is _MISSING else v for v in values], dtype=dtype)
+        column = {"values": data, "mask": mask}
+    if any(nulls):
+        column["null"] = np.asarray(nulls, dtype=np.bool_)
+    return column
+
+
+def _encode_attrs(
+    rows: list[dict], prefix: str, table: _StringTable, arrays: dict
+) -> list[dict]:
+    keys: dict[str, None] = {}
+    for row in rows:
+        for key in row:
+            keys.setdefault(key)
+    columns = []
+    for i, key in enumerate(keys):
+        values = [row.get(key, _MISSING) for row in rows]
+        kind = _column_kind(values)
+        for part, array in _encode_column(values, kind, table).items():
+            arrays[f"{prefix}_{i}_{part}"] = array
+        columns.append({"key": key, "kind": kind, "name": f"{prefix}_{i}"})
+    return columns
+
+
+def encode_graph(
+    graph: nx.Graph, edge_ids: list[int] = None
+) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Encode a graph into snapshot columns without writing it.
+    :param graph
+    :param edge_ids: ids of the edges, in `graph.edges` order
+    :return: (meta, arrays), as returned by `read_snapshot_arrays`
+    """
+    table = _StringTable()
+    nodes = list(graph.nodes(data=True))
+    node_pos = {node: i for i, (node, _) in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+
+    arrays: dict[str, np.ndarray] = {
+        "node_ids": np.asarray(
+            [table.intern(str(node)) for node, _ in nodes], dtype=np.int64
+        ),
+        "edge_src": np.asarray([node_pos[u] for u, _, _ in edges], dtype=np.int64),
+        "edge_tgt": np.asarray([node_pos[v] for _, v, _ in edges], dtype=np.int64),
+    }
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "directed": graph.is_directed(),
+        "node_columns": _encode_attrs([d for _, d in nodes], "node", table, arrays),
+        "edge_columns": _encode_attrs([d for _, _, d in edges], "edge", table, arrays),
+    }
+    if edge_ids is not None:
+        arrays["edge_ids"] = np.asarray(edge_ids, dtype=np.int64)
+    arrays["strings"], arrays["string_offsets"] = _pack_strings(table.strings)
+    return meta, arrays
+
+
+def write_graph_snapshot(
+    graph: nx.Graph, file_name: str, extra: dict = None, edge_ids: list[int] = None
+):
+    """
+    Write the graph to `file_name` atomically.
+    :param graph
+    :param file_name
+    :param extra: JSON-serializable metadata stored with the snapshot
+    :param edge_ids: ids of the edges, in `graph.edges` order
+    """
+    meta, arrays = encode_graph(graph, edge_ids)
+    meta["extra"] = extra or {}
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    tmp_name = file_name + ".tmp"
+    with open(tmp_name, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)
+
+
+def read_snapshot_extra(file_name: str) -> dict:
+    """Read only the `extra` metadata of a snapshot."""
+    with np.load(file_name, allow_pickle=False) as npz:
+        meta = json.loads(npz["meta"].tobytes().decode("utf-8"))
+    return meta.get("extra", {})
+
+
+def read_snapshot_edge_ids(file_name: str) -> Optional[list[int]]:
+    """Read only the edge ids of a snapshot, in edge order, if it has them."""
+    with np.load(file_name, allow_pickle=False) as npz:
+        if "edge_ids" not in npz.files:
+            return None
+        return npz["edge_ids"].tolist()
+
+
+def read_snapshot_arrays(file_name: str) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Read the raw columns of a snapshot.
+    :return: (meta, arrays)
+    """
+    with np.load(file_name, allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    meta = json.loads(arrays.pop("meta").tobytes().decode("utf-8"))
+    return meta, arrays
+
+
+def unpack_strings(arrays: dict[str, np.ndarray]) -> tuple[str, np.ndarray]:
+    """
+    :return: (blob, offsets), string i is `blob[offsets[i]:offsets[i + 1]]`
+    """
+    return arrays["strings"].tobytes().decode("utf-8"), arrays["string_offsets"]
+
+
+def decode_column(
+    column: dict, arrays: dict[str, np.ndarray], strings: list, missing: Any = None
+) -> list[Any]:
+    """
+    Decode one attribute column into a list of values.
+    :param column
+    :param arrays
+    :param strings
+    :param missing: value for rows without the attribute
+    :return: the values, `None` for explicit null values
+    """
+    name = column["name"]
+    values = arrays[f"{name}_values"].tolist()
+    kind = column["kind"]
+    if kind == "str":
+        decoded = [strings[v] if v >= 0 else missing for v in values]
+    elif kind == "json":
+        decoded = [json.loads(strings[v]) if v >= 0 else missing for v in values]
+    else:
+        mask = arrays[f"{name}_mask"].tolist()
+        decoded = [v if present else missing for v, present in zip(values, mask)]
+    if f"{name}_null" in arrays:
+        for i in np.flatnonzero(arrays[f"{name}_null"]).tolist():
+            decoded[i] = None
+    return decoded
+
+
+def _decode_rows(columns: list, arrays: dict, strings: list, size: int) -> list[dict]:
+    rows: list[dict] = [{} for _ in range(size)]
+    for column in columns:
+        key = column["key"]
+        for row, value in zip(rows, decode_column(column, arrays, strings, _MISSING)):
+            if value is not _MISSING:
+                row[key] = value
+    return rows
+
+
+def read_graph_snapshot(file_name: str) -> nx.Graph:
+    """Read a snapshot written by `write_graph_snapshot`."""
+    meta, arrays = read_snapshot_arrays(file_name)
+    blob, offsets = unpack_strings(arrays)
+    offsets = offsets.tolist()
+    strings = [blob[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+    if meta["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported graph snapshot version: {meta['version']}")
+
+    node_names = [strings[i] for i in arrays["node_ids"].tolist()]
+    edge_src = arrays["edge_src"].tolist()
+    edge_tgt = arrays["edge_tgt"].tolist()
+    node_rows = _decode_rows(meta["node_columns"], arrays, strings, len(node_names))
+    edge_rows = _decode_rows(meta["edge_columns"], arrays, strings, len(edge_src))
+
+    graph = nx.DiGraph() if meta["directed"] else nx.Graph()
+    graph.add_nodes_from(zip(node_names, node_rows))
+    graph.add_edges_from(
+        (node_names[u], node_names[v], d)
+        for u, v, d in zip(edge_src, edge_tgt, edge_rows)
+    )
+    return graph
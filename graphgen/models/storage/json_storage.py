@@ -1,8 +1,9 @@
+import hashlib
 import os
 from dataclasses import dataclass
 
 from graphgen.bases.base_storage import BaseKVStorage, BaseListStorage
-from graphgen.utils import load_json, logger, write_json
+from graphgen.utils import compute_json_hash, load_json, logger, write_json
 
 
 @dataclass
@@ -51,13 +52,43 @@ class JsonKVStorage(BaseKVStorage):
         self._data = {}
 
 
+def _file_checksum(file_name: str) -> str:
+    if not os.path.exists(file_name):
+        return ""
+    md5 = hashlib.md5()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
 @dataclass
 class JsonListStorage(BaseListStorage):
+    """
+    List storage kept in `<namespace>.json`.
+    A set of content hashes (see `compute_json_hash`) makes `upsert` dedup O(1) per
+    item; it is persisted to `<namespace>.index.json` together with a checksum of
+    the data file, and rebuilt if the data file was changed since.
+    """
+
     _data: list = None
 
     def __post_init__(self):
         self._file_name = os.path.join(self.working_dir, f"{self.namespace}.json")
+        self._index_file_name = os.path.join(
+            self.working_dir, f"{self.namespace}.index.json"
+        )
         self._data = load_json(self._file_name) or []
+
+        index = load_json(self._index_file_name)
+        if (
+            index is not None
+            and index.get("size") == len(self._data)
+            and index.get("checksum") == _file_checksum(self._file_name)
+        ):
+            self._hashes = set(index["hashes"])
+        else:
+            self._hashes = {compute_json_hash(d) for d in self._data}
         logger.info("Load List %s with %d data", self.namespace, len(self._data))
 
     @property
@@ -69,6 +100,14 @@ class JsonListStorage(BaseListStorage):
 
     async def index_done_callback(self):
         write_json(self._data, self._file_name)
+        write_json(
+            {
+                "size": len(self._data),
+                "checksum": _file_checksum(self._file_name),
+                "hashes": list(self._hashes),
+            },
+            self._index_file_name,
+        )
 
     async def get_by_index(self, index: int):
         if index < 0 or index >= len(self._data):
@@ -77,11 +116,15 @@ class JsonListStorage(BaseListStorage):
 
     async def append(self, data):
         self._data.append(data)
+        self._hashes.add(compute_json_hash(data))
 
     async def upsert(self, data: list):
-        left_data = [d for d in data if d not in self._data]
+        hashes = [compute_json_hash(d) for d in data]
+        left_data = [d for d, h in zip(data, hashes) if h not in self._hashes]
         self._data.extend(left_data)
+        self._hashes.update(hashes)
         return left_data
 
     async def drop(self):
         self._data = []
+        self._hashes = set()
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+
+from graphgen.bases.base_storage import BaseListStorage
+from graphgen.utils import compute_json_hash, logger
+
+
+@dataclass
+class JsonlListStorage(BaseListStorage):
+    """
+    Append-only list storage in `<namespace>.jsonl`, one item per line.
+    Items are written as soon as they are added and only their hashes are kept in
+    memory, so memory does not grow with the size of the items.
+
+    Every write is recorded in `<namespace>.commits` with the data size after it and
+    an optional key. A reopened storage drops data past the last recorded write, so
+    a batch of items written under a key is either fully there or not at all, and
+    callers can resume by skipping the keys that `filter_keys` does not return.
+    Files are fsynced every `fsync_interval` seconds and on `index_done_callback`.
+    """
+
+    fsync_interval: float = 5.0
+
+    def __post_init__(self):
+        self._file_name = os.path.join(self.working_dir, f"{self.namespace}.jsonl")
+        self._commit_file_name = os.path.join(
+            self.working_dir, f"{self.namespace}.commits"
+        )
+        self._writer: Optional[BinaryIO] = None
+        self._commit_writer: Optional[BinaryIO] = None
+        self._last_sync = time.monotonic()
+        self._load()
+        logger.info("Load List %s with %d data", self.namespace, self._count)
+
+    def _load(self):
+        self._hashes: set[str] = set()
+        self._keys: set[str] = set()
+        self._size, self._count = 0, 0
+        if not os.path.exists(self._file_name):
+            return
+
+        size = os.path.getsize(self._file_name)
+        if os.path.exists(self._commit_file_name):
+            committed, offset = 0, 0
+            with open(self._commit_file_name, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    commit = json.loads(line)
+                    committed = commit["size"]
+                    if commit["key"] is not None:
+                        self._keys.add(commit["key"])
+                    offset += len(line)
+            _truncate(self._commit_file_name, offset)
+            size = min(size, committed)
+
+        with open(self._file_name, "rb") as f:
+            for line in f:
+                if self._size + len(line) > size or not line.endswith(b"\n"):
+                    break
+                self._hashes.add(compute_json_hash(json.loads(line)))
+                self._size += len(line)
+                self._count += 1
+        if self._size != os.path.getsize(self._file_name):
+            logger.warning(
+                "Dropping uncommitted data at %s:%d", self._file_name, self._size
+            )
+            _truncate(self._file_name, self._size)
+
+    def _write(self, items: list, key: str = None):
+        if self._writer is None:
+            os.makedirs(self.working_dir, exist_ok=True)
+            # pylint: disable=consider-using-with
+            self._writer = open(self._file_name, "ab")
+            self._commit_writer = open(self._commit_file_name, "ab")
+        self._writer.write(
+            "".join(json.dumps(d, ensure_ascii=False) + "\n" for d in items).encode(
+                "utf-8"
+            )
+        )
+        self._writer.flush()
+        self._size = self._writer.tell()
+        self._count += len(items)
+        self._commit_writer.write(
+            (
+                json.dumps({"size": self._size, "key": key}, ensure_ascii=False) + "\n"
+            ).encode("utf-8")
+        )
+        self._commit_writer.flush()
+        if key is not None:
+            self._keys.add(key)
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        # data first, so a durable commit never points past durable data
+        if self._writer is not None:
+            os.fsync(self._writer.fileno())
+            os.fsync(self._commit_writer.fileno())
+        self._last_sync = time.monotonic()
+
+    def _iter_items(self) -> Iterator:
+        if not os.path.exists(self._file_name):
+            return
+        with open(self._file_name, "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+    @property
+    def data(self):
+        return list(self._iter_items())
+
+    async def all_items(self) -> list:
+        return self.data
+
+    async def index_done_callback(self):
+        self._sync()
+
+    async def get_by_index(self, index: int):
+        if index < 0 or index >= self._count:
+            return None
+        for i, item in enumerate(self._iter_items()):
+            if i == index:
+                return item
+        return None
+
+    async def append(self, data):
+        self._write([data])
+        self._hashes.add(compute_json_hash(data))
+
+    async def upsert(self, data: list, key: str = None):
+        """
+        Append the items that are not stored yet.
+        :param data
+        :param key: record the write under this key; if the key is already
+            recorded, nothing is written
+        :return: the items written
+        """
+        if key is not None and key in self._keys:
+            return []
+        left_data = []
+        for d in data:
+            h = compute_json_hash(d)
+            if h not in self._hashes:
+                self._hashes.add(h)
+                left_data.append(d)
+        if left_data or key is not None:
+            self._write(left_data, key)
+        return left_data
+
+    async def filter_keys(self, keys: list[str]) -> set[str]:
+        """return keys that have not been written"""
+        return {k for k in keys if k not in self._keys}
+
+    async def drop(self):
+        for f in (self._writer, self._commit_writer):
+            if f is not None:
+                f.close()
+        self._writer, self._commit_writer = None, None
+        for file_name in (self._file_name, self._commit_file_name):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self._load()
+
+
+def _truncate(file_name: str, size: int):
+    if os.path.getsize(file_name) != size:
+        with open(file_name, "r+b") as f:
+            f.truncate(size)
@@ -0,0 +1,350 @@
+import json
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from graphgen.bases.base_storage import BaseKVStorage
+from graphgen.utils import logger
+
+_SEGMENT_PATTERN = re.compile(r"^segment-(\d+)\.log$")
+
+
+@dataclass
+class LogKVStorage(BaseKVStorage):
+    """
+    Append-only, log-structured KV storage.
+
+    Every record is one ``<json key>\\t<json value>\\n`` line appended to a segment file,
+    and an in-memory index maps each key to the (segment, offset, length) of its value.
+    Values stay on disk and are decoded on read.
+    Each process appends to a fresh segment; when a segment is sealed, a hint file with
+    its keys and offsets is written next to it, so startup rebuilds the index from hints
+    without reading any value. Sealed segments are merged by compaction once half of
+    their bytes are dead or there are too many of them.
+
+    Sealed segments are read through read-only memory maps, so processes that open
+    the same storage share the page cache. With `read_only`, the storage is opened
+    as it is on disk: nothing is written, and writes raise RuntimeError.
+    """
+
+    max_segment_bytes: int = 64 * 1024 * 1024
+    compact_min_segments: int = 8
+    read_only: bool = False
+
+    def __post_init__(self):
+        self._segment_dir = os.path.join(self.working_dir, f"{self.namespace}_segments")
+        if not self.read_only:
+            os.makedirs(self._segment_dir, exist_ok=True)
+
+        self._index: dict[str, tuple[int, int, int]] = {}
+        self._maps: dict[int, mmap.mmap] = {}
+        self._writer: Optional[BinaryIO] = None
+        self._active_reader: Optional[BinaryIO] = None
+
+        self._sealed: list[int] = []
+        for segment_id in self._list_segments():
+            self._load_segment(segment_id)
+            self._sealed.append(segment_id)
+        self._next_segment_id = (self._sealed[-1] + 1) if self._sealed else 0
+        self._active_id, self._active_size = None, 0
+        logger.info("Load KV %s with %d data", self.namespace, len(self._index))
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self._segment_dir, f"segment-{segment_id:06d}.log")
+
+    def _hint_path(self, segment_id: int) -> str:
+        return os.path.join(self._segment_dir, f"segment-{segment_id:06d}.hint")
+
+    def _list_segments(self) -> list[int]:
+        if not os.path.isdir(self._segment_dir):
+            return []
+        segment_ids = []
+        for file_name in os.listdir(self._segment_dir):
+            match = _SEGMENT_PATTERN.match(file_name)
+            if match:
+                segment_ids.append(int(match.group(1)))
+        return sorted(segment_ids)
+
+    def _load_segment(self, segment_id: int):
+        """
+        Add the records of one segment to the index.
+        Use the hint file if there is one, otherwise scan the segment and write it.
+        """
+        hint_path = self._hint_path(segment_id)
+        if os.path.exists(hint_path):
+            with open(hint_path, "rb") as f:
+                for line in f:
+                    key, offset, length = line.rstrip(b"\n").rsplit(b"\t", 2)
+                    self._index[json.loads(key)] = (
+                        segment_id,
+                        int(offset),
+                        int(length),
+                    )
+            return
+
+        entries = self._scan_segment(segment_id)
+        for key, offset, length in entries:
+            self._index[key] = (segment_id, offset, length)
+        if not self.read_only:
+            self._write_hint(segment_id, entries)
+
+    def _scan_segment(self, segment_id: int) -> list[tuple[str, int, int]]:
+        """
+        Read the keys and value offsets of a segment without decoding any value.
+        A torn record at the tail (e.g. after a crash) is truncated.
+        """
+        entries = []
+        path = self._segment_path(segment_id)
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logger.warning(
+                        "Truncating torn record at %s:%d in KV %s",
+                        path,
+                        offset,
+                        self.namespace,
+                    )
+                    break
+                sep = line.index(b"\t")
+                entries.append(
+                    (json.loads(line[:sep]), offset + sep + 1, len(line) - sep - 2)
+                )
+                offset += len(line)
+        if offset != os.path.getsize(path) and not self.read_only:
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        return entries
+
+    def _write_hint(self, segment_id: int, entries: list[tuple[str, int, int]]):
+        tmp_path = self._hint_path(segment_id) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for key, offset, length in entries:
+                f.write(
+                    json.dumps(key, ensure_ascii=False).encode("utf-8")
+                    + f"\t{offset}\t{length}\n".encode("utf-8")
+                )
+        os.replace(tmp_path, self._hint_path(segment_id))
+
+    def _read_raw(self, segment_id: int, offset: int, length: int) -> bytes:
+        if segment_id == self._active_id:
+            # the active segment still grows, read it through a file handle
+            if self._active_reader is None:
+                self._active_reader = open(  # pylint: disable=consider-using-with
+                    self._segment_path(segment_id), "rb"
+                )
+            self._active_reader.seek(offset)
+            return self._active_reader.read(length)
+        if segment_id not in self._maps:
+            with open(self._segment_path(segment_id), "rb") as f:
+                self._maps[segment_id] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        return self._maps[segment_id][offset : offset + length]
+
+    def _read_value(self, id: str):
+        location = self._index.get(id)
+        if location is None:
+            return None
+        return json.loads(self._read_raw(*location))
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"KV storage {self.namespace} is opened read-only")
+
+    def _open_active(self):
+        self._active_id = self._next_segment_id
+        self._next_segment_id += 1
+        self._active_size = 0
+        self._writer = open(  # pylint: disable=consider-using-with
+            self._segment_path(self._active_id), "ab"
+        )
+
+    def _seal_active(self):
+        if self._writer is None:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._writer.close()
+        self._writer = None
+        if self._active_reader is not None:
+            self._active_reader.close()
+            self._active_reader = None
+        self._write_hint(
+            self._active_id,
+            [
+                (key, offset, length)
+                for key, (segment_id, offset, length) in self._index.items()
+                if segment_id == self._active_id
+            ],
+        )
+        self._sealed.append(self._active_id)
+        self._active_id, self._active_size = None, 0
+
+    def _append(self, records: dict[str, bytes]):
+        """Append encoded values to the active segment and index them."""
+        if self._writer is None:
+            self._open_active()
+        buffer = []
+        for key, value in records.items():
+            prefix = json.dumps(key, ensure_ascii=False).encode("utf-8") + b"\t"
+            self._index[key] = (
+                self._active_id,
+                self._active_size + len(prefix),
+                len(value),
+            )
+            buffer.append(prefix + value + b"\n")
+            self._active_size += len(prefix) + len(value) + 1
+        self._writer.write(b"".join(buffer))
+        # make the records visible to the reader handles
+        self._writer.flush()
+        if self._active_size >= self.max_segment_bytes:
+            self._seal_active()
+
+    def compact(self):
+        """
+        Merge all sealed segments into new segments that hold only live records.
+        Raw record bytes are copied, values are never decoded.
+        """
+        self._check_writable()
+        if len(self._sealed) < 2:
+            return
+        old_segments = set(self._sealed)
+        live = sorted(
+            (
+                (location, key)
+                for key, location in self._index.items()
+                if location[0] in old_segments
+            ),
+            key=lambda item: item[0],
+        )
+        logger.info(
+            "Compacting KV %s: %d segments, %d live records",
+            self.namespace,
+            len(old_segments),
+            len(live),
+        )
+
+        compacted, writer, entries, size = [], None, [], 0
+        for (segment_id, offset, length), key in live:
+            if writer is None:
+                new_id = self._next_segment_id
+                self._next_segment_id += 1
+                writer = open(  # pylint: disable=consider-using-with
+                    self._segment_path(new_id), "wb"
+                )
+                entries, size = [], 0
+            prefix = json.dumps(key, ensure_ascii=False).encode("utf-8") + b"\t"
+            writer.write(prefix + self._read_raw(segment_id, offset, length) + b"\n")
+            entries.append((key, size + len(prefix), length))
+            size += len(prefix) + length + 1
+            if size >= self.max_segment_bytes:
+                compacted.append(self._finish_compacted(writer, new_id, entries))
+                writer = None
+        if writer is not None:
+            compacted.append(self._finish_compacted(writer, new_id, entries))
+
+        for segment_id, segment_entries in compacted:
+            for key, offset, length in segment_entries:
+                self._index[key] = (segment_id, offset, length)
+        for segment_id in old_segments:
+            self._remove_segment(segment_id)
+        self._sealed = [segment_id for segment_id, _ in compacted]
+
+    def _finish_compacted(
+        self, writer: BinaryIO, segment_id: int, entries: list
+    ) -> tuple[int, list]:
+        writer.flush()
+        os.fsync(writer.fileno())
+        writer.close()
+        self._write_hint(segment_id, entries)
+        return segment_id, entries
+
+    def _needs_compaction(self) -> bool:
+        """
+        Compact when at least half of the sealed bytes are dead, or when there are
+        ``compact_min_segments`` more sealed segments than the live data needs.
+        """
+        if len(self._sealed) < 2:
+            return False
+        sealed = set(self._sealed)
+        total_bytes = sum(
+            os.path.getsize(self._segment_path(segment_id)) for segment_id in sealed
+        )
+        live_bytes = sum(
+            length
+            for segment_id, _, length in self._index.values()
+            if segment_id in sealed
+        )
+        needed_segments = live_bytes // self.max_segment_bytes + 1
+        return (
+            live_bytes * 2 < total_bytes
+            or len(self._sealed) >= needed_segments + self.compact_min_segments
+        )
+
+    def _remove_segment(self, segment_id: int):
+        segment_map = self._maps.pop(segment_id, None)
+        if segment_map is not None:
+            segment_map.close()
+        for path in (self._segment_path(segment_id), self._hint_path(segment_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def all_keys(self) -> list[str]:
+        return list(self._index.keys())
+
+    async def index_done_callback(self):
+        if self.read_only:
+            return
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        if self._needs_compaction():
+            self.compact()
+
+    async def get_by_id(self, id):
+        return self._read_value(id)
+
+    async def get_by_ids(self, ids, fields=None) -> list:
+        if fields is None:
+            return [self._read_value(id) for id in ids]
+        results = []
+        for id in ids:
+            value = self._read_value(id)
+            results.append(
+                {k: v for k, v in value.items() if k in fields} if value else None
+            )
+        return results
+
+    async def filter_keys(self, data: list[str]) -> set[str]:
+        return {s for s in data if s not in self._index}
+
+    async def upsert(self, data: dict):
+        self._check_writable()
+        left_data = {k: v for k, v in data.items() if k not in self._index}
+        if left_data:
+            self._append(
+                {
+                    k: json.dumps(v, ensure_ascii=False).encode("utf-8")
+                    for k, v in left_data.items()
+                }
+            )
+        return left_data
+
+    async def drop(self):
+        self._check_writable()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._active_reader is not None:
+            self._active_reader.close()
+            self._active_reader = None
+        for segment_id in list(self._sealed) + (
+            [self._active_id] if self._active_id is not None else []
+        ):
+            self._remove_segment(segment_id)
+        self._index = {}
+        self._sealed = []
+        self._active_id, self._active_size = None, 0
@@ -1,16 +1,47 @@
+import asyncio
 import html
+import json
 import os
+import re
 from dataclasses import dataclass
 from typing import Any, Optional, Union
 
 import networkx as nx
 
 from graphgen.bases.base_storage import BaseGraphStorage
+from graphgen.models.storage.graph_snapshot import (
+    read_graph_snapshot,
+    read_snapshot_edge_ids,
+    read_snapshot_extra,
+    write_graph_snapshot,
+)
 from graphgen.utils import logger
 
 
 @dataclass
 class NetworkXStorage(BaseGraphStorage):
+    """
+    Graph storage on an in-memory networkx graph.
+    The graph is persisted as a binary snapshot (`<namespace>.snapshot.npz`); a legacy
+    `<namespace>.graphml` is read once and converted. Set `write_graphml` to also
+    export GraphML on every `index_done_callback`.
+
+    Nodes and edges changed through this class are tracked as dirty, and
+    `index_done_callback` appends only their current state to a journal. Once the
+    journal holds more than `journal_compact_ratio` ops per graph element (and at
+    least `journal_min_compact_ops`), it is compacted into a new snapshot in the
+    background. Startup replays the journal on top of the snapshot.
+    Changes made directly on the graph from `get_graph` are not tracked.
+
+    Every edge gets a canonical integer id when it is first inserted, the same for
+    both orientations of an undirected edge. Ids are persisted with the snapshot
+    and the journal, and are never reused.
+    """
+
+    write_graphml: bool = False
+    journal_compact_ratio: float = 0.5
+    journal_min_compact_ops: int = 10000
+
     @staticmethod
     def load_nx_graph(file_name) -> Optional[nx.Graph]:
         if os.path.exists(file_name):
@@ -94,18 +125,259 @@ class NetworkXStorage(BaseGraphStorage):
         self._graphml_xml_file = os.path.join(
             self.working_dir, f"{self.namespace}.graphml"
         )
-        preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+        self._snapshot_file = os.path.join(
+            self.working_dir, f"{self.namespace}.snapshot.npz"
+        )
+        self._journal_pattern = re.compile(
+            rf"^{re.escape(self.namespace)}\.journal\.(\d+)\.jsonl$"
+        )
+
+        # ops since the last snapshot go to `<namespace>.journal.<generation>.jsonl`;
+        # a snapshot covers every journal below its `journal_generation`
+        snapshot_generation, next_edge_id = 0, 0
+        preloaded_graph, edge_ids = None, None
+        if os.path.exists(self._snapshot_file):
+            preloaded_graph = read_graph_snapshot(self._snapshot_file)
+            edge_ids = read_snapshot_edge_ids(self._snapshot_file)
+            extra = read_snapshot_extra(self._snapshot_file)
+            snapshot_generation = extra.get("journal_generation", 0)
+            next_edge_id = extra.get("next_edge_id", 0)
+            loaded_from = self._snapshot_file
+        else:
+            preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+            loaded_from = self._graphml_xml_file
+            if preloaded_graph is not None:
+                logger.info("Converting %s to a binary snapshot", loaded_from)
+                edge_ids = list(range(preloaded_graph.number_of_edges()))
+                next_edge_id = len(edge_ids)
+                write_graph_snapshot(
+                    preloaded_graph,
+                    self._snapshot_file,
+                    extra={
+                        "journal_generation": snapshot_generation,
+                        "next_edge_id": next_edge_id,
+                    },
+                    edge_ids=edge_ids,
+                )
         if preloaded_graph is not None:
             logger.info(
                 "Loaded graph from %s with %d nodes, %d edges",
-                self._graphml_xml_file,
+                loaded_from,
                 preloaded_graph.number_of_nodes(),
                 preloaded_graph.number_of_edges(),
             )
         self._graph = preloaded_graph or nx.Graph()
 
+        # canonical edge key -> edge id, and edge id -> (source, target)
+        self._edge_ids: dict[tuple, int] = {}
+        self._edge_ends: dict[int, tuple] = {}
+        self._next_edge_id = next_edge_id
+        if edge_ids is None:
+            edge_ids = range(self._graph.number_of_edges())
+        for (u, v), edge_id in zip(self._graph.edges(), edge_ids):
+            self._assign_edge_id(u, v, edge_id)
+
+        # dicts as insertion-ordered sets, so replay recreates nodes in order
+        self._dirty_nodes: dict = {}
+        self._dirty_edges: dict = {}
+        self._deleted_nodes: dict = {}
+        self._cleared = False
+        self._compaction: Optional[asyncio.Future] = None
+
+        self._journal_generation = snapshot_generation
+        self._journal_ops = 0
+        for generation in self._list_journals():
+            if generation < snapshot_generation:
+                os.remove(self._journal_file(generation))
+                continue
+            self._journal_ops += self._replay_journal(generation)
+            self._journal_generation = generation
+        if self._journal_ops:
+            logger.info(
+                "Replayed %d journal ops into graph %s",
+                self._journal_ops,
+                self.namespace,
+            )
+
+    def _journal_file(self, generation: int) -> str:
+        return os.path.join(
+            self.working_dir, f"{self.namespace}.journal.{generation}.jsonl"
+        )
+
+    def _edge_key(self, source_node_id: str, target_node_id: str) -> tuple:
+        if self._graph.is_directed() or source_node_id <= target_node_id:
+            return source_node_id, target_node_id
+        return target_node_id, source_node_id
+
+    def _assign_edge_id(
+        self, source_node_id: str, target_node_id: str, edge_id: int = None
+    ) -> int:
+        """Return the id of an edge, assigning `edge_id` or a new one if it has none."""
+        key = self._edge_key(source_node_id, target_node_id)
+        current = self._edge_ids.get(key)
+        if current is not None:
+            return current
+        if edge_id is None:
+            edge_id = self._next_edge_id
+        self._edge_ids[key] = edge_id
+        self._edge_ends[edge_id] = (source_node_id, target_node_id)
+        self._next_edge_id = max(self._next_edge_id, edge_id + 1)
+        return edge_id
+
+    def _drop_edge_ids(self, node_id: str):
+        """Forget the ids of all edges of a node that is about to be removed."""
+        incident = list(self._graph.edges(node_id))
+        if self._graph.is_directed():
+            incident.extend(self._graph.in_edges(node_id))
+        for u, v in incident:
+            edge_id = self._edge_ids.pop(self._edge_key(u, v), None)
+            self._edge_ends.pop(edge_id, None)
+
+    def _list_journals(self) -> list[int]:
+        if not os.path.isdir(self.working_dir):
+            return []
+        generations = []
+        for file_name in os.listdir(self.working_dir):
+            match = self._journal_pattern.match(file_name)
+            if match:
+                generations.append(int(match.group(1)))
+        return sorted(generations)
+
+    def _replay_journal(self, generation: int) -> int:
+        """Apply one journal to the graph, truncating a torn last record."""
+        file_name = self._journal_file(generation)
+        ops, offset = 0, 0
+        with open(file_name, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logger.warning("Truncating torn journal record in %s", file_name)
+                    break
+                self._apply_op(json.loads(line))
+                ops += 1
+                offset += len(line)
+        if offset != os.path.getsize(file_name):
+            with open(file_name, "r+b") as f:
+                f.truncate(offset)
+        return ops
+
+    def _apply_op(self, op: dict):
+        kind = op["op"]
+        if kind == "upsert_node":
+            self._graph.add_node(op["id"], **op["data"])
+        elif kind == "upsert_edge":
+            self._graph.add_edge(op["src"], op["tgt"], **op["data"])
+            self._assign_edge_id(op["src"], op["tgt"], op.get("eid"))
+        elif kind == "delete_node":
+            if self._graph.has_node(op["id"]):
+                self._drop_edge_ids(op["id"])
+                self._graph.remove_node(op["id"])
+        elif kind == "clear":
+            self._graph.clear()
+            self._edge_ids, self._edge_ends = {}, {}
+        else:
+            raise ValueError(f"Unknown journal op: {kind}")
+
+    def _dirty_ops(self) -> list[dict]:
+        """Current state of everything touched since the last flush, as journal ops."""
+        ops = [{"op": "clear"}] if self._cleared else []
+        ops.extend({"op": "delete_node", "id": n} for n in self._deleted_nodes)
+        ops.extend(
+            {"op": "upsert_node", "id": n, "data": self._graph.nodes[n]}
+            for n in self._dirty_nodes
+            if self._graph.has_node(n)
+        )
+        ops.extend(
+            {
+                "op": "upsert_edge",
+                "src": u,
+                "tgt": v,
+                "eid": self._edge_ids[self._edge_key(u, v)],
+                "data": self._graph.edges[u, v],
+            }
+            for u, v in self._dirty_edges
+            if self._graph.has_edge(u, v)
+        )
+        return ops
+
+    def _flush_journal(self):
+        ops = self._dirty_ops()
+        self._dirty_nodes, self._dirty_edges = {}, {}
+        self._deleted_nodes, self._cleared = {}, False
+        if not ops:
+            return
+        os.makedirs(self.working_dir, exist_ok=True)
+        with open(self._journal_file(self._journal_generation), "ab") as f:
+            f.write(
+                "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops).encode(
+                    "utf-8"
+                )
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_ops += len(ops)
+
+    def _should_compact(self) -> bool:
+        if self._compaction is not None and not self._compaction.done():
+            return False
+        graph_size = self._graph.number_of_nodes() + self._graph.number_of_edges()
+        return self._journal_ops >= max(
+            self.journal_min_compact_ops, self.journal_compact_ratio * graph_size
+        )
+
+    def _write_snapshot(
+        self, graph: nx.Graph, generation: int, edge_ids: list[int], next_edge_id: int
+    ):
+        logger.info(
+            "Writing graph snapshot with %d nodes, %d edges",
+            graph.number_of_nodes(),
+            graph.number_of_edges(),
+        )
+        write_graph_snapshot(
+            graph,
+            self._snapshot_file,
+            extra={"journal_generation": generation, "next_edge_id": next_edge_id},
+            edge_ids=edge_ids,
+        )
+        for old_generation in self._list_journals():
+            if old_generation < generation:
+                os.remove(self._journal_file(old_generation))
+
+    def _start_compaction(self):
+        """
+        Rotate the journal and write a snapshot of the current graph in a worker
+        thread. New ops go to the next journal meanwhile, so a crash before the
+        snapshot lands loses nothing.
+        """
+        self._journal_generation += 1
+        self._journal_ops = 0
+        graph = self._graph.copy()
+        edge_ids = [self._edge_ids[self._edge_key(u, v)] for u, v in graph.edges()]
+        self._compaction = asyncio.get_running_loop().run_in_executor(
+            None,
+            self._write_snapshot,
+            graph,
+            self._journal_generation,
+            edge_ids,
+            self._next_edge_id,
+        )
+
+    async def wait_for_compaction(self):
+        if self._compaction is not None:
+            await self._compaction
+
     async def index_done_callback(self):
-        NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
+        self._flush_journal()
+        if self._should_compact():
+            self._start_compaction()
+        if self.write_graphml:
+            self.export_graphml()
+
+    def export_graphml(self, file_name: Optional[str] = None):
+        """
+        Export the graph as GraphML.
+        :param file_name: defaults to `<namespace>.graphml` in the working dir
+        """
+        NetworkXStorage.write_nx_graph(self._graph, file_name or self._graphml_xml_file)
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -140,15 +412,34 @@ class NetworkXStorage(BaseGraphStorage):
             return list(self._graph.edges(source_node_id, data=True))
         return None
 
+    async def get_all_edges_with_ids(self) -> list[tuple[int, str, str, dict]]:
+        edge_ids, edge_key = self._edge_ids, self._edge_key
+        return [
+            (edge_ids[edge_key(u, v)], u, v, d)
+            for u, v, d in self._graph.edges(data=True)
+        ]
+
+    async def get_edges_by_ids(
+        self, edge_ids: list[int]
+    ) -> list[Union[tuple[str, str, dict], None]]:
+        edges = self._graph.edges
+        results = []
+        for edge_id in edge_ids:
+            ends = self._edge_ends.get(edge_id)
+            results.append(None if ends is None else (*ends, edges[ends]))
+        return results
+
     async def get_graph(self) -> nx.Graph:
         return self._graph
 
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         self._graph.add_node(node_id, **node_data)
+        self._dirty_nodes[node_id] = None
 
     async def update_node(self, node_id: str, node_data: dict[str, str]):
         if self._graph.has_node(node_id):
             self._graph.nodes[node_id].update(node_data)
+            self._dirty_nodes[node_id] = None
         else:
             logger.warning("Node %s not found in the graph for update.", node_id)
 
@@ -156,12 +447,16 @@ class NetworkXStorage(BaseGraphStorage):
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
         self._graph.add_edge(source_node_id, target_node_id, **edge_data)
+        self._assign_edge_id(source_node_id, target_node_id)
+        self._dirty_nodes.update(dict.fromkeys((source_node_id, target_node_id)))
+        self._dirty_edges[(source_node_id, target_node_id)] = None
 
     async def update_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
         if self._graph.has_edge(source_node_id, target_node_id):
             self._graph.edges[(source_node_id, target_node_id)].update(edge_data)
+            self._dirty_edges[(source_node_id, target_node_id)] = None
         else:
             logger.warning(
                 "Edge %s -> %s not found in the graph for update.",
@@ -169,6 +464,52 @@ class NetworkXStorage(BaseGraphStorage):
                 target_node_id,
             )
 
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        nodes = self._graph.nodes
+        return [nodes.get(node_id) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        edges = self._graph.edges
+        return [edges.get(pair) for pair in edge_pairs]
+
+    async def upsert_nodes(self, nodes: dict[str, dict]):
+        self._graph.add_nodes_from(nodes.items())
+        self._dirty_nodes.update(dict.fromkeys(nodes))
+
+    async def update_nodes(self, nodes: dict[str, dict]):
+        graph_nodes = self._graph.nodes
+        missing = 0
+        for node_id, node_data in nodes.items():
+            if node_id in graph_nodes:
+                graph_nodes[node_id].update(node_data)
+                self._dirty_nodes[node_id] = None
+            else:
+                missing += 1
+        if missing:
+            logger.warning("%d nodes not found in the graph for update.", missing)
+
+    async def upsert_edges(self, edges: dict[tuple[str, str], dict]):
+        self._graph.add_edges_from((u, v, d) for (u, v), d in edges.items())
+        for u, v in edges:
+            self._assign_edge_id(u, v)
+            self._dirty_nodes[u] = self._dirty_nodes[v] = None
+        self._dirty_edges.update(dict.fromkeys(edges))
+
+    async def update_edges(self, edges: dict[tuple[str, str], dict]):
+        graph_edges = self._graph.edges
+        missing = 0
+        for pair, edge_data in edges.items():
+            data = graph_edges.get(pair)
+            if data is not None:
+                data.update(edge_data)
+                self._dirty_edges[pair] = None
+            else:
+                missing += 1
+        if missing:
+            logger.warning("%d edges not found in the graph for update.", missing)
+
     async def delete_node(self, node_id: str):
         """
         Delete a node from the graph based on the specified node_id.
@@ -176,7 +517,13 @@ class NetworkXStorage(BaseGraphStorage):
         :param node_id: The node_id to delete
         """
         if self._graph.has_node(node_id):
+            self._drop_edge_ids(node_id)
             self._graph.remove_node(node_id)
+            self._deleted_nodes[node_id] = None
+            self._dirty_nodes.pop(node_id, None)
+            self._dirty_edges = {
+                (u, v): None for u, v in self._dirty_edges if node_id not in (u, v)
+            }
             logger.info("Node %s deleted from the graph.", node_id)
         else:
             logger.warning("Node %s not found in the graph for deletion.", node_id)
@@ -186,4 +533,8 @@ class NetworkXStorage(BaseGraphStorage):
         Clear the graph by removing all nodes and edges.
         """
         self._graph.clear()
+        self._edge_ids, self._edge_ends = {}, {}
+        self._cleared = True
+        self._dirty_nodes, self._dirty_edges = {}, {}
+        self._deleted_nodes = {}
         logger.info("Graph %s cleared.", self.namespace)
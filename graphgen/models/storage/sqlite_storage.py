@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable
+
+from graphgen.bases.base_storage import BaseKVStorage, BaseListStorage
+from graphgen.utils import compute_json_hash, logger
+
+
+def _connect(working_dir: str, namespace: str) -> sqlite3.Connection:
+    os.makedirs(working_dir, exist_ok=True)
+    conn = sqlite3.connect(
+        os.path.join(working_dir, f"{namespace}.sqlite"),
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+@dataclass
+class SQLiteKVStorage(BaseKVStorage):
+    """
+    KV storage backed by a SQLite table in WAL mode.
+    Keys are the primary key, so `filter_keys` is an indexed lookup and nothing
+    is loaded into memory on startup.
+    """
+
+    def __post_init__(self):
+        self._conn = _connect(self.working_dir, self.namespace)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            " WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TEMP TABLE probe (key TEXT PRIMARY KEY)")
+        count = self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+        logger.info("Load KV %s with %d data", self.namespace, count)
+
+    def _missing_keys(self, keys: Iterable[str]) -> set[str]:
+        """Must be called inside a transaction."""
+        self._conn.execute("DELETE FROM probe")
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO probe (key) VALUES (?)", ((k,) for k in keys)
+        )
+        rows = self._conn.execute(
+            "SELECT key FROM probe WHERE key NOT IN (SELECT key FROM kv)"
+        ).fetchall()
+        self._conn.execute("DELETE FROM probe")
+        return {row[0] for row in rows}
+
+    async def all_keys(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT key FROM kv")]
+
+    async def index_done_callback(self):
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def get_by_id(self, id):
+        row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_by_ids(self, ids, fields=None) -> list:
+        results = []
+        for id in ids:
+            value = await self.get_by_id(id)
+            if fields is not None and value:
+                value = {k: v for k, v in value.items() if k in fields}
+            results.append(value)
+        return results
+
+    async def filter_keys(self, data: list[str]) -> set[str]:
+        with self._conn:
+            self._conn.execute("BEGIN")
+            missing = self._missing_keys(data)
+        return {s for s in data if s in missing}
+
+    async def upsert(self, data: dict):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            missing = self._missing_keys(data.keys())
+            left_data = {k: v for k, v in data.items() if k in missing}
+            self._conn.executemany(
+                "INSERT INTO kv (key, value) VALUES (?, ?)",
+                ((k, _dumps(v)) for k, v in left_data.items()),
+            )
+        return left_data
+
+    async def drop(self):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM kv")
+
+
+@dataclass
+class SQLiteListStorage(BaseListStorage):
+    """
+    List storage backed by a SQLite table in WAL mode.
+    Items are kept in insertion order by rowid, and each item carries a hash of its
+    canonical JSON form so that `upsert` deduplicates with an indexed lookup.
+    """
+
+    def __post_init__(self):
+        self._conn = _connect(self.working_dir, self.namespace)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items"
+            " (id INTEGER PRIMARY KEY, hash TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_hash ON items (hash)")
+        self._conn.execute("CREATE TEMP TABLE probe (hash TEXT PRIMARY KEY)")
+        count = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        logger.info("Load List %s with %d data", self.namespace, count)
+
+    @property
+    def data(self):
+        return [
+            json.loads(row[0])
+            for row in self._conn.execute("SELECT value FROM items ORDER BY id")
+        ]
+
+    async def all_items(self) -> list:
+        return self.data
+
+    async def index_done_callback(self):
+        self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def get_by_index(self, index: int):
+        if index < 0:
+            return None
+        row = self._conn.execute(
+            "SELECT value FROM items ORDER BY id LIMIT 1 OFFSET ?", (index,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def append(self, data):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO items (hash, value) VALUES (?, ?)",
+                (compute_json_hash(data), _dumps(data)),
+            )
+
+    async def upsert(self, data: list):
+        hashes = [compute_json_hash(d) for d in data]
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM probe")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO probe (hash) VALUES (?)", ((h,) for h in hashes)
+            )
+            existing = {
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT hash FROM probe WHERE hash IN (SELECT hash FROM items)"
+                )
+            }
+            self._conn.execute("DELETE FROM probe")
+            left = [(h, d) for h, d in zip(hashes, data) if h not in existing]
+            self._conn.executemany(
+                "INSERT INTO items (hash, value) VALUES (?, ?)",
+                ((h, _dumps(d)) for h, d in left),
+            )
+        return [d for _, d in left]
+
+    async def drop(self):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM items")
@@ -1,8 +1,8 @@
-from .build_kg import build_kg
-from .generate import generate_qas
+from .build_kg import build_kg, insert_pipeline
+from .generate import generate_qas, stream_qas
 from .judge import judge_statement
 from .partition import partition_kg
 from .quiz import quiz
-from .read import read_files
+from .read import iter_files, read_files
 from .search import search_all
 from .split import chunk_documents
@@ -1 +1,2 @@
-from .build_kg import build_kg
+from .build_kg import build_kg, merge_kg, summarize_kg
+from .insert_pipeline import insert_pipeline
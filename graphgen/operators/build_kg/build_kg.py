@@ -1,15 +1,17 @@
+import asyncio
+import zlib
 from collections import defaultdict
-from typing import Any, List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 try:
     import gradio as gr
 except ModuleNotFoundError:
     gr = None  # type: ignore
 
-from graphgen.bases.base_storage import BaseGraphStorage
+from graphgen.bases.base_storage import BaseGraphStorage, BaseKVStorage
 from graphgen.bases.datatypes import Chunk
 from graphgen.models import LightRAGKGBuilder, OpenAIClient
-from graphgen.utils import run_concurrent
+from graphgen.utils import compute_content_hash, logger, run_concurrent
 
 
 async def build_kg(
@@ -17,43 +19,232 @@ async def build_kg(
     kg_instance: BaseGraphStorage,
     chunks: List[Chunk],
     progress_bar: Any = None,
+    max_loop: int = 3,
+    glean_mode: str = "probe",
+    summary_cache: Optional[BaseKVStorage] = None,
 ):
     """
     :param llm_client: Synthesizer LLM model to extract entities and relationships
     :param kg_instance
     :param chunks
     :param progress_bar: Gradio progress bar to show the progress of the extraction
+    :param max_loop: max gleaning rounds per chunk
+    :param glean_mode: probe, sentinel or logprob, see LightRAGKGBuilder
+    :param summary_cache: storage of description summaries, see summarize_kg
     :return:
     """
 
-    kg_builder = LightRAGKGBuilder(llm_client=llm_client, max_loop=3)
+    kg_builder = LightRAGKGBuilder(
+        llm_client=llm_client, max_loop=max_loop, glean_mode=glean_mode
+    )
+
+    nodes = defaultdict(list)
+    edges = defaultdict(list)
+
+    async def _extract(chunk: Chunk):
+        # records are collected while the answers are still being generated
+        async for kind, key, data in kg_builder.extract_stream(chunk):
+            if kind == "node":
+                nodes[key].append(data)
+            else:
+                edges[tuple(sorted(key))].append(data)
 
-    results = await run_concurrent(
-        kg_builder.extract,
+    await run_concurrent(
+        _extract,
         chunks,
         desc="[2/4]Extracting entities and relationships from chunks",
         unit="chunk",
         progress_bar=progress_bar,
     )
 
-    nodes = defaultdict(list)
-    edges = defaultdict(list)
-    for n, e in results:
-        for k, v in n.items():
-            nodes[k].extend(v)
-        for k, v in e.items():
-            edges[tuple(sorted(k))].extend(v)
+    dirty_nodes, dirty_edges = await merge_kg(kg_builder, kg_instance, nodes, edges)
+    await summarize_kg(
+        kg_builder, kg_instance, dirty_nodes, dirty_edges, summary_cache=summary_cache
+    )
 
-    await run_concurrent(
-        lambda kv: kg_builder.merge_nodes(kv, kg_instance=kg_instance),
-        list(nodes.items()),
-        desc="Inserting entities into storage",
+    return kg_instance
+
+
+def _shard_of(key, shards: int) -> int:
+    # stable across runs, unlike hash()
+    return zlib.crc32(str(key).encode("utf-8")) % shards
+
+
+async def _merge_sharded(
+    merge_batch, items: list, stored: list, shards: int, summarize: bool
+) -> list:
+    """
+    Split the items into shards by key and merge each shard with one worker, so
+    every key is owned by exactly one worker. Shards are merged concurrently.
+    :return: merged items, sorted by key
+    """
+    shard_items = [[] for _ in range(shards)]
+    for item, old in zip(items, stored):
+        shard_items[_shard_of(item[0], shards)].append((item, old))
+    merged = await asyncio.gather(
+        *[merge_batch(batch, summarize) for batch in shard_items if batch]
     )
+    return sorted((item for batch in merged for item in batch), key=lambda x: x[0])
 
-    await run_concurrent(
-        lambda kv: kg_builder.merge_edges(kv, kg_instance=kg_instance),
-        list(edges.items()),
-        desc="Inserting relationships into storage",
+
+async def merge_kg(
+    kg_builder: LightRAGKGBuilder,
+    kg_instance: BaseGraphStorage,
+    nodes: Dict[str, List[dict]],
+    edges: Dict[Tuple[str, str], List[dict]],
+    shards: int = 16,
+    summarize: bool = False,
+) -> Tuple[Set[str], Set[Tuple[str, str]]]:
+    """
+    Merge extracted entities and relationships into the graph.
+    Keys are sharded over `shards` workers and the graph is written in key order,
+    so the result does not depend on the order extractions finished in.
+    :param kg_builder
+    :param kg_instance
+    :param nodes: entity_name -> extracted entities
+    :param edges: (src_id, tgt_id) -> extracted relationships
+    :param shards: number of merge workers
+    :param summarize: summarize long descriptions now; by default they are left
+        to summarize_kg, run once for all merges
+    :return: (written node ids, written edge keys)
+    """
+    node_items = list(nodes.items())
+    merged_nodes = await _merge_sharded(
+        kg_builder.merge_node_batch,
+        node_items,
+        await kg_instance.get_nodes([name for name, _ in node_items]),
+        shards,
+        summarize,
     )
+    await kg_instance.upsert_nodes(dict(merged_nodes))
 
-    return kg_instance
+    edge_items = list(edges.items())
+    merged_edges = await _merge_sharded(
+        kg_builder.merge_edge_batch,
+        edge_items,
+        await kg_instance.get_edges([key for key, _ in edge_items]),
+        shards,
+        summarize,
+    )
+
+    # end nodes that were never extracted as entities get a placeholder node,
+    # taken from their first edge
+    placeholders = {}
+    for (src_id, tgt_id), _, placeholder in merged_edges:
+        placeholders.setdefault(src_id, placeholder)
+        placeholders.setdefault(tgt_id, placeholder)
+    end_nodes = list(placeholders)
+    new_end_nodes = {
+        node_id: placeholders[node_id]
+        for node_id, node in zip(end_nodes, await kg_instance.get_nodes(end_nodes))
+        if node is None
+    }
+    await kg_instance.upsert_nodes(new_end_nodes)
+    await kg_instance.upsert_edges({key: data for key, data, _ in merged_edges})
+
+    return (
+        {name for name, _ in merged_nodes} | set(new_end_nodes),
+        {key for key, _, _ in merged_edges},
+    )
+
+
+async def summarize_kg(
+    kg_builder: LightRAGKGBuilder,
+    kg_instance: BaseGraphStorage,
+    node_ids: Iterable[str],
+    edge_keys: Iterable[Tuple[str, str]],
+    summary_cache: Optional[BaseKVStorage] = None,
+    sweep: bool = False,
+    failed: Optional[Set[Tuple[str, Any]]] = None,
+) -> int:
+    """
+    Summarize the descriptions of the given nodes and edges that are too long,
+    e.g. the ones written by merge_kg during an insert, so each entity is
+    summarized once per insert instead of once per merge.
+    Summaries are keyed by a hash of the name and the description: equal keys
+    are summarized once per pass, and keys found in `summary_cache` not at all.
+    :param kg_builder
+    :param kg_instance
+    :param node_ids
+    :param edge_keys
+    :param summary_cache: storage of summaries across inserts and runs
+    :param sweep: also check every node and edge of the graph, a maintenance pass
+        for graphs whose pending keys were lost
+    :param failed: collects ("node", node_id) and ("edge", edge_key) of the
+        descriptions whose summary failed, to be retried later
+    :return: number of LLM summaries
+    """
+    node_ids, edge_keys = set(node_ids), {tuple(sorted(key)) for key in edge_keys}
+    if sweep:
+        node_ids.update(node_id for node_id, _ in await kg_instance.get_all_nodes())
+        edge_keys.update(
+            tuple(sorted((u, v))) for u, v, _ in await kg_instance.get_all_edges()
+        )
+    node_ids, edge_keys = sorted(node_ids), sorted(edge_keys)
+    items = [
+        ("node", node_id, node_id, node)
+        for node_id, node in zip(node_ids, await kg_instance.get_nodes(node_ids))
+        if node is not None
+    ] + [
+        ("edge", key, kg_builder.relation_name(*key), edge)
+        for key, edge in zip(edge_keys, await kg_instance.get_edges(edge_keys))
+        if edge is not None
+    ]
+    items = [item for item in items if kg_builder.needs_summary(item[3]["description"])]
+    if not items:
+        return 0
+
+    hashes = [
+        compute_content_hash(f"{name}\n{data['description']}", prefix="summary-")
+        for _, _, name, data in items
+    ]
+    summaries = {}
+    if summary_cache is not None:
+        unique_hashes = list(dict.fromkeys(hashes))
+        for summary_hash, summary in zip(
+            unique_hashes, await summary_cache.get_by_ids(unique_hashes)
+        ):
+            if summary is not None:
+                summaries[summary_hash] = summary
+
+    missing = {}
+    for summary_hash, (_, _, name, data) in zip(hashes, items):
+        if summary_hash not in summaries:
+            missing.setdefault(
+                summary_hash, (name, {"description": data["description"]})
+            )
+    logger.info(
+        "[Summarize] %d long descriptions, %d to summarize", len(items), len(missing)
+    )
+    originals = {key: data["description"] for key, (_, data) in missing.items()}
+    await kg_builder.summarize_batch(list(missing.values()))
+    new_summaries = {
+        summary_hash: data["description"]
+        for summary_hash, (_, data) in missing.items()
+        # failed summaries keep the description and are retried next time
+        if data["description"] != originals[summary_hash]
+    }
+    summaries.update(new_summaries)
+    if failed is not None:
+        failed.update(
+            (kind, key)
+            for summary_hash, (kind, key, _, _) in zip(hashes, items)
+            if summary_hash not in summaries
+        )
+    if summary_cache is not None and new_summaries:
+        cached = dict(new_summaries)
+        for summary_hash, (name, _) in missing.items():
+            summary = new_summaries.get(summary_hash)
+            # a summary that is still long maps to itself, so sweeps leave it alone
+            if summary is not None and kg_builder.needs_summary(summary):
+                key = compute_content_hash(f"{name}\n{summary}", prefix="summary-")
+                cached[key] = summary
+        await summary_cache.upsert(cached)
+
+    updated = {"node": {}, "edge": {}}
+    for summary_hash, (kind, key, _, data) in zip(hashes, items):
+        if summary_hash in summaries:
+            updated[kind][key] = {**data, "description": summaries[summary_hash]}
+    await kg_instance.upsert_nodes(updated["node"])
+    await kg_instance.upsert_edges(updated["edge"])
+    return len(new_summaries)
@@ -0,0 +1,252 @@
+import asyncio
+import math
+import os
+from collections import defaultdict
+from typing import Any, Iterator, Optional
+
+from tqdm.asyncio import tqdm as tqdm_async
+
+from graphgen.bases import BaseGraphStorage, BaseKVStorage, BaseLLMClient, Chunk
+from graphgen.models import LightRAGKGBuilder, Tokenizer
+from graphgen.operators.build_kg.build_kg import merge_kg, summarize_kg
+from graphgen.operators.split import chunk_document
+from graphgen.utils import compute_content_hash, load_json, logger, write_json
+
+_DONE = object()
+
+
+def _pending_file(kg_instance: BaseGraphStorage) -> str:
+    return os.path.join(
+        kg_instance.working_dir, f"{kg_instance.namespace}.pending_summaries.json"
+    )
+
+
+def _load_pending(kg_instance: BaseGraphStorage) -> tuple[set, set]:
+    """Node ids and edge keys merged by an earlier insert but not summarized yet."""
+    pending = load_json(_pending_file(kg_instance)) or {}
+    return set(pending.get("nodes", [])), {
+        tuple(key) for key in pending.get("edges", [])
+    }
+
+
+def _save_pending(kg_instance: BaseGraphStorage, node_ids: set, edge_keys: set):
+    file_name = _pending_file(kg_instance)
+    if not node_ids and not edge_keys:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        return
+    # replaced atomically, a torn file would lose the keys
+    write_json(
+        {"nodes": sorted(node_ids), "edges": sorted(edge_keys)}, file_name + ".tmp"
+    )
+    os.replace(file_name + ".tmp", file_name)
+
+
+async def insert_pipeline(
+    docs: Iterator[dict],
+    llm_client: BaseLLMClient,
+    kg_instance: BaseGraphStorage,
+    full_docs_storage: BaseKVStorage,
+    text_chunks_storage: BaseKVStorage,
+    *,
+    chunk_size: int = 1024,
+    chunk_overlap: int = 100,
+    tokenizer_instance: Optional[Tokenizer] = None,
+    max_loop: int = 3,
+    glean_mode: str = "probe",
+    workers: int = 256,
+    queue_size: int = 1024,
+    merge_batch_size: int = 64,
+    merge_interval: float = 5.0,
+    checkpoint_interval: float = 60.0,
+    summary_cache: Optional[BaseKVStorage] = None,
+    progress_bar: Any = None,
+) -> int:
+    """
+    Insert documents through a pipeline of stages connected by bounded queues:
+    read -> split -> extract -> merge. Early chunks are extracted while later
+    documents are still read and split, and extraction results are merged into
+    the graph as they arrive, so memory stays bounded by the queue sizes.
+    Long descriptions are summarized once, after the last merge. The keys merged
+    since the last summary pass are saved with every graph checkpoint, so the
+    next insert also summarizes the ones left by an insert that stopped early.
+    Docs and chunks already in the storages are skipped.
+
+    :param docs: documents as returned by the readers, read lazily
+    :param llm_client: Synthesizer LLM model to extract entities and relationships
+    :param kg_instance
+    :param full_docs_storage
+    :param text_chunks_storage
+    :param chunk_size
+    :param chunk_overlap
+    :param tokenizer_instance
+    :param max_loop: max gleaning rounds per chunk
+    :param glean_mode: probe, sentinel or logprob, see LightRAGKGBuilder
+    :param workers: chunks extracted at the same time
+    :param queue_size: max items waiting between two stages
+    :param merge_batch_size: extracted chunks merged into the graph together
+    :param merge_interval: max seconds an extracted chunk waits to be merged,
+        while results keep arriving
+    :param checkpoint_interval: min seconds between two graph checkpoints
+    :param summary_cache: storage of description summaries, see summarize_kg
+    :param progress_bar: Gradio progress bar, shows the share of read chunks done
+    :return: number of chunks extracted
+    """
+    kg_builder = LightRAGKGBuilder(
+        llm_client=llm_client, max_loop=max_loop, glean_mode=glean_mode
+    )
+
+    loop = asyncio.get_running_loop()
+    doc_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    result_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    counts = {"docs": 0, "chunks": 0, "extracted": 0}
+    # checkpoints hold merged but unsummarized descriptions until the final pass
+    dirty_nodes, dirty_edges = _load_pending(kg_instance)
+    pbar = tqdm_async(desc="Inserting chunks", unit="chunk")
+
+    async def _read():
+        iterator = iter(docs)
+        seen = set()
+        while True:
+            # readers may parse large files, keep the loop free meanwhile
+            doc = await asyncio.to_thread(next, iterator, _DONE)
+            if doc is _DONE:
+                break
+            if doc.get("type", "text") != "text":
+                continue
+            doc_key = compute_content_hash(doc["content"], prefix="doc-")
+            if doc_key in seen or not await full_docs_storage.filter_keys([doc_key]):
+                continue
+            seen.add(doc_key)
+            await doc_queue.put((doc_key, {"content": doc["content"]}))
+        await doc_queue.put(_DONE)
+
+    async def _split():
+        seen = set()
+        while (item := await doc_queue.get()) is not _DONE:
+            doc_key, doc = item
+            chunks = await asyncio.to_thread(
+                chunk_document,
+                doc_key,
+                doc,
+                chunk_size,
+                chunk_overlap,
+                tokenizer_instance,
+            )
+            new_keys = await text_chunks_storage.filter_keys(
+                [key for key in chunks if key not in seen]
+            )
+            chunks = {k: v for k, v in chunks.items() if k in new_keys}
+            seen.update(chunks)
+
+            await full_docs_storage.upsert({doc_key: doc})
+            counts["docs"] += 1
+            if not chunks:
+                continue
+            await text_chunks_storage.upsert(chunks)
+            for key, chunk in chunks.items():
+                counts["chunks"] += 1
+                await chunk_queue.put(Chunk(id=key, content=chunk["content"]))
+        for _ in range(workers):
+            await chunk_queue.put(_DONE)
+
+    async def _extract():
+        while (chunk := await chunk_queue.get()) is not _DONE:
+            nodes = defaultdict(list)
+            edges = defaultdict(list)
+            try:
+                async for kind, key, data in kg_builder.extract_stream(chunk):
+                    if kind == "node":
+                        nodes[key].append(data)
+                    else:
+                        edges[tuple(sorted(key))].append(data)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception("Extraction of chunk %s failed: %s", chunk.id, e)
+            await result_queue.put((nodes, edges))
+        await result_queue.put(_DONE)
+
+    async def _merge():
+        nodes = defaultdict(list)
+        edges = defaultdict(list)
+        pending = 0
+        last_merge = last_checkpoint = -math.inf
+        running = workers
+
+        async def _flush():
+            nonlocal nodes, edges, pending, last_merge, last_checkpoint
+            if pending:
+                merged_nodes, merged_edges = await merge_kg(
+                    kg_builder, kg_instance, nodes, edges
+                )
+                dirty_nodes.update(merged_nodes)
+                dirty_edges.update(merged_edges)
+                nodes, edges, pending = defaultdict(list), defaultdict(list), 0
+            last_merge = loop.time()
+            if last_merge - last_checkpoint >= checkpoint_interval:
+                _save_pending(kg_instance, dirty_nodes, dirty_edges)
+                await kg_instance.index_done_callback()
+                last_checkpoint = loop.time()
+
+        while running:
+            item = await result_queue.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            for key, data in item[0].items():
+                nodes[key].extend(data)
+            for key, data in item[1].items():
+                edges[key].extend(data)
+            pending += 1
+            counts["extracted"] += 1
+            pbar.update(1)
+            if progress_bar is not None:
+                progress_bar(
+                    counts["extracted"] / max(counts["chunks"], 1),
+                    desc=f"Inserting chunks ({counts['extracted']}/{counts['chunks']})",
+                )
+            if (
+                pending >= merge_batch_size
+                or loop.time() - last_merge >= merge_interval
+            ):
+                await _flush()
+        if pending:
+            await _flush()
+
+    tasks = [
+        asyncio.create_task(_read()),
+        asyncio.create_task(_split()),
+        *[asyncio.create_task(_extract()) for _ in range(workers)],
+        asyncio.create_task(_merge()),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # a failing stage would leave the others waiting on their queues
+        for task in tasks:
+            task.cancel()
+        pbar.close()
+
+    if dirty_nodes or dirty_edges:
+        failed = set()
+        await summarize_kg(
+            kg_builder,
+            kg_instance,
+            dirty_nodes,
+            dirty_edges,
+            summary_cache=summary_cache,
+            failed=failed,
+        )
+        await kg_instance.index_done_callback()
+        # failed summaries stay pending and are retried by the next insert
+        _save_pending(
+            kg_instance,
+            {key for kind, key in failed if kind == "node"},
+            {key for kind, key in failed if kind == "edge"},
+        )
+    logger.info(
+        "[Insert] %d new docs, %d chunks extracted",
+        counts["docs"],
+        counts["extracted"],
+    )
+    return counts["extracted"]
@@ -1 +1 @@
-from .generate_qas import generate_qas
+from .generate_qas import generate_qas, stream_qas
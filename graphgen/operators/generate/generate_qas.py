@@ -8,7 +8,22 @@ from graphgen.models import (
     MultiHopGenerator,
     VQAGenerator,
 )
-from graphgen.utils import logger, run_concurrent
+from graphgen.models.storage import JsonlListStorage
+from graphgen.utils import compute_json_hash, logger, run_concurrent
+
+
+def _init_generator(mode: str, llm_client: BaseLLMClient):
+    if mode == "atomic":
+        return AtomicGenerator(llm_client)
+    if mode == "aggregated":
+        return AggregatedGenerator(llm_client)
+    if mode == "multi_hop":
+        return MultiHopGenerator(llm_client)
+    if mode == "cot":
+        return CoTGenerator(llm_client)
+    if mode == "vqa":
+        return VQAGenerator(llm_client)
+    raise ValueError(f"Unsupported generation mode: {mode}")
 
 
 async def generate_qas(
@@ -31,19 +46,7 @@ async def generate_qas(
     """
     mode = generation_config["mode"]
     logger.info("[Generation] mode: %s, batches: %d", mode, len(batches))
-
-    if mode == "atomic":
-        generator = AtomicGenerator(llm_client)
-    elif mode == "aggregated":
-        generator = AggregatedGenerator(llm_client)
-    elif mode == "multi_hop":
-        generator = MultiHopGenerator(llm_client)
-    elif mode == "cot":
-        generator = CoTGenerator(llm_client)
-    elif mode == "vqa":
-        generator = VQAGenerator(llm_client)
-    else:
-        raise ValueError(f"Unsupported generation mode: {mode}")
+    generator = _init_generator(mode, llm_client)
 
     results = await run_concurrent(
         generator.generate,
@@ -62,3 +65,72 @@ async def generate_qas(
     )
 
     return results
+
+
+async def stream_qas(
+    llm_client: BaseLLMClient,
+    batches: list[
+        tuple[
+            list[tuple[str, dict]], list[tuple[Any, Any, dict] | tuple[Any, Any, Any]]
+        ]
+    ],
+    generation_config: dict,
+    qa_storage: JsonlListStorage,
+    progress_bar=None,
+) -> int:
+    """
+    Generate question-answer pairs like `generate_qas`, but format and write the
+    QAs of each batch to `qa_storage` as soon as they are generated.
+    Each batch is written under a key derived from its nodes and edges, and batches
+    already in `qa_storage` (e.g. from an interrupted run) are skipped.
+    :param llm_client: LLM client
+    :param batches
+    :param generation_config
+    :param qa_storage
+    :param progress_bar
+    :return: number of QA pairs written
+    """
+    mode = generation_config["mode"]
+    data_format = generation_config["data_format"]
+    generator = _init_generator(mode, llm_client)
+
+    keyed_batches = [
+        (
+            compute_json_hash(
+                {
+                    "mode": mode,
+                    "nodes": [node for node, _ in batch[0]],
+                    "edges": [[edge[0], edge[1]] for edge in batch[1]],
+                },
+                prefix="batch-",
+            ),
+            batch,
+        )
+        for batch in batches
+    ]
+    left_keys = await qa_storage.filter_keys([key for key, _ in keyed_batches])
+    keyed_batches = [(key, batch) for key, batch in keyed_batches if key in left_keys]
+    logger.info(
+        "[Generation] mode: %s, batches: %d, already generated: %d",
+        mode,
+        len(keyed_batches),
+        len(batches) - len(keyed_batches),
+    )
+    logger.info("Output data format: %s", data_format)
+
+    async def _generate_and_write(keyed_batch) -> int:
+        key, batch = keyed_batch
+        result = await generator.generate(batch)
+        qas = generator.format_generation_results(
+            [result], output_data_format=data_format
+        )
+        return len(await qa_storage.upsert(qas, key=key))
+
+    written = await run_concurrent(
+        _generate_and_write,
+        keyed_batches,
+        desc="[4/4]Generating QAs",
+        unit="batch",
+        progress_bar=progress_bar,
+    )
+    return sum(written)
@@ -1,19 +1,23 @@
 import asyncio
+import contextlib
 import math
+from typing import Optional
 
 from tqdm.asyncio import tqdm as tqdm_async
 
 from graphgen.models import JsonKVStorage, NetworkXStorage, OpenAIClient
-from graphgen.templates import STATEMENT_JUDGEMENT_PROMPT
+from graphgen.templates import STATEMENT_JUDGEMENT_PROMPT, CompiledPrompt
 from graphgen.utils import logger, yes_no_loss_entropy
 
+PROMPT = CompiledPrompt(STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"])
+
 
 async def judge_statement(  # pylint: disable=too-many-statements
     trainee_llm_client: OpenAIClient,
     graph_storage: NetworkXStorage,
     rephrase_storage: JsonKVStorage,
     re_judge: bool = False,
-    max_concurrent: int = 1000,
+    max_concurrent: Optional[int] = None,
 ) -> NetworkXStorage:
     """
     Get all edges and nodes and judge them
@@ -22,11 +26,16 @@ async def judge_statement(  # pylint: disable=too-many-statements
     :param graph_storage: graph storage instance
     :param rephrase_storage: rephrase storage instance
     :param re_judge: re-judge the relations
-    :param max_concurrent: max concurrent
+    :param max_concurrent: max concurrent, None leaves it to the concurrency
+        limit of the client
     :return:
     """
 
-    semaphore = asyncio.Semaphore(max_concurrent)
+    semaphore = (
+        asyncio.Semaphore(max_concurrent)
+        if max_concurrent
+        else contextlib.nullcontext()
+    )
 
     async def _judge_single_relation(
         edge: tuple,
@@ -55,9 +64,7 @@ async def judge_statement(  # pylint: disable=too-many-statements
                 gts = [gt for _, gt in descriptions]
                 for description, gt in descriptions:
                     judgement = await trainee_llm_client.generate_topk_per_token(
-                        STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(
-                            statement=description
-                        )
+                        PROMPT.render(statement=description)
                     )
                     judgements.append(judgement[0].top_candidates)
 
@@ -79,7 +86,6 @@ async def judge_statement(  # pylint: disable=too-many-statements
                 logger.info("Use default loss 0.1")
                 edge_data["loss"] = -math.log(0.1)
 
-            await graph_storage.update_edge(source_id, target_id, edge_data)
             return source_id, target_id, edge_data
 
     edges = await graph_storage.get_all_edges()
@@ -91,6 +97,7 @@ async def judge_statement(  # pylint: disable=too-many-statements
         desc="Judging relations",
     ):
         results.append(await result)
+    await graph_storage.update_edges({(u, v): data for u, v, data in results})
 
     async def _judge_single_entity(
         node: tuple,
@@ -115,9 +122,7 @@ async def judge_statement(  # pylint: disable=too-many-statements
                 gts = [gt for _, gt in descriptions]
                 for description, gt in descriptions:
                     judgement = await trainee_llm_client.generate_topk_per_token(
-                        STATEMENT_JUDGEMENT_PROMPT["TEMPLATE"].format(
-                            statement=description
-                        )
+                        PROMPT.render(statement=description)
                     )
                     judgements.append(judgement[0].top_candidates)
 
@@ -133,7 +138,6 @@ async def judge_statement(  # pylint: disable=too-many-statements
                 logger.info("Use default loss 0.1")
                 node_data["loss"] = -math.log(0.1)
 
-            await graph_storage.update_node(node_id, node_data)
             return node_id, node_data
 
     nodes = await graph_storage.get_all_nodes()
@@ -145,5 +149,6 @@ async def judge_statement(  # pylint: disable=too-many-statements
         desc="Judging entities",
     ):
         results.append(await result)
+    await graph_storage.update_nodes(dict(results))
 
     return graph_storage
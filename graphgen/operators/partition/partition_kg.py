@@ -3,6 +3,7 @@ from typing import Any
 from graphgen.bases import BaseGraphStorage, BaseTokenizer
 from graphgen.models import (
     BFSPartitioner,
+    CSRGraphStorage,
     DFSPartitioner,
     ECEPartitioner,
     LeidenPartitioner,
@@ -42,6 +43,13 @@ async def partition_kg(
     else:
         raise ValueError(f"Unsupported partition method: {method}")
 
+    graph_backend = partition_config.get("graph_backend", "networkx")
+    if graph_backend == "csr":
+        logger.info("Partitioning on a compact CSR copy of the knowledge graph.")
+        kg_instance = await CSRGraphStorage.from_graph_storage(kg_instance)
+    elif graph_backend != "networkx":
+        raise ValueError(f"Unsupported graph backend: {graph_backend}")
+
     communities = await partitioner.partition(g=kg_instance, **method_params)
     logger.info("Partitioned the graph into %d communities.", len(communities))
     batches = await partitioner.community2batch(communities, g=kg_instance)
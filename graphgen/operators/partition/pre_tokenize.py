@@ -13,8 +13,9 @@ async def pre_tokenize(
 ) -> Tuple[List, List]:
     """为 edges/nodes 补 token-length 并回写存储，并发 1000，带进度条。"""
     sem = asyncio.Semaphore(1000)
+    patched_edges, patched_nodes = {}, {}
 
-    async def _patch_and_write(obj: Tuple, *, is_node: bool) -> Tuple:
+    async def _patch(obj: Tuple, *, is_node: bool) -> Tuple:
         async with sem:
             data = obj[1] if is_node else obj[2]
             if "length" not in data:
@@ -24,24 +25,30 @@ async def pre_tokenize(
                         None, tokenizer.encode, data["description"]
                     )
                 )
-            if is_node:
-                await graph_storage.update_node(obj[0], obj[1])
-            else:
-                await graph_storage.update_edge(obj[0], obj[1], obj[2])
+                if is_node:
+                    patched_nodes[obj[0]] = data
+                else:
+                    patched_edges[(obj[0], obj[1])] = data
             return obj
 
     new_edges, new_nodes = await asyncio.gather(
         run_concurrent(
-            lambda e: _patch_and_write(e, is_node=False),
+            lambda e: _patch(e, is_node=False),
             edges,
             desc="Pre-tokenizing edges",
         ),
         run_concurrent(
-            lambda n: _patch_and_write(n, is_node=True),
+            lambda n: _patch(n, is_node=True),
             nodes,
             desc="Pre-tokenizing nodes",
         ),
     )
 
-    await graph_storage.index_done_callback()
+    # only write back what was just tokenized
+    if patched_edges:
+        await graph_storage.update_edges(patched_edges)
+    if patched_nodes:
+        await graph_storage.update_nodes(patched_nodes)
+    if patched_edges or patched_nodes:
+        await graph_storage.index_done_callback()
     return new_edges, new_nodes
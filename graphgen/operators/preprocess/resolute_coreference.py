@@ -2,9 +2,11 @@ from typing import List
 
 from graphgen.bases.datatypes import Chunk
 from graphgen.models import OpenAIClient
-from graphgen.templates import COREFERENCE_RESOLUTION_PROMPT
+from graphgen.templates import COREFERENCE_RESOLUTION_PROMPT, compile_prompts
 from graphgen.utils import detect_main_language
 
+PROMPTS = compile_prompts(COREFERENCE_RESOLUTION_PROMPT)
+
 
 async def resolute_coreference(
     llm_client: OpenAIClient, chunks: List[Chunk]
@@ -25,7 +27,7 @@ async def resolute_coreference(
     for _, chunk in enumerate(chunks[1:]):
         language = detect_main_language(chunk.content)
         result = await llm_client.generate_answer(
-            COREFERENCE_RESOLUTION_PROMPT[language].format(
+            PROMPTS[language].render(
                 reference=results[0].content, input_sentence=chunk.content
             )
         )
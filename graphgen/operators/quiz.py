@@ -1,19 +1,23 @@
 import asyncio
+import contextlib
 from collections import defaultdict
+from typing import Optional
 
 from tqdm.asyncio import tqdm as tqdm_async
 
 from graphgen.models import JsonKVStorage, NetworkXStorage, OpenAIClient
-from graphgen.templates import DESCRIPTION_REPHRASING_PROMPT
+from graphgen.templates import DESCRIPTION_REPHRASING_PROMPT, compile_prompts
 from graphgen.utils import detect_main_language, logger
 
+PROMPTS = compile_prompts(DESCRIPTION_REPHRASING_PROMPT)
+
 
 async def quiz(
     synth_llm_client: OpenAIClient,
     graph_storage: NetworkXStorage,
     rephrase_storage: JsonKVStorage,
     max_samples: int = 1,
-    max_concurrent: int = 1000,
+    max_concurrent: Optional[int] = None,
 ) -> JsonKVStorage:
     """
     Get all edges and quiz them
@@ -22,11 +26,16 @@ async def quiz(
     :param graph_storage: graph storage instance
     :param rephrase_storage: rephrase storage instance
     :param max_samples: max samples for each edge
-    :param max_concurrent: max concurrent
+    :param max_concurrent: max concurrent, None leaves it to the concurrency
+        limit of the client
     :return:
     """
 
-    semaphore = asyncio.Semaphore(max_concurrent)
+    semaphore = (
+        asyncio.Semaphore(max_concurrent)
+        if max_concurrent
+        else contextlib.nullcontext()
+    )
 
     async def _process_single_quiz(des: str, prompt: str, gt: str):
         async with semaphore:
@@ -63,7 +72,7 @@ async def quiz(
                 tasks.append(
                     _process_single_quiz(
                         description,
-                        DESCRIPTION_REPHRASING_PROMPT[language]["TEMPLATE"].format(
+                        PROMPTS[language]["TEMPLATE"].render(
                             input_sentence=description
                         ),
                         "yes",
@@ -72,7 +81,7 @@ async def quiz(
             tasks.append(
                 _process_single_quiz(
                     description,
-                    DESCRIPTION_REPHRASING_PROMPT[language]["ANTI_TEMPLATE"].format(
+                    PROMPTS[language]["ANTI_TEMPLATE"].render(
                         input_sentence=description
                     ),
                     "no",
@@ -91,7 +100,7 @@ async def quiz(
                 tasks.append(
                     _process_single_quiz(
                         description,
-                        DESCRIPTION_REPHRASING_PROMPT[language]["TEMPLATE"].format(
+                        PROMPTS[language]["TEMPLATE"].render(
                             input_sentence=description
                         ),
                         "yes",
@@ -100,7 +109,7 @@ async def quiz(
             tasks.append(
                 _process_single_quiz(
                     description,
-                    DESCRIPTION_REPHRASING_PROMPT[language]["ANTI_TEMPLATE"].format(
+                    PROMPTS[language]["ANTI_TEMPLATE"].render(
                         input_sentence=description
                     ),
                     "no",
@@ -115,8 +124,8 @@ async def quiz(
             for key, value in new_result.items():
                 results[key].extend(value)
 
-    for key, value in results.items():
-        results[key] = list(set(value))
-        await rephrase_storage.upsert({key: results[key]})
+    await rephrase_storage.upsert(
+        {key: list(set(value)) for key, value in results.items()}
+    )
 
     return rephrase_storage
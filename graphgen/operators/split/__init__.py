@@ -1 +1 @@
-from .split_chunks import chunk_documents
+from .split_chunks import chunk_document, chunk_documents
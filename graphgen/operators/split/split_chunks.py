@@ -35,6 +35,34 @@ def split_chunks(text: str, language: str = "en", **kwargs) -> list:
     return splitter.split_text(text)
 
 
+def chunk_document(
+    doc_key: str,
+    doc: dict,
+    chunk_size: int = 1024,
+    chunk_overlap: int = 100,
+    tokenizer_instance: Tokenizer = None,
+) -> dict:
+    doc_language = detect_main_language(doc["content"])
+    text_chunks = split_chunks(
+        doc["content"],
+        language=doc_language,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+    return {
+        compute_content_hash(txt, prefix="chunk-"): {
+            "content": txt,
+            "full_doc_id": doc_key,
+            "length": (
+                len(tokenizer_instance.encode(txt)) if tokenizer_instance else len(txt)
+            ),
+            "language": doc_language,
+        }
+        for txt in text_chunks
+    }
+
+
 async def chunk_documents(
     new_docs: dict,
     chunk_size: int = 1024,
@@ -48,27 +76,10 @@ async def chunk_documents(
     async for doc_key, doc in tqdm_async(
         new_docs.items(), desc="[1/4]Chunking documents", unit="doc"
     ):
-        doc_language = detect_main_language(doc["content"])
-        text_chunks = split_chunks(
-            doc["content"],
-            language=doc_language,
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
+        inserting_chunks.update(
+            chunk_document(doc_key, doc, chunk_size, chunk_overlap, tokenizer_instance)
         )
 
-        chunks = {
-            compute_content_hash(txt, prefix="chunk-"): {
-                "content": txt,
-                "full_doc_id": doc_key,
-                "length": len(tokenizer_instance.encode(txt))
-                if tokenizer_instance
-                else len(txt),
-                "language": doc_language,
-            }
-            for txt in text_chunks
-        }
-        inserting_chunks.update(chunks)
-
         if progress_bar is not None:
             progress_bar(cur_index / doc_number, f"Chunking {doc_key}")
             cur_index += 1
@@ -182,6 +182,13 @@ Add them below using the same format:
 
 CONTINUE_ZH: str = """很多实体和关系在上一次的提取中可能被遗漏了。请在下面使用相同的格式添加它们："""
 
+CONTINUE_SENTINEL_EN: str = """MANY entities and relationships may have been missed in the last extraction.  \
+Add them below using the same format. If none were missed, output only {completion_delimiter}
+"""
+
+CONTINUE_SENTINEL_ZH: str = """很多实体和关系在上一次的提取中可能被遗漏了。请在下面使用相同的格式添加它们。\
+如果没有遗漏，只输出{completion_delimiter}"""
+
 IF_LOOP_EN: str = """It appears some entities and relationships may have still been missed.  \
 Answer YES | NO if there are still entities and relationships that need to be added.
 """
@@ -192,11 +199,13 @@ KG_EXTRACTION_PROMPT: dict = {
     "English": {
         "TEMPLATE": TEMPLATE_EN,
         "CONTINUE": CONTINUE_EN,
+        "CONTINUE_SENTINEL": CONTINUE_SENTINEL_EN,
         "IF_LOOP": IF_LOOP_EN,
     },
     "Chinese": {
         "TEMPLATE": TEMPLATE_ZH,
         "CONTINUE": CONTINUE_ZH,
+        "CONTINUE_SENTINEL": CONTINUE_SENTINEL_ZH,
         "IF_LOOP": IF_LOOP_ZH,
     },
     "FORMAT": {
@@ -0,0 +1,70 @@
+from string import Formatter
+from typing import Any, Dict, List, Tuple, Union
+
+_FORMATTER = Formatter()
+
+
+class CompiledPrompt:
+    """
+    A prompt template whose static fields are filled in once.
+    `render` only fills the remaining fields and never mutates shared state, so it
+    is safe to call concurrently. The text before the first per-call field is
+    `prefix`, identical across calls, which lets servers reuse its prefix cache.
+    """
+
+    def __init__(self, template: str, **static: Any):
+        self._parts: List[Union[str, Tuple[str, str, str]]] = []
+        literal: List[str] = []
+        for text, field, spec, conversion in _FORMATTER.parse(template):
+            literal.append(text)
+            if field is None:
+                continue
+            if field in static:
+                value = _FORMATTER.convert_field(static[field], conversion)
+                literal.append(_FORMATTER.format_field(value, spec))
+            else:
+                self._parts.append("".join(literal))
+                self._parts.append((field, conversion, spec))
+                literal = []
+        self._parts.append("".join(literal))
+        self.fields = tuple(p[0] for p in self._parts if isinstance(p, tuple))
+
+    @property
+    def prefix(self) -> str:
+        return self._parts[0]
+
+    def render(self, **kwargs: Any) -> str:
+        out = []
+        for part in self._parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                field, conversion, spec = part
+                value = _FORMATTER.convert_field(kwargs[field], conversion)
+                out.append(_FORMATTER.format_field(value, spec))
+        return "".join(out)
+
+
+def compile_prompts(
+    prompts: Dict[str, Any],
+) -> Dict[str, Union[CompiledPrompt, Dict[str, CompiledPrompt]]]:
+    """
+    Compile a prompt dict laid out as {language: template} or
+    {language: {name: template}}, with an optional "FORMAT" dict of static fields.
+    The `FORMAT` fields and the language are static.
+    :return: the same layout, with compiled prompts
+    """
+    static = prompts.get("FORMAT", {})
+    compiled: Dict[str, Union[CompiledPrompt, Dict[str, CompiledPrompt]]] = {}
+    for language, templates in prompts.items():
+        if language == "FORMAT":
+            continue
+        fields = {**static, "language": language}
+        if isinstance(templates, str):
+            compiled[language] = CompiledPrompt(templates, **fields)
+        else:
+            compiled[language] = {
+                name: CompiledPrompt(template, **fields)
+                for name, template in templates.items()
+            }
+    return compiled
@@ -20,6 +20,33 @@ def split_string_by_multi_markers(content: str, markers: list[str]) -> list[str]
     return [r.strip() for r in results if r.strip()]
 
 
+class StreamingMarkerSplitter:
+    """
+    Split text that arrives in pieces by multiple markers, like
+    `split_string_by_multi_markers`, returning each part as soon as the marker
+    after it has arrived. `<think>` blocks are dropped.
+    """
+
+    _think = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+    def __init__(self, markers: list[str]):
+        self._pattern = re.compile("|".join(re.escape(marker) for marker in markers))
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        """Add text and return the parts completed by it."""
+        self._buffer = self._think.sub("", self._buffer + text)
+        if "<think>" in self._buffer:
+            return []
+        *parts, self._buffer = self._pattern.split(self._buffer)
+        return [p.strip() for p in parts if p.strip()]
+
+    def close(self) -> list[str]:
+        """Return the last part, once all the text has arrived."""
+        rest, self._buffer = self._buffer, ""
+        return [p.strip() for p in self._pattern.split(rest) if p.strip()]
+
+
 # Refer the utils functions of the official GraphRAG implementation:
 # https://github.com/microsoft/graphrag
 def clean_str(input: Any) -> str:
@@ -1,3 +1,4 @@
+import json
 from hashlib import md5
 
 def compute_args_hash(*args):
@@ -5,3 +6,9 @@ def compute_args_hash(*args):
 
 def compute_content_hash(content, prefix: str = ""):
     return prefix + md5(content.encode()).hexdigest()
+
+def compute_json_hash(obj, prefix: str = ""):
+    """Hash a JSON-serializable object by its canonical (key-sorted) JSON form."""
+    return compute_content_hash(
+        json.dumps(obj, ensure_ascii=False, sort_keys=True), prefix=prefix
+    )
@@ -0,0 +1,131 @@
+import copy
+from typing import Any, List, Optional
+
+import pytest
+
+from graphgen.bases import BaseLLMClient, Chunk, Token
+from graphgen.models import LightRAGKGBuilder
+from graphgen.templates import KG_EXTRACTION_PROMPT, CompiledPrompt, compile_prompts
+from graphgen.utils import StreamingMarkerSplitter
+
+ANSWER = (
+    '<think>("entity"<|>"DRAFT"<|>"x"<|>"y")##</think>'
+    '("entity"<|>"Rome"<|>"location"<|>"Capital of the empire.")##\n'
+    '("entity"<|>"Nerva"<|>"person"<|>"Roman emperor.")##\n'
+    '("relationship"<|>"Nerva"<|>"Rome"<|>"Nerva ruled from Rome."<|>8)\n'
+    "<|COMPLETE|>"
+)
+GLEAN = '("entity"<|>"Senate"<|>"organization"<|>"Legislative body.")<|COMPLETE|>'
+
+
+class _StreamingClient(BaseLLMClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.received: List[str] = []
+        self.if_loop_answers = ["yes", "no"]
+        self.gleans = [GLEAN, GLEAN, "<|COMPLETE|>"]
+        self.calls = 0
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        self.calls += 1
+        return self.if_loop_answers.pop(0)
+
+    async def stream_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ):
+        self.calls += 1
+        answer = self.gleans.pop(0) if history else ANSWER
+        for i in range(0, len(answer), 7):
+            self.received.append(answer[i : i + 7])
+            yield answer[i : i + 7]
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        self.calls += 1
+        yes = 0.8 if self.if_loop_answers.pop(0) == "yes" else 0.2
+        candidates = [Token("Yes", yes), Token("NO", 1 - yes)]
+        return [Token(candidates[0].text, yes, top_candidates=candidates)]
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+def test_streaming_splitter_matches_full_split():
+    splitter = StreamingMarkerSplitter(["##", "<|COMPLETE|>"])
+    parts = []
+    for i in range(0, len(ANSWER), 3):
+        parts += splitter.feed(ANSWER[i : i + 3])
+    parts += splitter.close()
+    assert len(parts) == 3
+    assert parts[0].startswith('("entity"<|>"Rome"')
+    assert parts[2].startswith('("relationship"')
+
+
+@pytest.mark.asyncio
+async def test_records_are_yielded_while_streaming():
+    client = _StreamingClient()
+    builder = LightRAGKGBuilder(llm_client=client, max_loop=3)
+    chunk = Chunk(id="chunk-1", content="Nerva ruled the Roman Empire from Rome.")
+
+    records = []
+    async for kind, key, data in builder.extract_stream(chunk):
+        # the first record is parsed before the whole answer has arrived
+        records.append((kind, key, len(client.received)))
+        assert data["source_id"] == "chunk-1"
+
+    assert [(kind, key) for kind, key, _ in records] == [
+        ("node", '"ROME"'),
+        ("node", '"NERVA"'),
+        ("edge", ('"NERVA"', '"ROME"')),
+        ("node", '"SENATE"'),
+    ]
+    assert records[0][2] < len(ANSWER) // 7
+
+    client.if_loop_answers = ["no"]
+    nodes, edges = await builder.extract(chunk)
+    assert set(nodes) == {'"ROME"', '"NERVA"'}
+    assert list(edges) == [('"NERVA"', '"ROME"')]
+
+
+@pytest.mark.asyncio
+async def test_glean_modes():
+    chunk = Chunk(id="chunk-1", content="Nerva ruled the Roman Empire from Rome.")
+
+    client = _StreamingClient()
+    client.gleans = [GLEAN, "<|COMPLETE|>"]
+    builder = LightRAGKGBuilder(llm_client=client, glean_mode="sentinel")
+    nodes, _ = await builder.extract(chunk)
+    assert '"SENATE"' in nodes
+    # one call per glean, stopped by the sentinel
+    assert client.calls == 3
+
+    client = _StreamingClient()
+    client.if_loop_answers = ["yes", "yes", "yes"]
+    builder = LightRAGKGBuilder(llm_client=client, glean_mode="logprob")
+    nodes, _ = await builder.extract(chunk)
+    assert len(nodes['"SENATE"']) == 2
+    # the second glean finds nothing new, so gleaning stops before max_loop
+    assert client.calls == 5
+
+    with pytest.raises(ValueError):
+        LightRAGKGBuilder(llm_client=client, glean_mode="never")
+
+
+def test_compiled_prompts_match_format():
+    before = copy.deepcopy(KG_EXTRACTION_PROMPT)
+    for language in ("English", "Chinese"):
+        fields = {**KG_EXTRACTION_PROMPT["FORMAT"], "language": language}
+        template = compile_prompts(KG_EXTRACTION_PROMPT)[language]["TEMPLATE"]
+        assert template.fields == ("input_text",)
+        assert template.render(input_text="Nerva {ruled} Rome.") == (
+            KG_EXTRACTION_PROMPT[language]["TEMPLATE"].format(
+                **fields, input_text="Nerva {ruled} Rome."
+            )
+        )
+        assert template.render(input_text="a").startswith(template.prefix)
+    assert KG_EXTRACTION_PROMPT == before
+
+    summary = CompiledPrompt("{language}: {name!r:>6} {{x}}", language="Chinese")
+    assert summary.prefix == "Chinese: "
+    assert summary.render(name="ab") == "Chinese:   'ab' {x}"
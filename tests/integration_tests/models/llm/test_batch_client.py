@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+from graphgen.models import BatchLLMClient, FileBatchRunner, OpenAIBatchRunner
+from graphgen.models.llm.limitter import AdaptiveConcurrency
+
+# stand-in for a local batch runner such as vLLM's run_batch: echoes every prompt
+STAND_IN = """
+import json, sys
+with open(sys.argv[1]) as f, open(sys.argv[2] + ".tmp", "w") as out:
+    for line in f:
+        request = json.loads(line)
+        prompt = request["body"]["messages"][-1]["content"]
+        if prompt == "fail":
+            result = {"status_code": 400, "body": {"error": "bad request"}}
+        else:
+            result = {"status_code": 200, "body": {
+                "choices": [{"message": {"content": "echo: " + prompt}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 2,
+                          "total_tokens": 3},
+            }}
+        out.write(json.dumps({"custom_id": request["custom_id"],
+                              "response": result, "error": None}) + "\\n")
+import os
+os.replace(sys.argv[2] + ".tmp", sys.argv[2])
+"""
+
+
+@pytest.mark.asyncio
+async def test_file_batch_runner():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        script = os.path.join(tmpdir, "stand_in.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(STAND_IN)
+        runner = FileBatchRunner(
+            os.path.join(tmpdir, "batches"),
+            command=[sys.executable, script, "{input}", "{output}"],
+        )
+        batch_sizes = []
+        run = runner.run
+
+        async def _run(requests):
+            batch_sizes.append(len(requests))
+            return await run(requests)
+
+        runner.run = _run
+        client = BatchLLMClient(runner=runner, max_batch_size=4, flush_interval=0.05)
+
+        answers = await asyncio.gather(
+            *(client.generate_answer(f"q{i}") for i in range(6)),
+            return_exceptions=True,
+        )
+        assert answers == [f"echo: q{i}" for i in range(6)]
+        # 4 requests by size, the other 2 after the flush interval
+        assert batch_sizes == [4, 2]
+        assert len(client.token_usage) == 6
+
+        with pytest.raises(RuntimeError, match="bad request"):
+            await client.generate_answer("fail")
+        # the batch files are removed once read
+        assert not os.listdir(os.path.join(tmpdir, "batches"))
+
+
+@pytest.mark.asyncio
+async def test_file_batch_runner_times_out():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # no command and no external worker: the output never shows up
+        runner = FileBatchRunner(tmpdir, poll_interval=0.01, timeout=0.05)
+        with pytest.raises(TimeoutError):
+            await runner.run([{"custom_id": "request-0"}])
+        assert not os.listdir(tmpdir)
+
+
+class _StandInAPI:
+    """In-process stand-in for the files and batches endpoints."""
+
+    def __init__(self):
+        self.uploads = {}
+        self.polls = 0
+        self.files = SimpleNamespace(create=self._upload, content=self._content)
+        self.batches = SimpleNamespace(create=self._create, retrieve=self._retrieve)
+
+    async def _upload(self, file, purpose):
+        assert purpose == "batch"
+        self.uploads["input"] = file[1].decode("utf-8")
+        return SimpleNamespace(id="input")
+
+    async def _create(self, input_file_id, endpoint, completion_window):
+        assert endpoint == "/v1/chat/completions"
+        return SimpleNamespace(id="batch", status="in_progress")
+
+    async def _retrieve(self, batch_id):
+        self.polls += 1
+        return SimpleNamespace(
+            id=batch_id,
+            status="completed",
+            output_file_id="output",
+            error_file_id=None,
+        )
+
+    async def _content(self, file_id):
+        lines = []
+        for line in self.uploads["input"].splitlines():
+            request = json.loads(line)
+            logprobs = {
+                "content": [
+                    {
+                        "token": "yes",
+                        "logprob": 0.0,
+                        "top_logprobs": [{"token": "no", "logprob": -1.0}],
+                    }
+                ]
+            }
+            body = {"choices": [{"message": {"content": "yes"}, "logprobs": logprobs}]}
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "body": body},
+                    }
+                )
+            )
+        return SimpleNamespace(text="\n".join(lines))
+
+
+@pytest.mark.asyncio
+async def test_openai_batch_runner():
+    api = _StandInAPI()
+    client = BatchLLMClient(
+        runner=OpenAIBatchRunner(api, poll_interval=0.01), flush_interval=0.01
+    )
+
+    tokens = await client.generate_topk_per_token("is it?")
+    assert tokens[0].text == "yes" and tokens[0].prob == 1.0
+    assert tokens[0].top_candidates[0].text == "no"
+    request = json.loads(api.uploads["input"])
+    assert request["body"]["max_tokens"] == 1 and request["body"]["logprobs"]
+    assert api.polls == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_client_limits_batches_in_flight():
+    in_flight, peak = 0, 0
+
+    class _Runner:
+        async def run(self, requests):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            body = {"choices": [{"message": {"content": "ok"}}]}
+            return {
+                r["custom_id"]: {"response": {"status_code": 200, "body": body}}
+                for r in requests
+            }
+
+    concurrency = AdaptiveConcurrency(initial=1, max_limit=1)
+    client = BatchLLMClient(runner=_Runner(), max_batch_size=1, concurrency=concurrency)
+    answers = await asyncio.gather(*(client.generate_answer(f"q{i}") for i in range(3)))
+    assert answers == ["ok"] * 3
+    assert peak == 1 and concurrency.in_flight == 0
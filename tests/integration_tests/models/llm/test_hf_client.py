@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+from graphgen.models import HFLocalClient  # pylint: disable=wrong-import-position
+
+WORDS = ["[UNK]", "[PAD]", "is", "the", "sky", "blue", "grass", "green", "yes", "no"]
+
+
+def _tiny_client(**kwargs) -> HFLocalClient:
+    torch.manual_seed(0)
+    backend = tokenizers.Tokenizer(
+        tokenizers.models.WordLevel(
+            vocab={w: i for i, w in enumerate(WORDS)}, unk_token="[UNK]"
+        )
+    )
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    hf_tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="[UNK]", pad_token="[PAD]"
+    )
+    model = transformers.GPT2LMHeadModel(
+        transformers.GPT2Config(
+            vocab_size=len(WORDS), n_positions=32, n_embd=16, n_layer=2, n_head=2
+        )
+    )
+    return HFLocalClient(model=model, hf_tokenizer=hf_tokenizer, device="cpu", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_batched_scoring_matches_single():
+    client = _tiny_client(topk_per_token=3)
+    statements = ["the sky is blue", "grass is green", "is the grass blue"]
+
+    batched = await asyncio.gather(
+        *(client.generate_topk_per_token(s) for s in statements)
+    )
+    single = [await client.generate_topk_per_token(s) for s in statements]
+
+    for tokens, expected in zip(batched, single):
+        assert len(tokens) == 1 and len(tokens[0].top_candidates) == 3
+        assert tokens[0].text == tokens[0].top_candidates[0].text
+        for got, want in zip(tokens[0].top_candidates, expected[0].top_candidates):
+            assert got.text == want.text
+            assert got.prob == pytest.approx(want.prob, rel=1e-4)
+
+
+@pytest.mark.asyncio
+async def test_inputs_prob_and_answer():
+    client = _tiny_client(max_tokens=3)
+    tokens = await client.generate_inputs_prob("the sky is blue")
+    assert [t.text for t in tokens] == ["sky", "is", "blue"]
+    assert all(0 < t.prob <= 1 for t in tokens)
+    assert isinstance(await client.generate_answer("the sky"), str)
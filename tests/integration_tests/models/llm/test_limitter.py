@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from graphgen.models.llm.limitter import (
+    RPM,
+    TPM,
+    AdaptiveConcurrency,
+    TokenBucket,
+    acquire_all,
+)
+from graphgen.models.llm.openai_client import get_retry_after
+
+
+@pytest.mark.asyncio
+async def test_bucket_sustains_configured_rate():
+    bucket = TokenBucket(rate=50, period=1.0, capacity=10)
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(35)))
+    elapsed = time.monotonic() - start
+    # 10 from the initial burst, the other 25 at 50 per second
+    assert 0.45 <= elapsed < 0.8
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_in_order():
+    bucket = TokenBucket(rate=100, period=1.0, capacity=20)
+    await bucket.acquire(20)
+    order = []
+
+    async def _acquire(i, amount):
+        await bucket.acquire(amount)
+        order.append(i)
+
+    # the large request comes first and must not be overtaken by small ones
+    await asyncio.gather(_acquire(0, 15), *(_acquire(i, 1) for i in range(1, 6)))
+    assert order == [0, 1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_joint_budget_and_release():
+    rpm, tpm = TokenBucket(10, period=1.0), TokenBucket(100, period=1.0)
+    start = time.monotonic()
+    await acquire_all((rpm, 1), (tpm, 100))
+    await acquire_all((rpm, 1), (tpm, 20))
+    # the token budget is exhausted even though requests are left
+    assert time.monotonic() - start >= 0.15
+
+    tpm.release(1000)
+    assert tpm.available == pytest.approx(100)
+
+    # a request above capacity goes through and leaves the bucket in debt
+    await acquire_all((tpm, 150))
+    assert tpm.available < -40
+
+
+@pytest.mark.asyncio
+async def test_rpm_tpm_interface():
+    rpm, tpm = RPM(rpm=600), TPM(tpm=1000)
+    assert (rpm.rpm, tpm.tpm) == (600, 1000)
+    await rpm.wait(silent=True)
+    await tpm.wait(400, silent=True)
+    assert tpm.available == pytest.approx(600, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_grows_and_backs_off():
+    limiter = AdaptiveConcurrency(initial=2, max_limit=8)
+    peak, running = 0, 0
+
+    async def _request():
+        nonlocal peak, running
+        await limiter.acquire()
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        limiter.release(latency=0.01)
+
+    await asyncio.gather(*(_request() for _ in range(40)))
+    assert peak <= 8 and limiter.limit > 2
+
+    before = limiter.limit
+    for _ in range(3):
+        await limiter.acquire()
+    for _ in range(3):
+        # a burst of 429s only halves the limit once
+        limiter.release(overloaded=True)
+    assert limiter.limit == pytest.approx(before / 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_ignores_slow_responses():
+    limiter = AdaptiveConcurrency(initial=4)
+    await limiter.acquire()
+    limiter.release(latency=0.01)
+    before = limiter.limit
+    # a long generation is slow, not a sign of overload
+    await limiter.acquire()
+    limiter.release(latency=10.0)
+    assert limiter.limit > before
+
+
+@pytest.mark.asyncio
+async def test_concurrency_honors_retry_after():
+    limiter = AdaptiveConcurrency(initial=4)
+    await limiter.acquire()
+    limiter.release(overloaded=True, retry_after=0.2)
+
+    start = time.monotonic()
+    await asyncio.gather(*(limiter.acquire() for _ in range(2)))
+    assert time.monotonic() - start >= 0.19
+    assert limiter.in_flight == 2
+
+
+def test_get_retry_after():
+    class _Error(Exception):
+        def __init__(self, headers):
+            super().__init__()
+            self.response = type("Response", (), {"headers": headers})()
+
+    assert get_retry_after(_Error({"retry-after": "3"})) == 3
+    assert get_retry_after(_Error({"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(_Error({"retry-after": "soon"})) is None
+    assert get_retry_after(_Error({})) is None
+    assert get_retry_after(ValueError()) is None
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# pylint: disable=wrong-import-position
+from graphgen.models.llm.limitter import AdaptiveConcurrency
+from graphgen.models.llm.ollama_client import OllamaClient
+
+
+def _stand_in_server(requests: list):
+    """Answers /api/chat like a local Ollama server."""
+
+    def handler(request):
+        payload = json.loads(request.content)
+        requests.append(payload)
+        usage = {"prompt_eval_count": 4, "eval_count": 2, "done": True}
+        if payload.get("logprobs"):
+            logprobs = [
+                {
+                    "token": "yes",
+                    "logprob": 0.0,
+                    "top_logprobs": [
+                        {"token": "yes", "logprob": 0.0},
+                        {"token": "no", "logprob": -2.0},
+                    ],
+                }
+            ]
+            body = {"message": {"content": "yes"}, "logprobs": logprobs, **usage}
+            return httpx.Response(200, json=body)
+        if payload["stream"]:
+            lines = [
+                {"message": {"content": "Hello"}, "done": False},
+                {"message": {"content": ", world"}, "done": False},
+                {"message": {"content": ""}, **usage},
+            ]
+            return httpx.Response(
+                200, content="\n".join(json.dumps(line) for line in lines)
+            )
+        return httpx.Response(
+            200, json={"message": {"content": "<think>hmm</think>Hello"}, **usage}
+        )
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_ollama_client():
+    requests = []
+    client = OllamaClient(
+        model_name="tiny",
+        keep_alive=-1,
+        topk_per_token=2,
+        http_client=_stand_in_server(requests),
+    )
+
+    assert await client.generate_answer("hi") == "Hello"
+    assert requests[-1]["keep_alive"] == -1 and not requests[-1]["stream"]
+    assert [chunk async for chunk in client.stream_answer("hi")] == [
+        "Hello",
+        ", world",
+    ]
+
+    tokens = await client.generate_topk_per_token("is it?")
+    assert requests[-1]["options"]["num_predict"] == 1
+    assert tokens[0].text == "yes" and tokens[0].prob == 1.0
+    assert [c.text for c in tokens[0].top_candidates] == ["yes", "no"]
+    assert len(client.token_usage) == 3
+
+
+@pytest.mark.asyncio
+async def test_ollama_client_without_logprobs():
+    def handler(request):
+        body = {"message": {"content": "yes"}, "done": True}
+        return httpx.Response(200, json=body)
+
+    client = OllamaClient(
+        model_name="tiny",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    with pytest.raises(RuntimeError, match="no logprobs for model tiny"):
+        await client.generate_topk_per_token("is it?")
+
+
+@pytest.mark.asyncio
+async def test_ollama_client_backs_off_when_busy():
+    def handler(request):
+        if json.loads(request.content)["messages"][-1]["content"] == "busy":
+            return httpx.Response(503, headers={"retry-after": "0"})
+        return httpx.Response(200, json={"message": {"content": "ok"}, "done": True})
+
+    concurrency = AdaptiveConcurrency(initial=8)
+    client = OllamaClient(
+        model_name="tiny",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        concurrency=concurrency,
+    )
+    assert await client.generate_answer("hi") == "ok"
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.generate_answer("busy")
+    assert concurrency.limit < 8 and concurrency.in_flight == 0
@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+
+import pytest
+
+from graphgen.models import OpenAIClient
+from graphgen.models.llm.http_pool import HTTPPool, close_http_pools
+from graphgen.models.llm.limitter import AdaptiveConcurrency
+
+
+class _Tokenizer:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return text.split()
+
+
+async def _create(**kwargs):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="a b"))],
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5),
+    )
+
+
+def _client(**kwargs) -> OpenAIClient:
+    client = OpenAIClient(
+        api_key="dummy", tokenizer=_Tokenizer(), http_pool=None, **kwargs
+    )
+    client.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_create))
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_tokens_counted_only_with_request_limit():
+    client = _client()
+    await client.generate_answer("one two three")
+    assert client.tokenizer.encoded == []
+    # adaptive concurrency is opt-in
+    assert client.concurrency is None
+
+
+@pytest.mark.asyncio
+async def test_history_is_encoded_once():
+    client = _client(request_limit=True, max_tokens=10)
+    client.ENCODE_IN_THREAD_CHARS = 20
+    history = []
+    for turn in ["first turn", "a second turn that is long", "third"]:
+        await client.generate_answer(turn, history=list(history))
+        history += [
+            {"role": "user", "content": turn},
+            {"role": "assistant", "content": "a b"},
+        ]
+    assert sorted(client.tokenizer.encoded) == sorted(
+        ["first turn", "a second turn that is long", "third", "a b"]
+    )
+    # the unused part of the 10 reserved completion tokens is given back
+    assert client.tpm.available > client.tpm.capacity - 3 * 5 - 1
+
+
+@pytest.mark.asyncio
+async def test_clients_share_http_pool():
+    pytest.importorskip("httpx")
+    pool = HTTPPool(max_connections=8)
+    first = OpenAIClient(api_key="dummy", http_pool=pool)
+    second = OpenAIClient(api_key="dummy", http_pool=HTTPPool(max_connections=8))
+    other = OpenAIClient(api_key="dummy", http_pool=HTTPPool(max_connections=4))
+
+    http_client = pool.get_client()
+    assert first._get_client()._client is http_client
+    assert second._get_client()._client is http_client
+    assert other._get_client()._client is not http_client
+    assert first._get_client() is first._get_client()
+    await pool.aclose()
+    assert http_client.is_closed
+
+    # a closed pool is reopened on the next request
+    assert not first._get_client()._client.is_closed
+    other_client = other._get_client()._client
+    await close_http_pools()
+    assert not first._get_client()._client.is_closed
+    assert other_client.is_closed
+    await close_http_pools()
+
+
+@pytest.mark.asyncio
+async def test_stream_answer_holds_slot_until_done():
+    async def _stream(**kwargs):
+        assert kwargs["stream"] and kwargs["stream_options"]["include_usage"]
+
+        async def _chunks():
+            for piece in ["Hel", "lo"]:
+                assert client.concurrency.in_flight == 1
+                yield SimpleNamespace(
+                    choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))],
+                    usage=None,
+                )
+            yield SimpleNamespace(
+                choices=[],
+                usage=SimpleNamespace(
+                    prompt_tokens=3, completion_tokens=2, total_tokens=5
+                ),
+            )
+
+        return _chunks()
+
+    client = _client(concurrency=AdaptiveConcurrency())
+    client.client.chat.completions.create = _stream
+    assert [piece async for piece in client.stream_answer("hi")] == ["Hel", "lo"]
+    assert client.concurrency.in_flight == 0
+    assert client.token_usage[-1]["total_tokens"] == 5
+
+
+@pytest.mark.asyncio
+async def test_prefix_layout_and_cache_hits():
+    requests = []
+
+    async def _create_cached(**kwargs):
+        requests.append(kwargs["messages"])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="a b"))],
+            usage=SimpleNamespace(
+                prompt_tokens=10,
+                completion_tokens=2,
+                total_tokens=12,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=8),
+            ),
+        )
+
+    client = _client(system_prompt="be brief")
+    client.client.chat.completions.create = _create_cached
+    history = [
+        {"role": "user", "content": "q"},
+        {"role": "assistant", "content": "a"},
+    ]
+    await client.generate_answer("again", history=history)
+    await client.generate_answer("first")
+    assert [m["content"] for m in requests[0]] == ["be brief", "q", "a", "again"]
+
+    usage = client.usage_summary()
+    assert usage["requests"] == 2
+    assert usage["prompt_tokens"] == 20 and usage["cached_tokens"] == 16
+    assert usage["prefix_hit_ratio"] == pytest.approx(0.8)
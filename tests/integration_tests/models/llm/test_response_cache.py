@@ -0,0 +1,74 @@
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+from graphgen.models import OpenAIClient, ResponseCache
+
+
+def test_lru_eviction_and_reload():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(tmpdir, max_bytes=25)
+        cache.set("a", "x" * 8)
+        cache.set("b", "y" * 8)
+        assert cache.get("a") == "x" * 8
+        cache.set("c", "z" * 8)
+        # "b" is the least recently used
+        assert cache.get("b") is None
+        assert cache.get("a") == "x" * 8
+
+        reloaded = ResponseCache(tmpdir, max_bytes=25)
+        assert reloaded.get("c") == "z" * 8
+        reloaded.set("d", "w" * 8)
+        assert reloaded.get("a") is None
+
+
+class _Completions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="answer"))],
+            usage=SimpleNamespace(prompt_tokens=3, completion_tokens=1, total_tokens=4),
+        )
+
+
+@pytest.mark.asyncio
+async def test_client_answers_from_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        completions = _Completions()
+
+        def _client(temperature=0.0, base_url=None, **kwargs):
+            client = OpenAIClient(
+                api_key="dummy",
+                base_url=base_url,
+                temperature=temperature,
+                cache=ResponseCache(tmpdir, **kwargs),
+                tokenizer=SimpleNamespace(encode=lambda text: text.split()),
+                http_pool=None,
+            )
+            client.client = SimpleNamespace(
+                chat=SimpleNamespace(completions=completions)
+            )
+            return client
+
+        assert await _client().generate_answer("hello") == "answer"
+        assert await _client().generate_answer("hello") == "answer"
+        assert completions.calls == 1
+        await _client().generate_answer("hello again")
+        assert completions.calls == 2
+        # another server may serve the same model name differently
+        await _client(base_url="http://localhost:8000/v1").generate_answer("hello")
+        assert completions.calls == 3
+
+        sampled = _client(temperature=1.0)
+        await sampled.generate_answer("hello")
+        await sampled.generate_answer("hello")
+        assert completions.calls == 5
+
+        sampled = _client(temperature=1.0, cache_sampled=True)
+        await sampled.generate_answer("hello")
+        await sampled.generate_answer("hello")
+        assert completions.calls == 6
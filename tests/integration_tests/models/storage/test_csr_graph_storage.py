@@ -0,0 +1,154 @@
+import os
+import tempfile
+
+import networkx as nx
+import pytest
+
+from graphgen.models import (
+    BFSPartitioner,
+    CSRGraphStorage,
+    ECEPartitioner,
+    NetworkXStorage,
+)
+
+
+def _grid_graph() -> nx.Graph:
+    graph = nx.Graph()
+    for i in range(6):
+        graph.add_node(
+            str(i), description=f"node{i}", length=10, loss=0.0, entity_type="T"
+        )
+    for u, v, loss in [
+        ("0", "1", 0.1),
+        ("1", "2", 0.2),
+        ("0", "3", 0.3),
+        ("1", "4", 0.4),
+        ("2", "5", 0.5),
+        ("3", "4", 0.6),
+        ("4", "5", 0.7),
+    ]:
+        graph.add_edge(u, v, description=f"e{u}{v}", loss=loss, length=5)
+    return graph
+
+
+@pytest.mark.asyncio
+async def test_csr_lookup_matches_networkx():
+    graph = _grid_graph()
+    storage = CSRGraphStorage.from_networkx(graph)
+
+    assert await storage.has_node("4")
+    assert not await storage.has_node("9")
+    assert await storage.has_edge("4", "1") and await storage.has_edge("1", "4")
+    assert not await storage.has_edge("0", "5")
+    assert await storage.get_edge("0", "5") is None
+    for node in graph.nodes:
+        assert await storage.node_degree(node) == graph.degree(node)
+        assert await storage.get_node(node) == graph.nodes[node]
+    for u, v, data in graph.edges(data=True):
+        assert await storage.get_edge(v, u) == data
+    assert {v for _, v, _ in await storage.get_node_edges("1")} == {"0", "2", "4"}
+    assert len(await storage.get_all_edges()) == graph.number_of_edges()
+
+
+@pytest.mark.asyncio
+async def test_csr_updates_attributes():
+    storage = CSRGraphStorage.from_networkx(_grid_graph())
+
+    edge = await storage.get_edge("0", "1")
+    edge["loss"] = 0.9
+    await storage.update_edge("1", "0", {"length": 7, "description": "updated"})
+    await storage.update_node("2", {"length": "long", "tags": ["a"]})
+
+    assert await storage.get_edge("1", "0") == {
+        "description": "updated",
+        "loss": 0.9,
+        "length": 7,
+    }
+    assert await storage.get_node("2") == {
+        "description": "node2",
+        "length": "long",
+        "loss": 0.0,
+        "entity_type": "T",
+        "tags": ["a"],
+    }
+    with pytest.raises(NotImplementedError):
+        await storage.upsert_edge("0", "5", {})
+
+
+@pytest.mark.asyncio
+async def test_csr_repeated_updates_reuse_strings():
+    storage = CSRGraphStorage.from_networkx(_grid_graph())
+
+    for i in range(100):
+        await storage.update_node("2", {"description": f"v{i % 2}"})
+        await storage.update_edge("0", "1", {"description": "updated"})
+    assert len(storage._strings.added) == 3
+    assert (await storage.get_node("2"))["description"] == "v1"
+
+
+@pytest.mark.asyncio
+async def test_csr_loads_networkx_snapshot():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        nx_storage = NetworkXStorage(
+            working_dir=tmpdir, namespace="graph", journal_min_compact_ops=0
+        )
+        graph = _grid_graph()
+        for node, data in graph.nodes(data=True):
+            await nx_storage.upsert_node(node, data)
+        for u, v, data in graph.edges(data=True):
+            await nx_storage.upsert_edge(u, v, data)
+        await nx_storage.index_done_callback()
+        await nx_storage.wait_for_compaction()
+        assert os.path.exists(os.path.join(tmpdir, "graph.snapshot.npz"))
+
+        storage = CSRGraphStorage(
+            working_dir=tmpdir, namespace="graph", load_snapshot=True
+        )
+        assert len(await storage.get_all_nodes()) == 6
+        assert await storage.get_edge("5", "4") == graph.edges["4", "5"]
+
+
+@pytest.mark.asyncio
+async def test_csr_keeps_none_values():
+    graph = nx.Graph()
+    graph.add_node("A", description="a", loss=None)
+    graph.add_node("B", description=None, loss=0.5)
+    graph.add_edge("A", "B", weight=None)
+    storage = CSRGraphStorage.from_networkx(graph)
+    assert dict(await storage.get_node("A")) == {"description": "a", "loss": None}
+    assert dict(await storage.get_node("B")) == {"description": None, "loss": 0.5}
+    assert dict(await storage.get_edge("A", "B")) == {"weight": None}
+
+    await storage.update_node("B", {"description": "b"})
+    assert (await storage.get_node("B"))["description"] == "b"
+
+
+@pytest.mark.asyncio
+async def test_partitioners_run_on_csr():
+    storage = CSRGraphStorage.from_networkx(_grid_graph())
+
+    for partitioner, params in [
+        (BFSPartitioner(), {"max_units_per_community": 3}),
+        (ECEPartitioner(), {"max_units_per_community": 4, "unit_sampling": "max_loss"}),
+    ]:
+        communities = await partitioner.partition(storage, **params)
+        assert sorted(n for c in communities for n in c.nodes) == [
+            str(i) for i in range(6)
+        ]
+        assert sorted(i for c in communities for i in c.edge_ids) == list(range(7))
+        batches = await partitioner.community2batch(communities, g=storage)
+        assert sum(len(edges) for _, edges in batches) == 7
+
+
+@pytest.mark.asyncio
+async def test_csr_keeps_edge_ids():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        nx_storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        await nx_storage.upsert_edges({("A", "B"): {}, ("B", "C"): {}, ("C", "D"): {}})
+        await nx_storage.delete_node("A")
+
+        storage = await CSRGraphStorage.from_graph_storage(nx_storage)
+        assert sorted(await storage.get_all_edges_with_ids()) == sorted(
+            await nx_storage.get_all_edges_with_ids()
+        )
+        assert await storage.get_edges_by_ids([2, 0]) == [("C", "D", {}), None]
@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from graphgen.models import JsonListStorage
+
+
+@pytest.mark.asyncio
+async def test_json_list_storage_dedup_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonListStorage(working_dir=tmpdir, namespace="qa")
+        qa = {"question": "q1", "answer": "a1"}
+        assert await storage.upsert([qa]) == [qa]
+        assert await storage.upsert([{"answer": "a1", "question": "q1"}]) == []
+        await storage.index_done_callback()
+        assert os.path.exists(os.path.join(tmpdir, "qa.index.json"))
+
+        reopened = JsonListStorage(working_dir=tmpdir, namespace="qa")
+        new_qa = {"question": "q2", "answer": "a2"}
+        assert await reopened.upsert([qa, new_qa]) == [new_qa]
+        assert await reopened.all_items() == [qa, new_qa]
+
+
+@pytest.mark.asyncio
+async def test_json_list_storage_rebuilds_stale_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        qa = {"question": "q1", "answer": "a1"}
+        with open(os.path.join(tmpdir, "qa.json"), "w", encoding="utf-8") as f:
+            json.dump([qa], f)
+
+        storage = JsonListStorage(working_dir=tmpdir, namespace="qa")
+        assert await storage.upsert([qa]) == []
+
+
+@pytest.mark.asyncio
+async def test_json_list_storage_rebuilds_index_of_edited_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonListStorage(working_dir=tmpdir, namespace="qa")
+        await storage.upsert([{"question": "q1", "answer": "a1"}])
+        await storage.index_done_callback()
+
+        # same length, different content
+        qa = {"question": "q2", "answer": "a2"}
+        with open(os.path.join(tmpdir, "qa.json"), "w", encoding="utf-8") as f:
+            json.dump([qa], f)
+
+        storage = JsonListStorage(working_dir=tmpdir, namespace="qa")
+        assert await storage.upsert([qa]) == []
+        assert await storage.upsert([{"question": "q1", "answer": "a1"}]) == [
+            {"question": "q1", "answer": "a1"}
+        ]
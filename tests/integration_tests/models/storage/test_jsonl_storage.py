@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import pytest
+
+from graphgen.models import JsonlListStorage
+
+
+@pytest.mark.asyncio
+async def test_keyed_upsert_and_reload():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        assert await storage.upsert([{"q": 1}, {"q": 2}], key="batch-1") == [
+            {"q": 1},
+            {"q": 2},
+        ]
+        assert await storage.upsert([{"q": 3}], key="batch-1") == []
+        assert await storage.upsert([{"q": 2}, {"q": 3}]) == [{"q": 3}]
+        await storage.index_done_callback()
+
+        reloaded = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        assert await reloaded.all_items() == [{"q": 1}, {"q": 2}, {"q": 3}]
+        assert await reloaded.get_by_index(2) == {"q": 3}
+        assert await reloaded.get_by_index(3) is None
+        assert await reloaded.filter_keys(["batch-1", "batch-2"]) == {"batch-2"}
+        assert await reloaded.upsert([{"q": 1}]) == []
+
+
+@pytest.mark.asyncio
+async def test_uncommitted_data_is_dropped():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        await storage.upsert([{"q": 1}], key="batch-1")
+        await storage.upsert([{"q": 2}, {"q": 3}], key="batch-2")
+        await storage.index_done_callback()
+
+        # simulate a crash after the data of batch-2 but before its commit
+        commit_file = os.path.join(tmpdir, "qa.commits")
+        with open(commit_file, "rb") as f:
+            lines = f.readlines()
+        with open(commit_file, "wb") as f:
+            f.write(lines[0] + lines[1][:5])
+        with open(os.path.join(tmpdir, "qa.jsonl"), "ab") as f:
+            f.write(b'{"q": 4')
+
+        reloaded = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        assert await reloaded.all_items() == [{"q": 1}]
+        assert await reloaded.filter_keys(["batch-1", "batch-2"]) == {"batch-2"}
+        assert await reloaded.upsert([{"q": 2}, {"q": 3}], key="batch-2") == [
+            {"q": 2},
+            {"q": 3},
+        ]
+
+        reloaded = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        assert await reloaded.all_items() == [{"q": 1}, {"q": 2}, {"q": 3}]
+
+
+@pytest.mark.asyncio
+async def test_drop():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        await storage.upsert([{"q": 1}], key="batch-1")
+        await storage.drop()
+
+        assert await storage.all_items() == []
+        assert await storage.filter_keys(["batch-1"]) == {"batch-1"}
+        await storage.append({"q": 2})
+        assert await storage.all_items() == [{"q": 2}]
@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+import pytest
+
+from graphgen.models import LogKVStorage
+
+
+@pytest.mark.asyncio
+async def test_upsert_and_reopen():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = LogKVStorage(working_dir=tmpdir, namespace="chunks")
+        left = await storage.upsert({"a": {"content": "x"}, "b": {"content": "y"}})
+        assert set(left) == {"a", "b"}
+        # existing keys are not overwritten
+        left = await storage.upsert({"a": {"content": "z"}, "c": {"content": "w"}})
+        assert set(left) == {"c"}
+        await storage.index_done_callback()
+
+        reopened = LogKVStorage(working_dir=tmpdir, namespace="chunks")
+        assert sorted(await reopened.all_keys()) == ["a", "b", "c"]
+        assert await reopened.get_by_id("a") == {"content": "x"}
+        assert await reopened.get_by_ids(["c", "missing"], fields={"content"}) == [
+            {"content": "w"},
+            None,
+        ]
+        assert await reopened.filter_keys(["a", "d"]) == {"d"}
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_truncated():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = LogKVStorage(working_dir=tmpdir, namespace="docs")
+        await storage.upsert({"a": "first"})
+        await storage.index_done_callback()
+
+        segment_path = os.path.join(tmpdir, "docs_segments", "segment-000000.log")
+        with open(segment_path, "ab") as f:
+            f.write(b'"b"\t"unfinish')
+
+        reopened = LogKVStorage(working_dir=tmpdir, namespace="docs")
+        assert await reopened.all_keys() == ["a"]
+        await reopened.upsert({"b": "second"})
+        assert await reopened.get_by_id("b") == "second"
+
+
+@pytest.mark.asyncio
+async def test_compaction_merges_segments():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(4):
+            storage = LogKVStorage(
+                working_dir=tmpdir, namespace="kv", compact_min_segments=3
+            )
+            await storage.upsert({f"key-{i}": {"value": i}})
+            await storage.index_done_callback()
+
+        # four sealed segments for one segment worth of data
+        storage = LogKVStorage(
+            working_dir=tmpdir, namespace="kv", compact_min_segments=3
+        )
+        await storage.index_done_callback()
+        segments = [
+            f
+            for f in os.listdir(os.path.join(tmpdir, "kv_segments"))
+            if f.endswith(".log")
+        ]
+        assert len(segments) == 1
+        assert await storage.get_by_ids([f"key-{i}" for i in range(4)]) == [
+            {"value": i} for i in range(4)
+        ]
+
+
+@pytest.mark.asyncio
+async def test_read_only_mode():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = LogKVStorage(
+            working_dir=tmpdir, namespace="docs", max_segment_bytes=32
+        )
+        await storage.upsert({"a": {"content": "x" * 40}})
+        await storage.upsert({"b": {"content": "中文"}})
+        # the writer keeps its last segment open and unsealed
+        segment_dir = os.path.join(tmpdir, "docs_segments")
+        files = sorted(os.listdir(segment_dir))
+
+        reader = LogKVStorage(working_dir=tmpdir, namespace="docs", read_only=True)
+        assert await reader.get_by_ids(["a", "b", "c"]) == [
+            {"content": "x" * 40},
+            {"content": "中文"},
+            None,
+        ]
+        assert await reader.filter_keys(["a", "c"]) == {"c"}
+        with pytest.raises(RuntimeError):
+            await reader.upsert({"c": 1})
+        await reader.index_done_callback()
+        assert sorted(os.listdir(segment_dir)) == files
+
+        empty = LogKVStorage(working_dir=tmpdir, namespace="missing", read_only=True)
+        assert await empty.all_keys() == []
+        assert not os.path.exists(os.path.join(tmpdir, "missing_segments"))
@@ -0,0 +1,43 @@
+import tempfile
+
+import pytest
+
+from graphgen.models import SQLiteKVStorage, SQLiteListStorage
+
+
+@pytest.mark.asyncio
+async def test_sqlite_kv_storage():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteKVStorage(working_dir=tmpdir, namespace="text_chunks")
+        left = await storage.upsert({"a": {"content": "x", "tokens": 1}, "b": {}})
+        assert set(left) == {"a", "b"}
+        left = await storage.upsert({"a": {"content": "z"}, "c": {"content": "w"}})
+        assert left == {"c": {"content": "w"}}
+        await storage.index_done_callback()
+
+        reopened = SQLiteKVStorage(working_dir=tmpdir, namespace="text_chunks")
+        assert sorted(await reopened.all_keys()) == ["a", "b", "c"]
+        assert await reopened.filter_keys(["a", "d", "e", "d"]) == {"d", "e"}
+        assert await reopened.get_by_ids(["a", "missing"], fields={"content"}) == [
+            {"content": "x"},
+            None,
+        ]
+
+        await reopened.drop()
+        assert await reopened.all_keys() == []
+
+
+@pytest.mark.asyncio
+async def test_sqlite_list_storage():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = SQLiteListStorage(working_dir=tmpdir, namespace="qa")
+        qa = {"question": "q1", "answer": "a1"}
+        assert await storage.upsert([qa]) == [qa]
+        # same content with a different key order is a duplicate
+        assert await storage.upsert([{"answer": "a1", "question": "q1"}]) == []
+        await storage.append({"question": "q2", "answer": "a2"})
+
+        reopened = SQLiteListStorage(working_dir=tmpdir, namespace="qa")
+        assert await reopened.all_items() == [qa, {"question": "q2", "answer": "a2"}]
+        assert await reopened.get_by_index(1) == {"question": "q2", "answer": "a2"}
+        assert await reopened.get_by_index(2) is None
@@ -1,4 +1,8 @@
+import os
+import tempfile
+
 import networkx as nx
+import pytest
 
 from graphgen.models.storage.networkx_storage import NetworkXStorage
 
@@ -25,3 +29,189 @@ def test_stable_largest_connected_component_directed():
 
     assert set(lcc.nodes) == {"A", "B"}
     assert lcc.is_directed()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(
+            working_dir=tmpdir, namespace="graph", journal_min_compact_ops=0
+        )
+        await storage.upsert_node("A", {"description": "a", "length": 3})
+        await storage.upsert_node("B", {"description": "b", "loss": 0.5})
+        await storage.upsert_node("中文", {"description": "描述"})
+        await storage.upsert_edge("A", "B", {"description": "a-b", "length": 2})
+        await storage.upsert_edge("B", "中文", {"description": "b-c", "weight": 1.5})
+        await storage.index_done_callback()
+        await storage.wait_for_compaction()
+        assert not [f for f in os.listdir(tmpdir) if ".journal." in f]
+
+        reopened = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await reopened.get_node("A") == {"description": "a", "length": 3}
+        assert await reopened.get_node("B") == {"description": "b", "loss": 0.5}
+        assert await reopened.get_node("中文") == {"description": "描述"}
+        assert await reopened.get_edge("B", "A") == {"description": "a-b", "length": 2}
+        assert await reopened.get_edge("中文", "B") == {
+            "description": "b-c",
+            "weight": 1.5,
+        }
+
+
+@pytest.mark.asyncio
+async def test_snapshot_keeps_none_values():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(
+            working_dir=tmpdir, namespace="graph", journal_min_compact_ops=0
+        )
+        await storage.upsert_node("A", {"description": "a", "loss": None})
+        await storage.upsert_node("B", {"description": None, "loss": 0.5})
+        await storage.upsert_node("C", {"source_id": None})
+        await storage.upsert_edge("A", "B", {"description": "a-b", "weight": None})
+        await storage.index_done_callback()
+        await storage.wait_for_compaction()
+
+        reopened = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await reopened.get_node("A") == {"description": "a", "loss": None}
+        assert await reopened.get_node("B") == {"description": None, "loss": 0.5}
+        assert await reopened.get_node("C") == {"source_id": None}
+        assert await reopened.get_edge("A", "B") == {
+            "description": "a-b",
+            "weight": None,
+        }
+
+
+@pytest.mark.asyncio
+async def test_snapshot_keeps_int_and_float_types():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(
+            working_dir=tmpdir, namespace="graph", journal_min_compact_ops=0
+        )
+        await storage.upsert_node("A", {"length": 3, "loss": 0.5, "weight": 1})
+        await storage.upsert_node("B", {"length": 4, "loss": 1.0, "weight": 2.5})
+        await storage.upsert_node("C", {"big": 2**70})
+        await storage.index_done_callback()
+        await storage.wait_for_compaction()
+
+        reopened = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        a, b = await reopened.get_node("A"), await reopened.get_node("B")
+        assert type(a["length"]) is int and type(b["length"]) is int
+        assert type(b["loss"]) is float and b["loss"] == 1.0
+        # a key holding both ints and floats keeps the type of each value
+        assert type(a["weight"]) is int and type(b["weight"]) is float
+        assert (await reopened.get_node("C"))["big"] == 2**70
+
+
+@pytest.mark.asyncio
+async def test_graphml_is_converted_once():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = nx.Graph()
+        graph.add_node("A", description="a")
+        graph.add_node("B", description="b")
+        graph.add_edge("A", "B", description="a-b")
+        nx.write_graphml(graph, os.path.join(tmpdir, "graph.graphml"))
+
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert os.path.exists(os.path.join(tmpdir, "graph.snapshot.npz"))
+        assert await storage.get_edge("A", "B") == {"description": "a-b"}
+
+        storage.export_graphml(os.path.join(tmpdir, "export.graphml"))
+        exported = nx.read_graphml(os.path.join(tmpdir, "export.graphml"))
+        assert exported.number_of_edges() == 1
+
+
+@pytest.mark.asyncio
+async def test_journal_replay():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        await storage.upsert_edge("A", "B", {"description": "a-b"})
+        await storage.upsert_edge("B", "C", {"description": "b-c"})
+        await storage.index_done_callback()
+        assert not os.path.exists(os.path.join(tmpdir, "graph.snapshot.npz"))
+
+        await storage.update_edge("A", "B", {"loss": 0.3})
+        await storage.update_node("A", {"length": 1})
+        await storage.delete_node("C")
+        await storage.index_done_callback()
+        # changes after the last callback are not persisted
+        await storage.upsert_node("D", {"description": "d"})
+
+        journal = os.path.join(tmpdir, "graph.journal.0.jsonl")
+        with open(journal, "ab") as f:
+            f.write(b'{"op": "upsert_node", "id": "E"')
+
+        reopened = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await reopened.get_all_nodes() == [("A", {"length": 1}), ("B", {})]
+        assert await reopened.get_edge("A", "B") == {"description": "a-b", "loss": 0.3}
+        assert not await reopened.has_edge("B", "C")
+
+
+@pytest.mark.asyncio
+async def test_bulk_methods():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        await storage.upsert_nodes({"A": {"description": "a"}, "B": {}})
+        await storage.upsert_edges({("A", "B"): {"description": "a-b"}})
+        await storage.update_nodes({"A": {"length": 1}, "missing": {"length": 2}})
+        await storage.update_edges({("B", "A"): {"loss": 0.3}})
+
+        assert await storage.get_nodes(["A", "missing"]) == [
+            {"description": "a", "length": 1},
+            None,
+        ]
+        assert await storage.get_edges([("B", "A"), ("A", "C")]) == [
+            {"description": "a-b", "loss": 0.3},
+            None,
+        ]
+
+        await storage.index_done_callback()
+        reopened = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        assert await reopened.get_all_nodes() == [
+            ("A", {"description": "a", "length": 1}),
+            ("B", {}),
+        ]
+        assert await reopened.get_edge("A", "B") == {"description": "a-b", "loss": 0.3}
+
+
+@pytest.mark.asyncio
+async def test_edge_ids_are_canonical_and_persisted():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        await storage.upsert_edge("B", "A", {"description": "a-b"})
+        await storage.upsert_edges({("B", "C"): {}, ("C", "D"): {}})
+        await storage.upsert_edge("A", "B", {"loss": 0.1})
+        ids = {
+            frozenset((u, v)): i
+            for i, u, v, _ in await storage.get_all_edges_with_ids()
+        }
+        assert sorted(ids.values()) == [0, 1, 2]
+
+        await storage.delete_node("D")
+        await storage.upsert_edge("A", "C", {})
+        await storage.index_done_callback()
+
+        def _check(edges):
+            by_id = {i: frozenset((u, v)) for i, u, v, _ in edges}
+            assert by_id == {
+                ids[frozenset("AB")]: frozenset("AB"),
+                ids[frozenset("BC")]: frozenset("BC"),
+                3: frozenset("AC"),
+            }
+
+        reopened = NetworkXStorage(
+            working_dir=tmpdir, namespace="graph", journal_min_compact_ops=0
+        )
+        _check(await reopened.get_all_edges_with_ids())
+        assert await reopened.get_edges_by_ids([ids[frozenset("AB")], 2, 9]) == [
+            ("B", "A", {"description": "a-b", "loss": 0.1}),
+            None,
+            None,
+        ]
+
+        # compaction keeps the ids in the snapshot
+        await reopened.upsert_edge("C", "E", {})
+        await reopened.index_done_callback()
+        await reopened.wait_for_compaction()
+        compacted = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        edges = await compacted.get_all_edges_with_ids()
+        assert {i for i, u, v, _ in edges if {u, v} == {"C", "E"}} == {4}
+        _check([e for e in edges if e[0] != 4])
@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, List, Optional
+
+import pytest
+
+from graphgen.bases import BaseLLMClient
+from graphgen.models import JsonKVStorage, NetworkXStorage
+from graphgen.operators import insert_pipeline
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class _Client(BaseLLMClient):
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        name = re.findall(r"Doc \d+", text)[-1].replace(" ", "")
+        return (
+            f'("entity"<|>"Rome"<|>"location"<|>"Capital.")##\n'
+            f'("entity"<|>"{name}"<|>"event"<|>"A document.")##\n'
+            f'("relationship"<|>"{name}"<|>"Rome"<|>"Mentions Rome."<|>1)'
+            "<|COMPLETE|>"
+        )
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        raise NotImplementedError
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+@pytest.mark.asyncio
+async def test_insert_pipeline_merges_while_reading():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = NetworkXStorage(tmpdir, namespace="graph")
+        full_docs = JsonKVStorage(tmpdir, namespace="full_docs")
+        text_chunks = JsonKVStorage(tmpdir, namespace="text_chunks")
+        first_write = threading.Event()
+        upsert_nodes = graph.upsert_nodes
+
+        async def _upsert_nodes(nodes):
+            await upsert_nodes(nodes)
+            first_write.set()
+
+        graph.upsert_nodes = _upsert_nodes
+
+        def _docs():
+            yield {"content": "Doc 0 is about Rome."}
+            # later docs are only read once the first chunk reached the graph
+            assert first_write.wait(timeout=10)
+            for i in range(1, 5):
+                yield {"content": f"Doc {i} is about Rome."}
+            yield {"content": "Doc 4 is about Rome."}
+            yield {"content": "img.png", "type": "image"}
+
+        async def _insert(docs):
+            return await insert_pipeline(
+                docs,
+                llm_client=_Client(tokenizer=_Tokenizer()),
+                kg_instance=graph,
+                full_docs_storage=full_docs,
+                text_chunks_storage=text_chunks,
+                max_loop=0,
+                workers=2,
+                queue_size=1,
+                merge_batch_size=2,
+            )
+
+        assert await _insert(_docs()) == 5
+        rome = await graph.get_node('"ROME"')
+        assert len(rome["source_id"].split("<SEP>")) == 5
+        assert await graph.get_edge('"DOC3"', '"ROME"') is not None
+        assert len(await text_chunks.all_keys()) == 5
+
+        # docs already inserted are skipped
+        assert await _insert(iter([{"content": "Doc 2 is about Rome."}])) == 0
+
+
+class _SummaryClient(BaseLLMClient):
+    fail_on = None
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        if self.fail_on and self.fail_on in text:
+            raise RuntimeError("summary failed")
+        return "summary"
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        raise NotImplementedError
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+@pytest.mark.asyncio
+async def test_insert_pipeline_summarizes_pending_keys():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = NetworkXStorage(tmpdir, namespace="graph")
+        long_description = " ".join(["word"] * 300)
+        for name in ["A", "B", "C"]:
+            await graph.upsert_node(name, {"description": f"{name} {long_description}"})
+        # A and B were merged by an insert that stopped before its summary pass
+        pending_file = os.path.join(tmpdir, "graph.pending_summaries.json")
+        with open(pending_file, "w", encoding="utf-8") as f:
+            json.dump({"nodes": ["A", "B"], "edges": []}, f)
+        client = _SummaryClient(tokenizer=_Tokenizer())
+
+        async def _insert():
+            return await insert_pipeline(
+                iter([]),
+                llm_client=client,
+                kg_instance=graph,
+                full_docs_storage=JsonKVStorage(tmpdir, namespace="full_docs"),
+                text_chunks_storage=JsonKVStorage(tmpdir, namespace="text_chunks"),
+                workers=1,
+            )
+
+        client.fail_on = "B word"
+        assert await _insert() == 0
+        assert (await graph.get_node("A"))["description"] == "summary"
+        assert (await graph.get_node("B"))["description"] != "summary"
+        # only pending keys are summarized, the rest of the graph is not scanned
+        assert (await graph.get_node("C"))["description"] != "summary"
+        with open(pending_file, encoding="utf-8") as f:
+            assert json.load(f) == {"nodes": ["B"], "edges": []}
+
+        client.fail_on = None
+        await _insert()
+        assert (await graph.get_node("B"))["description"] == "summary"
+        assert not os.path.exists(pending_file)
@@ -0,0 +1,140 @@
+import random
+import tempfile
+from typing import Any, List, Optional
+
+import pytest
+
+from graphgen.bases import BaseLLMClient
+from graphgen.models import JsonKVStorage, LightRAGKGBuilder, NetworkXStorage
+from graphgen.operators.build_kg import merge_kg, summarize_kg
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class _Client(BaseLLMClient):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts: List[str] = []
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        self.prompts.append(text)
+        return "summary"
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        raise NotImplementedError
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+def _extracted(seed: int):
+    rng = random.Random(seed)
+    nodes, edges = {}, {}
+    for i in range(30):
+        name = f"E{i}"
+        data = [
+            {
+                "entity_name": name,
+                "entity_type": "place" if (i + c) % 3 == 0 else "person",
+                "description": f"{name} seen in chunk {c}",
+                "source_id": f"chunk-{c}",
+            }
+            for c in range(3)
+        ]
+        rng.shuffle(data)
+        nodes[name] = data
+        edges[(name, f"X{i % 5}")] = [
+            {
+                "src_id": name,
+                "tgt_id": f"X{i % 5}",
+                "description": f"{name} links to X{i % 5}",
+                "source_id": f"chunk-{c}",
+            }
+            for c in rng.sample(range(3), 3)
+        ]
+    # long enough to be summarized
+    nodes["E0"][0]["description"] = " ".join(["word"] * 300)
+    items = list(nodes.items())
+    rng.shuffle(items)
+    return dict(items), edges
+
+
+@pytest.mark.asyncio
+async def test_merge_is_deterministic():
+    graphs = []
+    for seed, shards in [(0, 1), (1, 4), (2, 16)]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            client = _Client(tokenizer=_Tokenizer())
+            graph = NetworkXStorage(tmpdir, namespace="graph")
+            kg_builder = LightRAGKGBuilder(llm_client=client)
+            dirty = await merge_kg(kg_builder, graph, *_extracted(seed), shards=shards)
+            assert client.prompts == []
+            assert await summarize_kg(kg_builder, graph, *dirty) == 1
+            graphs.append((await graph.get_all_nodes(), await graph.get_all_edges()))
+
+    assert graphs[0] == graphs[1] == graphs[2]
+    nodes = dict(graphs[0][0])
+    assert nodes["E0"]["description"] == "summary"
+    assert nodes["E2"]["source_id"] == "chunk-0<SEP>chunk-1<SEP>chunk-2"
+    # placeholders come from the first edge of the end node
+    assert nodes["X0"]["entity_type"] == "UNKNOWN"
+    assert nodes["X0"]["description"] == "E0 links to X0"
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_deferred_and_cached():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = _Client(tokenizer=_Tokenizer())
+        kg_builder = LightRAGKGBuilder(llm_client=client)
+        cache = JsonKVStorage(tmpdir, namespace="summary")
+
+        async def _insert(namespace):
+            graph = NetworkXStorage(tmpdir, namespace=namespace)
+            dirty_nodes = set()
+            # a popular entity, merged again for every batch of chunks
+            for c in range(5):
+                entity = {
+                    "entity_type": "place",
+                    "description": f"Rome in chunk {c}: " + " ".join(["word"] * 60),
+                    "source_id": f"chunk-{c}",
+                }
+                nodes, _ = await merge_kg(kg_builder, graph, {"ROME": [entity]}, {})
+                dirty_nodes |= nodes
+            summarized = await summarize_kg(
+                kg_builder, graph, dirty_nodes, [], summary_cache=cache
+            )
+            return summarized, await graph.get_node("ROME")
+
+        summarized, rome = await _insert("first")
+        assert summarized == 1 and len(client.prompts) == 1
+        assert rome["description"] == "summary"
+
+        # the same description is not summarized again
+        summarized, rome = await _insert("second")
+        assert summarized == 0 and len(client.prompts) == 1
+        assert rome["description"] == "summary"
+
+
+@pytest.mark.asyncio
+async def test_sweep_summarizes_descriptions_left_by_a_crash():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = _Client(tokenizer=_Tokenizer())
+        kg_builder = LightRAGKGBuilder(llm_client=client)
+        graph = NetworkXStorage(tmpdir, namespace="graph")
+        await merge_kg(kg_builder, graph, *_extracted(0))
+        # checkpointed, then stopped before the summary pass
+        await graph.index_done_callback()
+
+        graph = NetworkXStorage(tmpdir, namespace="graph")
+        assert await summarize_kg(kg_builder, graph, [], []) == 0
+        assert await summarize_kg(kg_builder, graph, [], [], sweep=True) == 1
+        assert (await graph.get_node("E0"))["description"] == "summary"
+        assert await summarize_kg(kg_builder, graph, [], [], sweep=True) == 0
@@ -0,0 +1,55 @@
+import tempfile
+
+import pytest
+
+from graphgen.models import NetworkXStorage
+from graphgen.operators.partition.pre_tokenize import pre_tokenize
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class _Storage(NetworkXStorage):
+    async def update_nodes(self, nodes):
+        self.updated_nodes = dict(nodes)
+        await super().update_nodes(nodes)
+
+    async def update_edges(self, edges):
+        self.updated_edges = dict(edges)
+        await super().update_edges(edges)
+
+
+@pytest.mark.asyncio
+async def test_pre_tokenize_writes_back_new_lengths_only():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = _Storage(working_dir=tmpdir, namespace="graph")
+        await storage.upsert_node("A", {"description": "one two", "length": 2})
+        await storage.upsert_node("B", {"description": "one two three"})
+        await storage.upsert_edge("A", "B", {"description": "a b", "length": 2})
+        storage.updated_nodes = storage.updated_edges = None
+
+        edges, nodes = await pre_tokenize(
+            storage,
+            _Tokenizer(),
+            await storage.get_all_edges(),
+            await storage.get_all_nodes(),
+        )
+        assert storage.updated_nodes == {
+            "B": {"description": "one two three", "length": 3}
+        }
+        assert storage.updated_edges is None
+        assert len(edges) == 1 and len(nodes) == 2
+
+        storage.updated_nodes = None
+        await pre_tokenize(
+            storage,
+            _Tokenizer(),
+            await storage.get_all_edges(),
+            await storage.get_all_nodes(),
+        )
+        assert storage.updated_nodes is None
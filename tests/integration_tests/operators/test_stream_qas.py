@@ -0,0 +1,71 @@
+import tempfile
+from typing import Any, List, Optional
+
+import pytest
+
+from graphgen.bases import BaseLLMClient
+from graphgen.models import JsonlListStorage, NetworkXStorage
+from graphgen.operators import partition_kg, stream_qas
+from graphgen.utils import compute_content_hash
+
+PARTITION_CONFIG = {
+    "method": "bfs",
+    "method_params": {"max_units_per_community": 3, "random_seed": 7},
+}
+GENERATE_CONFIG = {"mode": "atomic", "data_format": "Alpaca"}
+
+
+class _Client(BaseLLMClient):
+    def __init__(self, fail_after: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("interrupted")
+        return f"Question: {compute_content_hash(text)}\nAnswer: a"
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        raise NotImplementedError
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+async def _build_graph(tmpdir: str) -> NetworkXStorage:
+    graph = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+    for i in range(8):
+        await graph.upsert_node(f"N{i}", {"description": f"node {i}"})
+    for i in range(7):
+        await graph.upsert_edge(f"N{i}", f"N{i + 1}", {"description": f"edge {i}"})
+    await graph.index_done_callback()
+    return graph
+
+
+@pytest.mark.asyncio
+async def test_stream_qas_resumes_interrupted_run():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph = await _build_graph(tmpdir)
+        batches = await partition_kg(graph, None, PARTITION_CONFIG)
+        assert len(batches) == 6
+
+        # the first run writes 2 batches, then every LLM call fails
+        qa_storage = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        written = await stream_qas(
+            _Client(fail_after=2), batches, GENERATE_CONFIG, qa_storage
+        )
+        assert written == 2
+        await qa_storage.index_done_callback()
+
+        # a new run reopens the same output dir and partitions the same way
+        graph = NetworkXStorage(working_dir=tmpdir, namespace="graph")
+        batches = await partition_kg(graph, None, PARTITION_CONFIG)
+        qa_storage = JsonlListStorage(working_dir=tmpdir, namespace="qa")
+        client = _Client()
+        written = await stream_qas(client, batches, GENERATE_CONFIG, qa_storage)
+        assert client.calls == written == 4
+        assert len(await qa_storage.all_items()) == 6
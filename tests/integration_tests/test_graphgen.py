@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+from typing import Any, List, Optional
+
+import pytest
+
+from graphgen.bases import BaseLLMClient
+from graphgen.graphgen import GraphGen
+from graphgen.models import BatchLLMClient, FileBatchRunner, OpenAIClient
+
+
+class _Tokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class _Client(BaseLLMClient):
+    async def generate_answer(
+        self, text: str, history: Optional[List[str]] = None, **extra: Any
+    ) -> str:
+        return '("entity"<|>"Rome"<|>"location"<|>"Capital.")<|COMPLETE|>'
+
+    async def generate_topk_per_token(self, text, history=None, **extra):
+        raise NotImplementedError
+
+    async def generate_inputs_prob(self, text, history=None, **extra):
+        raise NotImplementedError
+
+
+def test_llm_backends_from_env(monkeypatch):
+    monkeypatch.setenv("SYNTHESIZER_BACKEND", "batch")
+    monkeypatch.setenv("SYNTHESIZER_BATCH_COMMAND", "run_batch -i {input} -o {output}")
+    monkeypatch.setenv("TRAINEE_BACKEND", "openai")
+    monkeypatch.setenv("TRAINEE_API_KEY", "dummy")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph_gen = GraphGen(working_dir=tmpdir, tokenizer_instance=_Tokenizer())
+        synthesizer = graph_gen.synthesizer_llm_client
+        assert isinstance(synthesizer, BatchLLMClient)
+        assert isinstance(synthesizer.runner, FileBatchRunner)
+        assert synthesizer.runner.command[-1] == "{output}"
+        assert isinstance(graph_gen.trainee_llm_client, OpenAIClient)
+        assert synthesizer.concurrency.max_limit == 512
+        assert graph_gen.trainee_llm_client.concurrency is not synthesizer.concurrency
+
+        monkeypatch.setenv("TRAINEE_MAX_CONCURRENCY", "8")
+        graph_gen = GraphGen(working_dir=tmpdir, tokenizer_instance=_Tokenizer())
+        trainee_concurrency = graph_gen.trainee_llm_client.concurrency
+        assert trainee_concurrency.max_limit == 8 and trainee_concurrency.limit == 8
+
+        monkeypatch.setenv("TRAINEE_BACKEND", "unknown")
+        with pytest.raises(ValueError, match="trainee backend"):
+            GraphGen(working_dir=tmpdir, tokenizer_instance=_Tokenizer())
+
+
+def test_ollama_backend_from_env(monkeypatch):
+    pytest.importorskip("httpx")
+    monkeypatch.setenv("SYNTHESIZER_BACKEND", "ollama")
+    monkeypatch.setenv("SYNTHESIZER_MODEL", "qwen2.5:7b")
+    monkeypatch.delenv("SYNTHESIZER_BASE_URL", raising=False)
+    monkeypatch.setenv("TRAINEE_BACKEND", "ollama")
+    monkeypatch.setenv("TRAINEE_BASE_URL", "http://gpu-box:11434/")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        graph_gen = GraphGen(working_dir=tmpdir, tokenizer_instance=_Tokenizer())
+        synthesizer = graph_gen.synthesizer_llm_client
+        trainee = graph_gen.trainee_llm_client
+        assert type(synthesizer).__name__ == type(trainee).__name__ == "OllamaClient"
+        assert synthesizer.model_name == "qwen2.5:7b"
+        assert synthesizer.base_url == "http://localhost:11434"
+        assert trainee.base_url == "http://gpu-box:11434"
+        assert trainee.http_pool is graph_gen.http_pool
+
+
+def test_insert_returns_graph_storage():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_file = os.path.join(tmpdir, "input.jsonl")
+        with open(input_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"content": "Rome is a city."}) + "\n")
+        client = _Client(tokenizer=_Tokenizer())
+        graph_gen = GraphGen(
+            working_dir=tmpdir,
+            tokenizer_instance=_Tokenizer(),
+            synthesizer_llm_client=client,
+            trainee_llm_client=client,
+        )
+        read_config = {"input_file": input_file}
+        split_config = {"chunk_size": 64, "chunk_overlap": 0}
+
+        result = graph_gen.insert(read_config, split_config, {"max_loop": 0})
+        assert result is graph_gen.graph_storage
+        # nothing new on a rerun
+        assert graph_gen.insert(read_config, split_config, {"max_loop": 0}) is None
+
+
+def test_log_docs_are_read_only_until_insert():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_file = os.path.join(tmpdir, "input.jsonl")
+        with open(input_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"content": "Rome is a city."}) + "\n")
+        client = _Client(tokenizer=_Tokenizer())
+
+        def _graph_gen():
+            return GraphGen(
+                working_dir=tmpdir,
+                tokenizer_instance=_Tokenizer(),
+                synthesizer_llm_client=client,
+                trainee_llm_client=client,
+                storage_config={"kv_backend": "log"},
+            )
+
+        graph_gen = _graph_gen()
+        assert graph_gen.full_docs_storage.read_only
+        assert graph_gen.text_chunks_storage.read_only
+        assert not graph_gen.summary_storage.read_only
+        graph_gen.insert(
+            {"input_file": input_file}, {"chunk_size": 64, "chunk_overlap": 0}
+        )
+        assert not graph_gen.full_docs_storage.read_only
+
+        reopened = _graph_gen()
+        assert reopened.full_docs_storage.read_only
+        assert len(reopened.full_docs_storage._index) == 1
+        assert len(reopened.text_chunks_storage._index) == 1
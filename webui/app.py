@@ -10,6 +10,7 @@ from dotenv import load_dotenv
 
 from graphgen.graphgen import GraphGen
 from graphgen.models import OpenAIClient, Tokenizer
+from graphgen.models.llm.http_pool import HTTPPool
 from graphgen.models.llm.limitter import RPM, TPM
 from graphgen.utils import set_logger
 from webui.base import WebuiParams
@@ -40,6 +41,7 @@ def init_graph_gen(config: dict, env: dict) -> GraphGen:
     os.environ.update({k: str(v) for k, v in env.items()})
 
     tokenizer_instance = Tokenizer(config.get("tokenizer", "cl100k_base"))
+    http_pool = HTTPPool(**(config.get("http_pool") or {}))
     synthesizer_llm_client = OpenAIClient(
         model_name=env.get("SYNTHESIZER_MODEL", ""),
         base_url=env.get("SYNTHESIZER_BASE_URL", ""),
@@ -48,6 +50,7 @@ def init_graph_gen(config: dict, env: dict) -> GraphGen:
         rpm=RPM(env.get("RPM", 1000)),
         tpm=TPM(env.get("TPM", 50000)),
         tokenizer=tokenizer_instance,
+        http_pool=http_pool,
     )
     trainee_llm_client = OpenAIClient(
         model_name=env.get("TRAINEE_MODEL", ""),
@@ -57,6 +60,7 @@ def init_graph_gen(config: dict, env: dict) -> GraphGen:
         rpm=RPM(env.get("RPM", 1000)),
         tpm=TPM(env.get("TPM", 50000)),
         tokenizer=tokenizer_instance,
+        http_pool=http_pool,
     )
 
     graph_gen = GraphGen(
@@ -201,6 +205,7 @@ def run_graphgen(params: WebuiParams, progress=gr.Progress()):
         raise gr.Error(f"Error occurred: {str(e)}")
 
     finally:
+        graph_gen.close()
         # Clean up workspace
         cleanup_workspace(graph_gen.working_dir)
 